@@ -0,0 +1,231 @@
+"""
+JSON artifact writing shared by the scripts, plus a payload-size report.
+
+Every script writes its outputs through write_json(). The output mode comes
+from the PIPELINE_OUTPUT_MODE environment variable (build.py --production
+sets it):
+
+    pretty      indent=2, as the files have always been written (default)
+    production  compact separators, plus .gz and .br sidecars next to every
+                file for servers that serve precompressed assets
+                (.br needs the optional `brotli` package and is skipped
+                without it)
+
+Switching back to pretty removes the sidecars a production build left, so
+they never go stale. The logical content is the same in both modes.
+
+    python artifacts.py report                   # sizes vs. PAYLOAD_BUDGETS
+    python artifacts.py report --strict          # exit 1 when over budget
+    python artifacts.py minify                   # convert existing files in place
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+OUTPUT_MODE_ENV = "PIPELINE_OUTPUT_MODE"
+PRETTY = "pretty"
+PRODUCTION = "production"
+OUTPUT_MODES = [PRETTY, PRODUCTION]
+
+SIDECAR_SUFFIXES = [".gz", ".br"]
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Files the dashboard fetches on startup (stores/dataStore.js), relative to data/
+STARTUP_FILES = [
+    "main/processedPapers.json",
+    "main/hierarchyMapping.json",
+    "main/nodeMetadata.json",
+    "interaction/crossLevelConnections.json",
+    "interaction/platformConfiguration.json",
+    "interaction/interactionStates.json",
+    "layout/precomputedStats.json",
+    "layout/sankeyLayoutConfig.json",
+    "raw/papers.json",
+]
+
+# Transfer-size budgets in bytes (smallest available encoding), relative to data/
+PAYLOAD_BUDGETS = {
+    "main/processedPapers.json": 150_000,
+    "main/hierarchyMapping.json": 10_000,
+    "main/nodeMetadata.json": 10_000,
+    "main/nodePostings.json": 10_000,
+    "interaction/crossLevelConnections.json": 150_000,
+    "interaction/platformConfiguration.json": 5_000,
+    "interaction/interactionStates.json": 5_000,
+    "layout/precomputedStats.json": 20_000,
+    "layout/sankeyLayoutConfig.json": 5_000,
+    "raw/papers.json": 150_000,
+}
+STARTUP_BUDGET = 450_000
+
+# Directories under data/ whose .json files `minify` converts by default
+ARTIFACT_DIRS = ["raw", "main", "interaction", "layout", "search", "sankeyLayouts"]
+
+# ---------------------------------------------------------------------------
+# Writing --------------------------------------------------------------------
+
+def output_mode() -> str:
+    mode = os.environ.get(OUTPUT_MODE_ENV, PRETTY)
+    if mode not in OUTPUT_MODES:
+        raise SystemExit(f"{OUTPUT_MODE_ENV} must be one of {', '.join(OUTPUT_MODES)}, got '{mode}'")
+    return mode
+
+
+def dumps(data, mode: Optional[str] = None, compact: bool = False) -> str:
+    if compact or (mode or output_mode()) == PRODUCTION:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def brotli_module():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compressed(raw: bytes) -> Dict[str, Optional[bytes]]:
+    """suffix -> compressed bytes (None when the encoder is unavailable)."""
+    brotli = brotli_module()
+    return {
+        # mtime=0 keeps the .gz byte-identical between builds
+        ".gz": gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0),
+        ".br": brotli.compress(raw, quality=BROTLI_QUALITY) if brotli else None,
+    }
+
+
+def write_sidecars(path: str):
+    with open(path, "rb") as f:
+        raw = f.read()
+    for suffix, data in compressed(raw).items():
+        if data is not None:
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+
+
+def remove_sidecars(path: str):
+    for suffix in SIDECAR_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def finish_artifact(path: str, mode: Optional[str] = None):
+    """Create or drop the sidecars of a file that was just written."""
+    if (mode or output_mode()) == PRODUCTION:
+        write_sidecars(path)
+    else:
+        remove_sidecars(path)
+
+
+def write_json(path: str, data, mode: Optional[str] = None, compact: bool = False):
+    """Write one JSON artifact in the current output mode (compact=True always minifies)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(dumps(data, mode, compact))
+    finish_artifact(path, mode)
+
+# ---------------------------------------------------------------------------
+# Size report ----------------------------------------------------------------
+
+def file_sizes(path: str) -> Dict[str, Optional[int]]:
+    """Sizes of the file as written, minified, and gzip/brotli compressed."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    minified = dumps(json.loads(raw), compact=True).encode("utf-8")
+    sizes = {"written": len(raw), "minified": len(minified)}
+    for suffix, data in compressed(minified).items():
+        sizes[suffix.lstrip(".")] = len(data) if data is not None else None
+    return sizes
+
+
+def size_report(data_dir: str, budgets: Dict[str, int], startup_budget: int) -> dict:
+    rows = []
+    for rel in STARTUP_FILES + sorted(set(budgets) - set(STARTUP_FILES)):
+        path = os.path.join(data_dir, rel)
+        if not os.path.exists(path):
+            continue
+        sizes = file_sizes(path)
+        transfer = min(v for v in (sizes["gz"], sizes["br"]) if v is not None)
+        budget = budgets.get(rel)
+        rows.append({"file": rel, **sizes, "transfer": transfer, "budget": budget,
+                     "overBudget": budget is not None and transfer > budget})
+    startup = sum(row["transfer"] for row in rows if row["file"] in STARTUP_FILES)
+    return {"files": rows, "startupTransfer": startup, "startupBudget": startup_budget,
+            "startupOverBudget": startup > startup_budget}
+
+
+def print_report(report: dict):
+    def kb(value: Optional[int]) -> str:
+        return f"{value / 1000:9.1f}" if value is not None else "      n/a"
+
+    print(f"{'file':<42}{'written':>9}{'minified':>9}{'gzip':>9}{'brotli':>9}{'budget':>9}  (kB)")
+    for row in report["files"]:
+        flag = "  OVER" if row["overBudget"] else ""
+        print(f"{row['file']:<42}{kb(row['written'])}{kb(row['minified'])}{kb(row['gz'])}{kb(row['br'])}"
+              f"{kb(row['budget'])}{flag}")
+    flag = "  OVER" if report["startupOverBudget"] else ""
+    print(f"startup transfer: {report['startupTransfer'] / 1000:.1f} kB "
+          f"(budget {report['startupBudget'] / 1000:.1f} kB){flag}")
+    if brotli_module() is None:
+        print("(brotli sizes need `pip install brotli`)")
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def artifact_files(data_dir: str) -> List[str]:
+    files = []
+    for sub in ARTIFACT_DIRS:
+        folder = os.path.join(data_dir, sub)
+        if os.path.isdir(folder):
+            files += [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.endswith(".json")]
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minify/precompress the data files and report payload sizes")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="public/data directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="print sizes against PAYLOAD_BUDGETS")
+    report_parser.add_argument("--budgets", help="JSON file {relative path: bytes} overriding PAYLOAD_BUDGETS")
+    report_parser.add_argument("--json", dest="json_path", help="also write the report as JSON")
+    report_parser.add_argument("--strict", action="store_true", help="exit with status 1 when over budget")
+    minify_parser = sub.add_parser("minify", help="rewrite JSON files compactly with .gz/.br sidecars")
+    minify_parser.add_argument("files", nargs="*", help=f"default: every .json in {', '.join(ARTIFACT_DIRS)}")
+    args = parser.parse_args()
+
+    if args.command == "minify":
+        files = args.files or artifact_files(args.data_dir)
+        for path in files:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            write_json(path, data, PRODUCTION)
+        print(f"Minified {len(files)} file(s)")
+        return
+
+    budgets = dict(PAYLOAD_BUDGETS)
+    if args.budgets:
+        with open(args.budgets, "r", encoding="utf-8") as f:
+            budgets.update(json.load(f))
+    report = size_report(args.data_dir, budgets, STARTUP_BUDGET)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.strict and (report["startupOverBudget"] or any(row["overBudget"] for row in report["files"])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmarks for the data pipeline on synthetic corpora.
+
+For every (papers, tags) size a workspace is filled with a generated
+raw/tags.txt and papers.csv in the same formats as the real files (plus a
+copy of the hand-written layout/sankeyLayoutConfig.json), every
+build.py stage is run on it, and wall time, peak RSS and output sizes are
+recorded per stage. Results are written as JSON; with --history each run is
+also appended as one line to a JSONL file so regressions show up over time.
+
+    python benchmark.py                                  # 1k papers x 100 tags
+    python benchmark.py --papers 1000,10000,100000 --tags 100,1000,10000
+    python benchmark.py --stages process,connections --history bench.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from build import CODES_DIR, DATA_DIR, Stage, make_stages
+from instrumentation import PROFILE_DIR_ENV
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+DEFAULT_PAPERS = [1000]
+DEFAULT_TAGS = [100]
+DEFAULT_SEED = 42
+
+YEARS = list(range(2020, 2026))
+AWARD_RATES = [("#best paper", 0.02), ("#honorable mention", 0.06)]
+
+# Share of the leaf tags generated for each tags.txt section
+SECTION_SHARES = [("研究内容", 0.45), ("研究方法", 0.35), ("研究平台", 0.20)]
+PLATFORM_TYPES = ["内容形式", "平台属性"]
+LEAVES_PER_GROUP = 8
+GROUPS_PER_TOP = 6
+
+# interactionStates.py builds its example state from these real node names,
+# so the first generated node of each kind is named after them.
+ANCHOR_NAMES = {
+    ("研究方法", "top"): "定量研究与实验设计",
+    ("研究方法", "group"): "实验与对照组设计",
+    ("内容形式", "group"): "图文为主",
+}
+
+# Hand-written inputs that do not depend on the corpus, copied from the real data dir
+STATIC_INPUTS = [os.path.join("layout", "sankeyLayoutConfig.json")]
+
+# (min, max) tags drawn per paper for each papers.csv column
+TAGS_PER_PAPER = {"研究内容": (1, 3), "研究方法": (1, 4), "研究涉及平台": (0, 3)}
+ABSTRACT_WORDS = (120, 220)
+
+CSV_COLUMNS = ["id", "Name", "Abstract", "Authors", "Year", "DOI", "Tags", "研究内容", "研究方法", "研究涉及平台"]
+
+VOCABULARY = (
+    "social media users platform online study design community content participants "
+    "interview survey analysis behavior privacy trust algorithm moderation youth health "
+    "information sharing identity support network practices experience we findings "
+    "implications video creators audience misinformation news political engagement"
+).split()
+
+# ---------------------------------------------------------------------------
+# Synthetic data -------------------------------------------------------------
+
+def split_counts(total: int, chunk: int) -> List[int]:
+    """Split `total` into ceil(total / chunk) near-equal positive parts."""
+    parts = max(1, math.ceil(total / chunk))
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def generate_taxonomy(n_tags: int) -> Tuple[str, Dict[str, List[str]]]:
+    """
+    tags.txt text with about `n_tags` leaf tags, and the leaf names per
+    papers.csv column. 研究内容/研究方法 get bold top items, groups and leaves;
+    研究平台 gets the two platform types with platform groups and leaves.
+    """
+    lines: List[str] = []
+    leaves: Dict[str, List[str]] = {"研究内容": [], "研究方法": [], "研究涉及平台": []}
+    for section, share in SECTION_SHARES:
+        n_leaves = max(GROUPS_PER_TOP, round(n_tags * share))
+        lines += [f"# **{section}**", ""]
+        if section == "研究平台":
+            for type_idx, platform_type in enumerate(PLATFORM_TYPES):
+                lines += [f"- **{platform_type}**", ""]
+                counts = split_counts(n_leaves // len(PLATFORM_TYPES), LEAVES_PER_GROUP)
+                for group_idx, count in enumerate(counts):
+                    default_group = f"{platform_type}类{group_idx + 1}"
+                    group = ANCHOR_NAMES.get((platform_type, "group"), default_group) if group_idx == 0 else default_group
+                    lines.append(f"    - {group}")
+                    for leaf_idx in range(count):
+                        name = f"Platform{type_idx + 1}-{group_idx + 1}-{leaf_idx + 1}"
+                        lines.append(f"        - {name}")
+                        leaves["研究涉及平台"].append(name)
+        else:
+            prefix = section[-2:]  # 内容 / 方法
+            groups = split_counts(n_leaves, LEAVES_PER_GROUP)
+            tops = split_counts(len(groups), GROUPS_PER_TOP)
+            group_iter = iter(groups)
+            for top_idx, n_groups in enumerate(tops):
+                top = f"{prefix}主题{top_idx + 1}"
+                lines.append(f"- **{ANCHOR_NAMES.get((section, 'top'), top) if top_idx == 0 else top}**")
+                for group_idx in range(n_groups):
+                    group = f"{prefix}子类{top_idx + 1}-{group_idx + 1}"
+                    if top_idx == 0 and group_idx == 0:
+                        group = ANCHOR_NAMES.get((section, "group"), group)
+                    lines.append(f"    - {group}")
+                    for leaf_idx in range(next(group_iter)):
+                        name = f"{prefix}标签{top_idx + 1}-{group_idx + 1}-{leaf_idx + 1}"
+                        lines.append(f"        - {name}")
+                        leaves[section].append(name)
+        lines.append("")
+    return "\n".join(lines) + "\n", leaves
+
+
+def skewed_sample(rng: random.Random, names: List[str], weights: List[float], k: int) -> List[str]:
+    picked: Dict[str, None] = {}
+    for name in rng.choices(names, weights=weights, k=k * 2):
+        picked[name] = None
+        if len(picked) == k:
+            break
+    return list(picked)
+
+
+def generate_papers(n_papers: int, leaves: Dict[str, List[str]], rng: random.Random):
+    """papers.csv rows. Tag popularity follows a Zipf-like curve like the real data."""
+    weights = {column: [1.0 / (rank + 1) for rank in range(len(names))] for column, names in leaves.items()}
+    for i in range(1, n_papers + 1):
+        row = {
+            "id": f"paper_{i:03d}",
+            "Name": f"Synthetic paper {i}: " + " ".join(rng.choices(VOCABULARY, k=8)),
+            "Abstract": " ".join(rng.choices(VOCABULARY, k=rng.randint(*ABSTRACT_WORDS))) + ".",
+            "Authors": "\n".join(f"Author{rng.randint(1, n_papers * 2)}, A." for _ in range(rng.randint(1, 6))),
+            "Year": str(rng.choice(YEARS)),
+            "DOI": f"https://doi.org/10.0000/synthetic.{i}",
+            "Tags": ", ".join(tag for tag, rate in AWARD_RATES if rng.random() < rate),
+        }
+        for column, (low, high) in TAGS_PER_PAPER.items():
+            k = min(rng.randint(low, high), len(leaves[column]))
+            row[column] = ", ".join(skewed_sample(rng, leaves[column], weights[column], k)) if k else ""
+        yield row
+
+
+def prepare_workspace(data_dir: str, n_papers: int, n_tags: int, seed: int):
+    for sub in ["raw", "main", "interaction", "layout"]:
+        os.makedirs(os.path.join(data_dir, sub), exist_ok=True)
+    tags_text, leaves = generate_taxonomy(n_tags)
+    with open(os.path.join(data_dir, "raw", "tags.txt"), "w", encoding="utf-8") as f:
+        f.write(tags_text)
+    with open(os.path.join(data_dir, "papers.csv"), "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(generate_papers(n_papers, leaves, random.Random(seed)))
+    for rel in STATIC_INPUTS:
+        shutil.copyfile(os.path.join(DATA_DIR, rel), os.path.join(data_dir, rel))
+    return sum(len(names) for names in leaves.values())
+
+# ---------------------------------------------------------------------------
+# Measurement ----------------------------------------------------------------
+
+def run_measured(command: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[int, float, Optional[int]]:
+    """Exit code, wall seconds and peak RSS in bytes (None where os.wait4 is missing)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=CODES_DIR, env=env, stdout=subprocess.DEVNULL)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    else:
+        proc.wait()
+        peak_rss = None
+    duration = time.perf_counter() - start
+    return proc.returncode, duration, peak_rss
+
+
+def bench_stage(stage: Stage, profile_dir: Optional[str] = None) -> dict:
+    env = dict(os.environ, **{PROFILE_DIR_ENV: profile_dir}) if profile_dir else None
+    code, duration, peak_rss = run_measured(stage.command(), env)
+    result = {
+        "stage": stage.name,
+        "ok": code == 0,
+        "seconds": round(duration, 3),
+        "peakRssBytes": peak_rss,
+        "outputBytes": {os.path.basename(p): os.path.getsize(p) for p in stage.outputs if os.path.exists(p)},
+    }
+    script_report = os.path.join(profile_dir or "", os.path.splitext(stage.script)[0] + ".json")
+    if profile_dir and os.path.exists(script_report):
+        with open(script_report, "r", encoding="utf-8") as f:
+            result["profile"] = json.load(f)["stages"]
+    print(f"  {stage.name:<12} {duration:8.2f}s  "
+          f"{(peak_rss or 0) / 2**20:8.1f} MiB  {sum(result['outputBytes'].values()) / 2**20:8.2f} MiB out"
+          + ("" if code == 0 else f"  FAILED ({code})"))
+    return result
+
+
+def bench_size(workdir: str, n_papers: int, n_tags: int, seed: int, stage_names: List[str],
+               profile: bool = False) -> dict:
+    data_dir = os.path.join(workdir, f"p{n_papers}_t{n_tags}", "data")
+    profile_dir = os.path.join(workdir, f"p{n_papers}_t{n_tags}", "profile") if profile else None
+    n_leaves = prepare_workspace(data_dir, n_papers, n_tags, seed)
+    print(f"{n_papers} papers x {n_leaves} leaf tags ({data_dir})")
+    results = []
+    for stage in make_stages(data_dir):
+        if stage_names and stage.name not in stage_names:
+            continue
+        result = bench_stage(stage, profile_dir)
+        results.append(result)
+        if not result["ok"]:
+            break  # later stages would read missing or stale inputs
+    return {"papers": n_papers, "tags": n_leaves, "stages": results,
+            "totalSeconds": round(sum(r["seconds"] for r in results), 3)}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CODES_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline on synthetic corpora")
+    parser.add_argument("--papers", type=int_list, default=DEFAULT_PAPERS, help="comma-separated paper counts")
+    parser.add_argument("--tags", type=int_list, default=DEFAULT_TAGS, help="comma-separated leaf tag counts")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--stages", default="",
+                        help="comma-separated stages to time (default: all); earlier stages still have to run "
+                             "once for their outputs, so list them too")
+    parser.add_argument("--workdir", help="where to generate the corpora (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated workspace")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report path")
+    parser.add_argument("--history", help="JSONL file to append this run to")
+    parser.add_argument("--profile", action="store_true",
+                        help="include each script's per-stage report (tracemalloc slows the scripts down)")
+    args = parser.parse_args()
+
+    stage_names = [name for name in args.stages.split(",") if name]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="chi-bench-")
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "runs": [],
+    }
+    try:
+        for n_papers in args.papers:
+            for n_tags in args.tags:
+                report["runs"].append(bench_size(workdir, n_papers, n_tags, args.seed, stage_names, args.profile))
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+    print(f"Benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
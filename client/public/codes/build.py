@@ -0,0 +1,483 @@
+"""
+Single build entry point for the data pipeline in this directory.
+
+Every script is modelled as a stage with declared input files, output files
+and source files. Stages are ordered by their file dependencies and a stage
+only runs when the content hash of one of its inputs or sources changed since
+its last successful run (or one of its outputs is missing). Hashes are kept
+in .build_cache.json next to this file.
+
+    python build.py                  # incremental build of everything
+    python build.py platform         # only what platformConfiguration needs
+    python build.py --force          # rebuild everything
+    python build.py --dry-run        # show what would run
+    python build.py --adopt          # record the current files as up to date
+    python build.py --profile prof   # also write per-stage reports to prof/
+    python build.py --production     # minified outputs + .gz/.br sidecars, size report
+    python build.py --jobs 4         # run independent stages side by side
+    python build.py --watch --jobs 4 # rebuild whatever an edit affects, until Ctrl+C
+
+Watch mode polls the stage scripts and the source files no stage writes
+(papers.csv, tags.txt, sankeyLayoutConfig.json, ...); editing the color
+table in nodeMetadata_set_color.py, for example, reruns colors and the
+stages reading nodeMetadata.json.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import OUTPUT_MODE_ENV, PAYLOAD_BUDGETS, PRODUCTION, STARTUP_BUDGET
+from artifacts import output_mode, print_report, size_report
+from instrumentation import PROFILE_DIR_ENV
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+CODES_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.dirname(CODES_DIR)
+DATA_DIR = os.path.join(PUBLIC_DIR, "data")
+CACHE_FILE = os.path.join(CODES_DIR, ".build_cache.json")
+
+# Sibling modules every script imports
+COMMON_HELPERS = ["instrumentation.py", "artifacts.py"]
+
+
+def code_path(name: str) -> str:
+    return os.path.join(CODES_DIR, name)
+
+
+class Stage:
+    def __init__(self, name: str, script: str, inputs: List[str], outputs: List[str],
+                 args: List[str], helpers: Optional[List[str]] = None):
+        self.name = name
+        self.script = script
+        self.inputs = inputs
+        self.outputs = outputs
+        self.args = args
+        # The script itself and any sibling modules it imports
+        self.sources = [code_path(script)] + [code_path(h) for h in (helpers or []) + COMMON_HELPERS]
+
+    def command(self) -> List[str]:
+        return [sys.executable, code_path(self.script)] + self.args
+
+
+def data_files(data_dir: str = DATA_DIR) -> Dict[str, str]:
+    """Named paths of the files the stages read and write under `data_dir`."""
+    def data_path(*parts: str) -> str:
+        return os.path.join(data_dir, *parts)
+
+    return {
+        "tags_txt": data_path("raw", "tags.txt"),
+        "papers_csv": data_path("papers.csv"),
+        "all_tags": data_path("raw", "allTagsById.json"),
+        "l3_map": data_path("raw", "L3TagToIdMap.json"),
+        "raw_papers": data_path("raw", "papers.json"),
+        "processed_papers": data_path("main", "processedPapers.json"),
+        "hierarchy_mapping": data_path("main", "hierarchyMapping.json"),
+        "node_metadata": data_path("main", "nodeMetadata.json"),
+        "node_postings": data_path("main", "nodePostings.json"),
+        "cross_level_connections": data_path("interaction", "crossLevelConnections.json"),
+        "platform_configuration": data_path("interaction", "platformConfiguration.json"),
+        "interaction_states": data_path("interaction", "interactionStates.json"),
+        "precomputed_stats": data_path("layout", "precomputedStats.json"),
+        "search_manifest": data_path("search", "manifest.json"),
+        "sankey_layout_config": data_path("layout", "sankeyLayoutConfig.json"),
+        "sankey_layouts_manifest": data_path("sankeyLayouts", "manifest.json"),
+    }
+
+
+def make_stages(data_dir: str = DATA_DIR) -> List[Stage]:
+    """The pipeline stages reading and writing the files under `data_dir`."""
+    files = data_files(data_dir)
+    tags_txt, papers_csv = files["tags_txt"], files["papers_csv"]
+    all_tags, l3_map = files["all_tags"], files["l3_map"]
+    raw_papers = files["raw_papers"]
+    processed_papers = files["processed_papers"]
+    hierarchy_mapping = files["hierarchy_mapping"]
+    node_metadata = files["node_metadata"]
+    node_postings = files["node_postings"]
+    cross_level_connections = files["cross_level_connections"]
+    platform_configuration = files["platform_configuration"]
+    interaction_states = files["interaction_states"]
+    precomputed_stats = files["precomputed_stats"]
+    search_manifest = files["search_manifest"]
+    sankey_layout_config = files["sankey_layout_config"]
+    sankey_layouts_manifest = files["sankey_layouts_manifest"]
+
+    return [
+        Stage("tags", "tags.py",
+              inputs=[tags_txt],
+              outputs=[all_tags, l3_map],
+              args=["--input", tags_txt, "--all-tags", all_tags, "--l3-map", l3_map]),
+        Stage("papers", "papers.py",
+              inputs=[papers_csv],
+              outputs=[raw_papers],
+              args=["--input", papers_csv, "--output", raw_papers]),
+        Stage("process", "process_new.py",
+              inputs=[all_tags, raw_papers],
+              outputs=[processed_papers, hierarchy_mapping, node_metadata],
+              args=["--all-tags", all_tags, "--papers", raw_papers,
+                    "--output-dir", os.path.dirname(processed_papers)],
+              helpers=["tag_resolver.py", "taxonomy.py", "paper_bitset.py"]),
+        # Rewrites nodeMetadata.json in place
+        Stage("colors", "nodeMetadata_set_color.py",
+              inputs=[node_metadata],
+              outputs=[node_metadata],
+              args=["--metadata", node_metadata],
+              helpers=["taxonomy.py"]),
+        Stage("postings", "node_postings.py",
+              inputs=[processed_papers],
+              outputs=[node_postings],
+              args=["--papers", processed_papers, "--output", node_postings],
+              helpers=["paper_bitset.py"]),
+        Stage("connections", "crossLevelConnections.py",
+              inputs=[processed_papers],
+              outputs=[cross_level_connections],
+              args=["--papers", processed_papers, "--output", cross_level_connections],
+              helpers=["paper_bitset.py"]),
+        Stage("platform", "platformConfiguration.py",
+              inputs=[node_metadata],
+              outputs=[platform_configuration],
+              args=["--metadata", node_metadata, "--output", platform_configuration],
+              helpers=["taxonomy.py"]),
+        Stage("interaction", "interactionStates.py",
+              inputs=[platform_configuration, hierarchy_mapping],
+              outputs=[interaction_states],
+              args=["--platform-config", platform_configuration, "--hierarchy", hierarchy_mapping,
+                    "--output", interaction_states]),
+        Stage("stats", "precomputedStats.py",
+              inputs=[processed_papers, all_tags],
+              outputs=[precomputed_stats],
+              args=["--papers", processed_papers, "--tags", all_tags, "--output", precomputed_stats],
+              helpers=["tag_resolver.py", "taxonomy.py"]),
+        # Also writes one layout file per view next to the manifest
+        Stage("layouts", "sankey_layout.py",
+              inputs=[cross_level_connections, node_metadata, platform_configuration, sankey_layout_config],
+              outputs=[sankey_layouts_manifest],
+              args=["--connections", cross_level_connections, "--metadata", node_metadata,
+                    "--platform-config", platform_configuration, "--layout-config", sankey_layout_config,
+                    "--output-dir", os.path.dirname(sankey_layouts_manifest)],
+              helpers=["crossLevelConnections.py", "paper_bitset.py"]),
+        # Also writes the terms-*.json shards next to the manifest
+        Stage("search", "search_index.py",
+              inputs=[processed_papers],
+              outputs=[search_manifest],
+              args=["--papers", processed_papers, "--output-dir", os.path.dirname(search_manifest)]),
+    ]
+
+
+STAGES = make_stages()
+
+# ---------------------------------------------------------------------------
+# Dependency graph -------------------------------------------------------------
+
+def stage_dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """stage name -> names of the earlier stages that write one of its inputs."""
+    deps: Dict[str, List[str]] = {}
+    for idx, stage in enumerate(stages):
+        deps[stage.name] = [
+            other.name for other in stages[:idx]
+            if set(other.outputs) & set(stage.inputs)
+        ]
+    return deps
+
+
+def select_stages(stages: List[Stage], targets: List[str]) -> List[Stage]:
+    """The requested stages plus everything upstream of them, in pipeline order."""
+    if not targets:
+        return list(stages)
+    deps = stage_dependencies(stages)
+    unknown = [t for t in targets if t not in deps]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}. Known: {', '.join(deps)}")
+    wanted = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+# ---------------------------------------------------------------------------
+# Content hashes ---------------------------------------------------------------
+
+def file_hash(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(path: str) -> str:
+    return os.path.relpath(path, PUBLIC_DIR).replace(os.sep, "/")
+
+
+def stage_signature(stage: Stage) -> Dict[str, Optional[str]]:
+    signature = {cache_key(path): file_hash(path) for path in stage.sources + stage.inputs}
+    # Pretty and production outputs differ, so switching modes rebuilds
+    signature["@outputMode"] = output_mode()
+    return signature
+
+
+def load_cache() -> Dict[str, dict]:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(cache: Dict[str, dict]):
+    with open(CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def stale_reason(stage: Stage, cache: Dict[str, dict]) -> Optional[str]:
+    """Why the stage has to run, or None when it is up to date."""
+    missing_inputs = [cache_key(p) for p in stage.inputs if not os.path.exists(p)]
+    if missing_inputs:
+        raise SystemExit(f"Stage '{stage.name}' is missing input(s): {', '.join(missing_inputs)}")
+    missing_outputs = [cache_key(p) for p in stage.outputs if not os.path.exists(p)]
+    if missing_outputs:
+        return f"missing {', '.join(missing_outputs)}"
+    recorded = cache.get(stage.name, {}).get("signature")
+    if recorded is None:
+        return "never built"
+    current = stage_signature(stage)
+    changed = [path for path, digest in current.items() if recorded.get(path) != digest]
+    if changed:
+        return f"changed {', '.join(changed)}"
+    return None
+
+
+def record(stage: Stage, cache: Dict[str, dict], duration: Optional[float]):
+    # The signature is taken after the run, so a stage that rewrites one of
+    # its own inputs (colors) is up to date with the file it left behind.
+    cache[stage.name] = {
+        "signature": stage_signature(stage),
+        "outputs": {cache_key(p): file_hash(p) for p in stage.outputs},
+        "seconds": round(duration, 3) if duration is not None else None,
+    }
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def write_profile_report(profile_dir: str, timings: List[dict]):
+    """Merge the scripts' own reports (written via PIPELINE_PROFILE_DIR) into build.json."""
+    for timing in timings:
+        script_report = os.path.join(profile_dir, os.path.splitext(timing["script"])[0] + ".json")
+        if os.path.exists(script_report):
+            with open(script_report, "r", encoding="utf-8") as f:
+                timing["report"] = json.load(f)
+    report = {"totalSeconds": round(sum(t["seconds"] for t in timings), 3), "stages": timings}
+    path = os.path.join(profile_dir, "build.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Profile report written to {path}")
+
+
+def stage_status(stage: Stage, cache: Dict[str, dict], force: bool, adopt: bool,
+                 upstream_changed: bool = False) -> Optional[str]:
+    """Print what happens to the stage; returns the reason when it has to be run.
+
+    upstream_changed: an upstream stage would run but did not (dry run), so
+    this stage's inputs are not final and it counts as stale.
+    """
+    if force:
+        reason = "forced"
+    elif upstream_changed:
+        reason = "upstream changed"
+    else:
+        reason = stale_reason(stage, cache)
+    if reason is None:
+        print(f"[skip] {stage.name}")
+        return None
+    if adopt:
+        record(stage, cache, None)
+        print(f"[adopt] {stage.name}")
+        return None
+    print(f"[run]  {stage.name} ({reason})")
+    return reason
+
+
+def run_stage(stage: Stage, env: Optional[dict], quiet: bool) -> Tuple[int, float]:
+    start = time.perf_counter()
+    result = subprocess.run(stage.command(), cwd=CODES_DIR, env=env,
+                            stdout=subprocess.DEVNULL if quiet else None)
+    return result.returncode, time.perf_counter() - start
+
+
+def build(targets: List[str], force: bool = False, dry_run: bool = False,
+          adopt: bool = False, quiet: bool = False, profile_dir: Optional[str] = None,
+          production: bool = False, jobs: int = 1) -> List[str]:
+    """Run the stale stages among `targets` (default: all). Returns the names that ran.
+
+    With jobs > 1, stages whose upstream stages are done run side by side.
+    A stage is only checked once its upstream stages are done, so it sees
+    their new outputs and is skipped when those came out unchanged.
+    """
+    if production:
+        os.environ[OUTPUT_MODE_ENV] = PRODUCTION  # inherited by the stage scripts
+    cache = load_cache()
+    ran: List[str] = []
+    timings: List[dict] = []
+    env = None
+    if profile_dir:
+        profile_dir = os.path.abspath(profile_dir)
+        os.makedirs(profile_dir, exist_ok=True)
+        env = dict(os.environ, **{PROFILE_DIR_ENV: profile_dir})
+
+    selected = select_stages(STAGES, targets)
+    deps = stage_dependencies(selected)
+    jobs = max(1, jobs)
+    pending = list(selected)
+    done = set()
+    would_run = set()  # dry run: stages that would run, done only for scheduling
+    failed: List[str] = []
+    running: Dict[Future, Stage] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Start the ready stages in pipeline order while there are free slots;
+            # a skipped stage is done at once and can make later ones ready
+            for stage in list(pending):
+                if failed or len(running) >= jobs:
+                    break
+                if not all(name in done for name in deps[stage.name]):
+                    continue
+                pending.remove(stage)
+                upstream_changed = any(name in would_run for name in deps[stage.name])
+                if stage_status(stage, cache, force, adopt, upstream_changed) is None:
+                    done.add(stage.name)
+                    continue
+                if dry_run:
+                    # Nothing runs, so everything downstream stays stale as well
+                    would_run.add(stage.name)
+                    done.add(stage.name)
+                    continue
+                running[pool.submit(run_stage, stage, env, quiet)] = stage
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                returncode, duration = future.result()
+                if returncode != 0:
+                    failed.append(f"Stage '{stage.name}' failed with exit code {returncode}")
+                    continue
+                record(stage, cache, duration)
+                save_cache(cache)
+                done.add(stage.name)
+                ran.append(stage.name)
+                timings.append({"name": stage.name, "script": stage.script, "seconds": round(duration, 3)})
+                print(f"[done] {stage.name} in {duration:.2f}s")
+    if failed:
+        save_cache(cache)
+        raise SystemExit("; ".join(failed))
+
+    if adopt and not dry_run:
+        save_cache(cache)
+    if profile_dir and timings:
+        write_profile_report(profile_dir, timings)
+    return ran
+
+# ---------------------------------------------------------------------------
+# Watch mode -------------------------------------------------------------------
+
+def watched_paths(stages: List[Stage]) -> List[str]:
+    """Files a curator edits: the stages' scripts and the inputs no stage writes."""
+    written = {path for stage in stages for path in stage.outputs}
+    paths = [path for stage in stages for path in stage.sources + stage.inputs if path not in written]
+    return list(dict.fromkeys(paths))
+
+
+def stat_snapshot(paths: List[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+    snapshot = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            snapshot[path] = None
+    return snapshot
+
+
+def watch(targets: List[str], interval: float = 0.3, **options):
+    """Poll the watched files and run build() after every change.
+
+    Only the stages downstream of the changed file are stale, and a stage
+    whose inputs come out unchanged ends the chain there. A failing stage is
+    reported and the loop keeps watching.
+    """
+    paths = watched_paths(select_stages(STAGES, targets))
+    snapshot = stat_snapshot(paths)
+    try:
+        build(targets, **options)
+    except SystemExit as exc:
+        print(f"[watch] {exc}")
+    print(f"[watch] watching {len(paths)} files every {interval}s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            current = stat_snapshot(paths)
+            changed = [cache_key(path) for path in paths if current[path] != snapshot[path]]
+            if not changed:
+                continue
+            # Taken before the build, so an edit made while it runs triggers the next one
+            snapshot = current
+            print(f"[watch] changed {', '.join(changed)}")
+            start = time.perf_counter()
+            try:
+                ran = build(targets, **options)
+            except SystemExit as exc:
+                print(f"[watch] {exc}")
+                continue
+            print(f"[watch] {len(ran)} stage(s) rebuilt in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("[watch] stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental build of the dashboard data files")
+    parser.add_argument("targets", nargs="*", help=f"stages to build (default: all): {', '.join(s.name for s in STAGES)}")
+    parser.add_argument("--force", action="store_true", help="run every selected stage")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would run")
+    parser.add_argument("--adopt", action="store_true",
+                        help="record the current inputs as built without running anything")
+    parser.add_argument("--quiet", action="store_true", help="hide the scripts' own output")
+    parser.add_argument("--production", action="store_true",
+                        help="write minified outputs with .gz/.br sidecars and print the payload size report")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write each script's stage report and a merged build.json into DIR")
+    parser.add_argument("--jobs", type=int, default=1, help="number of stages run at the same time")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep polling the sources and rebuild the affected stages after each change")
+    parser.add_argument("--interval", type=float, default=0.3, help="watch polling interval in seconds")
+    args = parser.parse_args()
+
+    if args.watch:
+        watch(args.targets, args.interval, quiet=args.quiet, profile_dir=args.profile,
+              production=args.production, jobs=args.jobs)
+        return
+    ran = build(args.targets, force=args.force, dry_run=args.dry_run, adopt=args.adopt, quiet=args.quiet,
+                profile_dir=args.profile, production=args.production, jobs=args.jobs)
+    if not args.dry_run and not args.adopt:
+        print(f"{len(ran)} stage(s) rebuilt.")
+    if args.production and not args.dry_run:
+        print_report(size_report(DATA_DIR, PAYLOAD_BUDGETS, STARTUP_BUDGET))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+"""
+Optional SQLite store of the corpus. Papers, tags, the tag hierarchy and the
+paper-tag assignments live in indexed tables, and the count-heavy data files
+are generated with SQL aggregates instead of Python passes over the loaded
+JSON, so a large corpus only has to be read once and ad-hoc questions are a
+query away. Standard library only (sqlite3); the JSON pipeline (build.py)
+does not depend on it.
+
+    python corpus_db.py ingest                   # processedPapers.json + allTagsById.json -> corpus.sqlite
+    python corpus_db.py export                   # write the four files below into data/
+    python corpus_db.py export --only stats --output-dir /tmp/out
+    python corpus_db.py query "SELECT name, COUNT(*) FROM paper_tag_names WHERE level = 1 GROUP BY name"
+
+Tables:
+
+    tags(pos, id, name, level, category, parent_id)    allTagsById, in file order
+    tag_children(parent_pos, rank, child_id)           childrenIds as listed
+    papers(pos, id, name, abstract, authors, year, doi, is_awarded)
+    labels(id, domain, level, name)                    every (domain, level, name) a paper is tagged with
+    paper_tags(paper_pos, label_id, rank)              processedPapers tags[domain]["l<level>"][rank]
+    paper_tag_names                                    view: paper_tags joined with labels, for ad-hoc queries
+
+export writes the same files as the JSON pipeline:
+
+    main/hierarchyMapping.json            taxonomy structure read from tags / tag_children
+    main/nodeMetadata.json                same, totalPapers counted in SQL, colors applied
+    interaction/crossLevelConnections.json  self-join of paper_tags per domain pair
+    layout/precomputedStats.json          paper_tags joined with the resolved tag paths
+                                          (lastPaperNumber is kept from the file it replaces)
+
+Key order follows the first paper that produces a key, as in the Python
+builders, so the outputs are byte-identical to theirs. crossLevelConnections
+is written in its default shape (expanded paperIds with the year cube);
+the pruned variants stay with crossLevelConnections.py.
+A .ndjson papers file (one processed paper per line) is ingested line by line.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterator, List
+
+from artifacts import write_json
+from crossLevelConnections import DOMAIN_PAIRS, assemble_output, classify_strength
+from instrumentation import Profiler, add_profile_argument, profile_path
+from nodeMetadata_set_color import TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME, apply_colors
+from precomputedStats import (LAST_PAPER_NUMBER_KEY, OVERALL_KEY, PLATFORM_STATS_KEY, STATS_DOMAINS,
+                              last_paper_number, previous_last_paper_number)
+from process_new import build_hierarchy_mapping, build_node_metadata
+from taxonomy import Taxonomy
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+DB_FILE = os.path.join(SCRIPT_DIR, "corpus.sqlite")
+PAPERS_FILE = os.path.join(DATA_DIR, "main", "processedPapers.json")
+ALL_TAGS_FILE = os.path.join(DATA_DIR, "raw", "allTagsById.json")
+
+# export target -> output path relative to the data directory
+EXPORTS = {
+    "hierarchy": os.path.join("main", "hierarchyMapping.json"),
+    "metadata": os.path.join("main", "nodeMetadata.json"),
+    "connections": os.path.join("interaction", "crossLevelConnections.json"),
+    "stats": os.path.join("layout", "precomputedStats.json"),
+}
+
+SCHEMA = """
+DROP VIEW IF EXISTS paper_tag_names;
+DROP TABLE IF EXISTS paper_tags;
+DROP TABLE IF EXISTS labels;
+DROP TABLE IF EXISTS papers;
+DROP TABLE IF EXISTS tag_children;
+DROP TABLE IF EXISTS tags;
+
+CREATE TABLE tags (
+    pos       INTEGER PRIMARY KEY,
+    id        TEXT NOT NULL UNIQUE,
+    name      TEXT,
+    level     INTEGER,
+    category  TEXT,
+    parent_id TEXT
+);
+CREATE INDEX tags_by_key ON tags (category, level, name);
+
+CREATE TABLE tag_children (
+    parent_pos INTEGER NOT NULL REFERENCES tags (pos),
+    rank       INTEGER NOT NULL,
+    child_id   TEXT NOT NULL,
+    PRIMARY KEY (parent_pos, rank)
+);
+
+CREATE TABLE papers (
+    pos        INTEGER PRIMARY KEY,
+    id         TEXT NOT NULL UNIQUE,
+    name       TEXT,
+    abstract   TEXT,
+    authors    TEXT,
+    year       TEXT,
+    doi        TEXT,
+    is_awarded INTEGER NOT NULL
+);
+CREATE INDEX papers_by_year ON papers (year, is_awarded);
+
+CREATE TABLE labels (
+    id     INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL,
+    level  INTEGER NOT NULL,
+    name   TEXT NOT NULL,
+    UNIQUE (domain, level, name)
+);
+
+-- Joins and groups run on the integer label ids
+CREATE TABLE paper_tags (
+    paper_pos INTEGER NOT NULL REFERENCES papers (pos),
+    label_id  INTEGER NOT NULL REFERENCES labels (id),
+    rank      INTEGER NOT NULL,
+    PRIMARY KEY (paper_pos, label_id, rank)
+) WITHOUT ROWID;
+CREATE INDEX paper_tags_by_label ON paper_tags (label_id, paper_pos);
+
+CREATE VIEW paper_tag_names AS
+SELECT pt.paper_pos, lb.domain, lb.level, pt.rank, lb.name
+FROM paper_tags pt JOIN labels lb ON lb.id = pt.label_id;
+"""
+
+# ---------------------------------------------------------------------------
+# Ingest -----------------------------------------------------------------------
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def iter_papers(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f).get("papers", [])
+
+
+def paper_rows(papers: Iterator[dict], labels: Dict[tuple, int], tag_rows: List[tuple]) -> Iterator[tuple]:
+    """papers rows; the paper's tag rows are appended to `tag_rows` and new labels numbered on the way."""
+    for pos, paper in enumerate(papers):
+        year = paper.get("year")
+        for domain, levels in (paper.get("tags") or {}).items():
+            if not isinstance(levels, dict):
+                continue
+            for level_key, names in levels.items():
+                level = int(level_key[1:])
+                for rank, name in enumerate(names):
+                    tag_rows.append((pos, labels.setdefault((domain, level, name), len(labels)), rank))
+        yield (pos, paper.get("id"), paper.get("name"), paper.get("abstract"), paper.get("authors"),
+               str(year) if year else None, paper.get("doi"), 1 if paper.get("isAwarded") else 0)
+
+
+def ingest(conn: sqlite3.Connection, papers_path: str, tags_path: str) -> Dict[str, int]:
+    """Replace the database contents with the given processedPapers and allTagsById files."""
+    with open(tags_path, "r", encoding="utf-8") as f:
+        all_tags_by_id = json.load(f).get("allTagsById", {})
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO tags VALUES (?, ?, ?, ?, ?, ?)", [
+            (pos, tag_id, tag.get("name"), tag.get("level"), tag.get("category"), tag.get("parentId"))
+            for pos, (tag_id, tag) in enumerate(all_tags_by_id.items())
+        ])
+        conn.executemany("INSERT INTO tag_children VALUES (?, ?, ?)", [
+            (pos, rank, child_id)
+            for pos, tag in enumerate(all_tags_by_id.values())
+            for rank, child_id in enumerate(tag.get("childrenIds", []))
+        ])
+        # Rows are flushed per batch of papers, so a large file is not held twice
+        labels: Dict[tuple, int] = {}
+        tag_rows: List[tuple] = []
+        batch: List[tuple] = []
+        for row in paper_rows(iter_papers(papers_path), labels, tag_rows):
+            batch.append(row)
+            if len(batch) >= 1000:
+                flush_papers(conn, batch, labels, tag_rows)
+        flush_papers(conn, batch, labels, tag_rows)
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("tags", "papers", "labels", "paper_tags")}
+
+
+def flush_papers(conn: sqlite3.Connection, batch: List[tuple], labels: Dict[tuple, int], tag_rows: List[tuple]):
+    stored = conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+    conn.executemany("INSERT INTO labels VALUES (?, ?, ?, ?)",
+                     [(label_id, *key) for key, label_id in labels.items() if label_id >= stored])
+    conn.executemany("INSERT INTO papers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.executemany("INSERT INTO paper_tags VALUES (?, ?, ?)", tag_rows)
+    batch.clear()
+    tag_rows.clear()
+
+# ---------------------------------------------------------------------------
+# Queries ----------------------------------------------------------------------
+
+def rank_base(conn: sqlite3.Connection) -> int:
+    """One more than the largest tag rank, for packing (paper, ..., rank) order keys into one integer."""
+    return conn.execute("SELECT COALESCE(MAX(rank), 0) + 1 FROM paper_tags").fetchone()[0]
+
+
+def year_axis(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT DISTINCT year FROM papers WHERE year IS NOT NULL ORDER BY year")]
+
+
+def load_taxonomy(conn: sqlite3.Connection) -> Taxonomy:
+    tags = conn.execute("SELECT pos, id, name, level, category, parent_id FROM tags ORDER BY pos").fetchall()
+    children: List[List[str]] = [[] for _ in tags]
+    for parent_pos, child_id in conn.execute("SELECT parent_pos, child_id FROM tag_children ORDER BY parent_pos, rank"):
+        children[parent_pos].append(child_id)
+    return Taxonomy(ids=[t[1] for t in tags], names=[t[2] for t in tags], levels=[t[3] for t in tags],
+                    categories=[t[4] for t in tags], children_ids=children,
+                    declared_parent_ids=[t[5] for t in tags])
+
+
+def export_hierarchy(conn: sqlite3.Connection) -> dict:
+    return build_hierarchy_mapping(load_taxonomy(conn))
+
+
+def export_metadata(conn: sqlite3.Connection) -> dict:
+    """
+    nodeMetadata with totalPapers = distinct papers whose l3 names match an
+    L3 node's displayName, rolled up the node's "children" edges, counted
+    by a recursive CTE (see process_new.fill_total_papers).
+    """
+    node_metadata = build_node_metadata(load_taxonomy(conn))
+    conn.execute("CREATE TEMP TABLE meta_nodes (category TEXT, tag_id TEXT, level INTEGER, display_name TEXT)")
+    conn.execute("CREATE TEMP TABLE meta_edges (category TEXT, parent TEXT, child TEXT)")
+    conn.executemany("INSERT INTO meta_nodes VALUES (?, ?, ?, ?)", [
+        (category, tag_id, entry["level"], entry["displayName"])
+        for category, nodes in node_metadata.items() for tag_id, entry in nodes.items()
+    ])
+    conn.executemany("INSERT INTO meta_edges VALUES (?, ?, ?)", [
+        (category, tag_id, child_id)
+        for category, nodes in node_metadata.items() for tag_id, entry in nodes.items()
+        for child_id in entry.get("children", [])
+        if child_id in nodes and nodes[child_id].get("level") == entry["level"] + 1
+    ])
+    totals = conn.execute("""
+        WITH RECURSIVE under (category, node, leaf) AS (
+            SELECT category, tag_id, tag_id FROM meta_nodes WHERE level = 3
+            UNION
+            SELECT e.category, e.parent, u.leaf
+            FROM meta_edges e JOIN under u ON u.category = e.category AND u.node = e.child
+        )
+        SELECT u.category, u.node, COUNT(DISTINCT pt.paper_pos)
+        FROM under u
+        JOIN meta_nodes leaf ON leaf.category = u.category AND leaf.tag_id = u.leaf
+        JOIN labels lb ON lb.domain = u.category AND lb.level = 3 AND lb.name = leaf.display_name
+        JOIN paper_tags pt ON pt.label_id = lb.id
+        GROUP BY u.category, u.node
+    """).fetchall()
+    conn.execute("DROP TABLE meta_nodes")
+    conn.execute("DROP TABLE meta_edges")
+    for category, tag_id, total in totals:
+        node_metadata[category][tag_id]["totalPapers"] = total
+    apply_colors(node_metadata, TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME)
+    return node_metadata
+
+
+def export_connections(conn: sqlite3.Connection) -> dict:
+    """
+    crossLevelConnections from one self-join of paper_tags per domain pair,
+    grouped on label ids. first_seen packs (paper, domain pair, left level,
+    right level, left rank, right rank) into one integer: the order
+    build_connections_loops meets the pairs in, which is the key order of its output.
+    """
+    base = rank_base(conn)
+    conn.execute("CREATE TEMP TABLE domain_pairs (pair_idx INTEGER, left_domain TEXT, right_domain TEXT)")
+    conn.executemany("INSERT INTO domain_pairs VALUES (?, ?, ?)",
+                     [(i, left, right) for i, (left, right) in enumerate(DOMAIN_PAIRS)])
+    conn.execute("""
+        CREATE TEMP TABLE pair_papers AS
+        SELECT l.label_id AS left_label, r.label_id AS right_label, l.paper_pos AS paper_pos,
+               MIN(((((l.paper_pos * :pairs + dp.pair_idx) * 3 + ll.level - 1) * 3 + rl.level - 1)
+                    * :base + l.rank) * :base + r.rank) AS first_seen
+        FROM domain_pairs dp
+        JOIN labels ll ON ll.domain = dp.left_domain
+        JOIN paper_tags l ON l.label_id = ll.id
+        JOIN paper_tags r ON r.paper_pos = l.paper_pos
+        JOIN labels rl ON rl.id = r.label_id AND rl.domain = dp.right_domain
+        GROUP BY l.label_id, r.label_id, l.paper_pos
+    """, {"pairs": len(DOMAIN_PAIRS), "base": base})
+    conn.execute("CREATE INDEX temp.pair_papers_by_pair ON pair_papers (left_label, right_label, paper_pos)")
+
+    axis = year_axis(conn)
+    year_index = {year: i for i, year in enumerate(axis)}
+    connections: Dict[str, Dict[str, dict]] = {}
+    by_labels: Dict[tuple, dict] = {}
+    for left_label, right_label, l_domain, l_level, l_name, r_domain, r_level, r_name, count in conn.execute("""
+            SELECT pp.left_label, pp.right_label, ll.domain, ll.level, ll.name, rl.domain, rl.level, rl.name,
+                   COUNT(*)
+            FROM pair_papers pp
+            JOIN labels ll ON ll.id = pp.left_label
+            JOIN labels rl ON rl.id = pp.right_label
+            GROUP BY pp.left_label, pp.right_label ORDER BY MIN(pp.first_seen)"""):
+        conn_type = f"{l_domain}_L{l_level}__{r_domain}_L{r_level}"
+        by_labels[(left_label, right_label)] = connections.setdefault(conn_type, {})[f"{l_name}__{r_name}"] = {
+            "paperIds": [], "paperCount": count, "connectionStrength": classify_strength(count),
+            "yearCounts": [0] * len(axis), "awardedYearCounts": [0] * len(axis),
+        }
+    for left_label, right_label, paper_id in conn.execute("""
+            SELECT pp.left_label, pp.right_label, p.id FROM pair_papers pp JOIN papers p ON p.pos = pp.paper_pos
+            ORDER BY pp.left_label, pp.right_label, pp.paper_pos"""):
+        by_labels[(left_label, right_label)]["paperIds"].append(paper_id)
+    for left_label, right_label, year, count, awarded in conn.execute("""
+            SELECT pp.left_label, pp.right_label, p.year, COUNT(*), SUM(p.is_awarded)
+            FROM pair_papers pp JOIN papers p ON p.pos = pp.paper_pos
+            WHERE p.year IS NOT NULL
+            GROUP BY pp.left_label, pp.right_label, p.year"""):
+        stats = by_labels[(left_label, right_label)]
+        stats["yearCounts"][year_index[year]] = count
+        stats["awardedYearCounts"][year_index[year]] = awarded
+    for table in ("pair_papers", "domain_pairs"):
+        conn.execute(f"DROP TABLE {table}")
+
+    paper_ids = [{"id": row[0]} for row in conn.execute("SELECT id FROM papers ORDER BY pos")]
+    return assemble_output(connections, paper_ids, axis)
+
+
+def export_stats(conn: sqlite3.Connection) -> dict:
+    """
+    precomputedStats from the (paper, stats node) rows: every l3 tag is
+    resolved to its first allTagsById entry and that entry's parentId chain
+    (TagResolver.resolve), and counts per (node, year) are one GROUP BY.
+    first_seen packs (paper, domain, rank, depth) like paper_node_keys orders them.
+    """
+    base = rank_base(conn)
+    conn.execute("""CREATE TEMP TABLE stats_domains (domain TEXT, domain_idx INTEGER, stats_key TEXT,
+                                                     category TEXT, tag_level INTEGER)""")
+    conn.executemany("INSERT INTO stats_domains VALUES (?, ?, ?, ?, ?)", [
+        (domain, i, stats_key, category, level)
+        for i, (domain, (stats_key, category, level)) in enumerate(STATS_DOMAINS.items())
+    ])
+    # First tag per (category, level, name) with its parent and grandparent names;
+    # the joins stop at a parentId cycle like Taxonomy.declared_ancestor_indices
+    conn.execute("""
+        CREATE TEMP TABLE leaf_paths AS
+        SELECT t.category, t.level, t.name, p.name AS parent_name, g.name AS grand_name
+        FROM tags t
+        LEFT JOIN tags p ON p.id = t.parent_id AND p.pos <> t.pos
+        LEFT JOIN tags g ON g.id = p.parent_id AND g.pos NOT IN (t.pos, p.pos)
+        WHERE t.pos = (SELECT MIN(f.pos) FROM tags f
+                       WHERE f.category = t.category AND f.level = t.level AND f.name = t.name)
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE node_papers AS
+        WITH leaves AS (
+            SELECT pt.paper_pos, (pt.paper_pos * :domains + sd.domain_idx) * :base + pt.rank AS seen,
+                   sd.stats_key,
+                   CASE WHEN sd.stats_key = :platform THEN sd.category ELSE lp.grand_name END AS top,
+                   lp.parent_name AS sub, lb.name AS tag
+            FROM labels lb
+            JOIN stats_domains sd ON sd.domain = lb.domain
+            JOIN leaf_paths lp ON lp.category = sd.category AND lp.level = sd.tag_level AND lp.name = lb.name
+            JOIN paper_tags pt ON pt.label_id = lb.id
+            WHERE lb.level = 3
+        ),
+        nodes AS (
+            SELECT paper_pos, seen * 3 AS seen, stats_key, top, NULL AS sub, NULL AS tag, 0 AS depth
+            FROM leaves WHERE top IS NOT NULL AND sub IS NOT NULL
+            UNION ALL
+            SELECT paper_pos, seen * 3 + 1, stats_key, top, sub, NULL, 1
+            FROM leaves WHERE top IS NOT NULL AND sub IS NOT NULL
+            UNION ALL
+            SELECT paper_pos, seen * 3 + 2, stats_key, top, sub, tag, 2
+            FROM leaves WHERE top IS NOT NULL AND sub IS NOT NULL
+        )
+        SELECT stats_key, top, sub, tag, depth, paper_pos, MIN(seen) AS first_seen
+        FROM nodes GROUP BY stats_key, top, sub, tag, depth, paper_pos
+    """, {"domains": len(STATS_DOMAINS), "base": base, "platform": PLATFORM_STATS_KEY})
+
+    node_order = conn.execute("""
+        SELECT stats_key, top, sub, tag, depth FROM node_papers
+        GROUP BY stats_key, top, sub, tag, depth ORDER BY MIN(first_seen)""").fetchall()
+    # (node, year) -> (total, awarded); year None is the papers without a year,
+    # OVERALL_KEY the sum over every year
+    cells: Dict[tuple, tuple] = {}
+    for stats_key, top, sub, tag, depth, year, total, awarded in conn.execute("""
+            SELECT n.stats_key, n.top, n.sub, n.tag, n.depth, p.year, COUNT(*), SUM(p.is_awarded)
+            FROM node_papers n JOIN papers p ON p.pos = n.paper_pos
+            GROUP BY n.stats_key, n.top, n.sub, n.tag, n.depth, p.year"""):
+        node = (stats_key, top, sub, tag, depth)
+        cells[node + (year,)] = (total, awarded)
+        overall = cells.get(node + (OVERALL_KEY,), (0, 0))
+        cells[node + (OVERALL_KEY,)] = (overall[0] + total, overall[1] + awarded)
+    year_totals = {year: (total, awarded) for year, total, awarded in conn.execute(
+        "SELECT year, COUNT(*), SUM(is_awarded) FROM papers GROUP BY year")}
+    for table in ("node_papers", "leaf_paths", "stats_domains"):
+        conn.execute(f"DROP TABLE {table}")
+
+    axis = year_axis(conn)
+    yearly_stats: Dict[str, dict] = {}
+    for column in axis + [OVERALL_KEY]:
+        by_category: Dict[str, dict] = {}
+        for node in node_order:
+            total, awarded = cells.get(node + (column,), (0, 0))
+            if not total:
+                continue
+            counts = {"total": total, "awarded": awarded}
+            stats_key, top, sub, tag, depth = node
+            category_entry = by_category.setdefault(stats_key, {})
+            if depth == 0:
+                category_entry[top] = {**counts, "subCategory": {}}
+            elif depth == 1:
+                category_entry[top]["subCategory"][sub] = {**counts, "tags": {}}
+            else:
+                category_entry[top]["subCategory"][sub]["tags"][tag] = counts
+        if column == OVERALL_KEY:
+            total = sum(t for t, _ in year_totals.values())
+            awarded = sum(a for _, a in year_totals.values())
+        else:
+            total, awarded = year_totals[column]
+        yearly_stats[column] = {"total": total, "awarded": awarded, "regular": total - awarded,
+                                "byCategory": by_category}
+    return {"yearlyStats": yearly_stats}
+
+
+EXPORTERS = {
+    "hierarchy": export_hierarchy,
+    "metadata": export_metadata,
+    "connections": export_connections,
+    "stats": export_stats,
+}
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def run_query(conn: sqlite3.Connection, sql: str, as_json: bool):
+    cursor = conn.execute(sql)
+    columns = [column[0] for column in cursor.description or []]
+    if as_json:
+        json.dump([dict(zip(columns, row)) for row in cursor], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    print("\t".join(columns))
+    for row in cursor:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite store of the corpus and SQL-generated data files")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database path")
+    add_profile_argument(parser, "corpus_db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="(re)load the database from the JSON files")
+    ingest_parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json (or .ndjson) path")
+    ingest_parser.add_argument("--tags", default=ALL_TAGS_FILE, help="allTagsById.json path")
+
+    export_parser = commands.add_parser("export", help="write data files generated by SQL aggregates")
+    export_parser.add_argument("--output-dir", default=DATA_DIR, help="data directory to write into")
+    export_parser.add_argument("--only", nargs="+", choices=list(EXPORTS), default=list(EXPORTS),
+                               help="files to write (default: all)")
+
+    query_parser = commands.add_parser("query", help="run one SQL statement and print the rows")
+    query_parser.add_argument("sql")
+    query_parser.add_argument("--json", action="store_true", help="print the rows as JSON objects")
+    args = parser.parse_args()
+
+    if args.command != "ingest" and not os.path.exists(args.db):
+        raise SystemExit(f"{args.db} does not exist; run `python corpus_db.py ingest` first")
+    profiler = Profiler("corpus_db", profile_path("corpus_db", args.profile))
+    conn = connect(args.db)
+    try:
+        if args.command == "ingest":
+            with profiler.stage("ingest"):
+                counts = ingest(conn, args.papers, args.tags)
+                for table, count in counts.items():
+                    profiler.count(table, count)
+            print(f"Ingested {counts['papers']} papers and {counts['tags']} tags into {args.db}")
+        elif args.command == "export":
+            for name in args.only:
+                with profiler.stage(name):
+                    output = EXPORTERS[name](conn)
+                path = os.path.join(args.output_dir, EXPORTS[name])
+                if name == "stats":
+                    paper_ids = [row[0] for row in conn.execute("SELECT id FROM papers")]
+                    output[LAST_PAPER_NUMBER_KEY] = last_paper_number(paper_ids, previous_last_paper_number(path))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write_json(path, output)
+                print(f"{name} written to {path}")
+        else:
+            run_query(conn, args.sql, args.json)
+    finally:
+        conn.close()
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,25 @@
 
 from __future__ import annotations
 
+import argparse
 import json
-from collections import defaultdict
 from itertools import product
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, List, Optional
+
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+from paper_bitset import BITSET_ENCODING, RLE_ENCODING, to_bitset_format
 
 # ---------------------------------------------------------------------------
 # Configuration ----------------------------------------------------------------
 
-PAPERS_FILE = "F:/202502/CHIvis/client/public/data/processedPapers.json"
-HIERARCHY_FILE = "F:/202502/CHIvis/client/public/data/hierarchyMapping.json"
-NODE_META_FILE = "F:/202502/CHIvis/client/public/data/nodeMetadata.json"
-OUTPUT_FILE = "F:/202502/CHIvis/client/public/data/crossLevelConnections.json"
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+PAPERS_FILE = str(DATA_DIR / "main" / "processedPapers.json")
+HIERARCHY_FILE = str(DATA_DIR / "main" / "hierarchyMapping.json")
+NODE_META_FILE = str(DATA_DIR / "main" / "nodeMetadata.json")
+OUTPUT_FILE = str(DATA_DIR / "interaction" / "crossLevelConnections.json")
 
 # Tag domain keys
 PLATFORM_CONTENT = "研究涉及平台-内容形式"
@@ -27,6 +33,9 @@ LEVELS = ["l1", "l2", "l3"]
 STRONG_THR = 20
 MEDIUM_THR = 10
 
+# levelCombinations: 3^3 combinations for (Platform domain, Research Content, Research Method)
+LEVEL_COMBINATIONS = ["_".join(combo) for combo in product(["L1", "L2", "L3"], repeat=3)]
+
 # ---------------------------------------------------------------------------
 # Helper functions -----------------------------------------------------------
 
@@ -48,89 +57,367 @@ def add_connection(store: Dict[str, Dict[str, Dict[str, object]]],
     info["paperCount"] += 1
 
 # ---------------------------------------------------------------------------
-# Main -----------------------------------------------------------------------
+# Connection builders ----------------------------------------------------------
 
-def main():
-    # Load data files
-    with open(PAPERS_FILE, "r", encoding="utf-8") as f:
-        papers_data = json.load(f)
+# (left domain, right domain) pairs, in output order:
+#   A. PLATFORM_CONTENT vs RESEARCH_CONTENT
+#   B. PLATFORM_CONTENT vs RESEARCH_METHOD
+#   C. RESEARCH_CONTENT vs RESEARCH_METHOD
+#   D. PLATFORM_ATTR vs RESEARCH_CONTENT
+#   E. PLATFORM_ATTR vs RESEARCH_METHOD
+DOMAIN_PAIRS = [
+    (PLATFORM_CONTENT, RESEARCH_CONTENT),
+    (PLATFORM_CONTENT, RESEARCH_METHOD),
+    (RESEARCH_CONTENT, RESEARCH_METHOD),
+    (PLATFORM_ATTR, RESEARCH_CONTENT),
+    (PLATFORM_ATTR, RESEARCH_METHOD),
+]
+
+# "sparse" is used when numpy and scipy are installed, "loops" otherwise
+BACKENDS = ["loops", "sparse"]
+
+# Pruning: rank the pairs per source node or per connection type
+PRUNE_SCOPES = ["source", "type"]
 
-    # connections[conn_type][labelPair] = {paperCount, paperIds, connectionStrength}
+# "expanded": paperIds lists per pair (what the dashboard loads today)
+# "bitset":   paper membership as bitmaps over a shared paperIndex (paper_bitset.py)
+# "rle":      same, run-length encoded; smallest when most pairs are weak
+OUTPUT_FORMATS = {
+    "expanded": None,
+    "bitset": BITSET_ENCODING,
+    "rle": RLE_ENCODING,
+}
+
+
+def extract_domain(tags: Dict[str, object], domain_key: str) -> Dict[str, List[str]]:
+    """Return dict(level -> List[str]) for one domain of a paper's tags."""
+    return tags.get(domain_key, {}) if isinstance(tags.get(domain_key, {}), dict) else {}
+
+
+def paper_connection_keys(paper: dict) -> List[tuple]:
+    """Distinct (conn_type, labelPair) keys one paper contributes to."""
+    tags = paper.get("tags", {})
+    keys: Dict[tuple, None] = {}
+    for left_domain, right_domain in DOMAIN_PAIRS:
+        left_tags = extract_domain(tags, left_domain)
+        right_tags = extract_domain(tags, right_domain)
+        for l_level, l_tags in left_tags.items():
+            for r_level, r_tags in right_tags.items():
+                conn_type = f"{left_domain}_{l_level.upper()}__{right_domain}_{r_level.upper()}"
+                for l in l_tags:
+                    for r in r_tags:
+                        keys[(conn_type, f"{l}__{r}")] = None
+    return list(keys)
+
+
+def build_connections_loops(papers: List[dict]) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """Reference builder: one add_connection call per (left tag, right tag, paper)."""
+    # connections[conn_type][labelPair] = {paperCount, paperIds}
     connections: Dict[str, Dict[str, Dict[str, object]]] = {}
 
-    # Iterate over papers
-    for paper in papers_data.get("papers", []):
+    # Helper to iterate over level items
+    def iter_pairs(left: Dict[str, List[str]], right: Dict[str, List[str]]):
+        for l_level, l_tags in left.items():
+            for r_level, r_tags in right.items():
+                for l in l_tags:
+                    for r in r_tags:
+                        yield l_level.upper(), r_level.upper(), l, r
+
+    for paper in papers:
         pid = paper.get("id")
         tags = paper.get("tags", {})
+        for left_domain, right_domain in DOMAIN_PAIRS:
+            left_tags = extract_domain(tags, left_domain)
+            right_tags = extract_domain(tags, right_domain)
+            for l_lv, r_lv, l, r in iter_pairs(left_tags, right_tags):
+                conn_type = f"{left_domain}_{l_lv}__{right_domain}_{r_lv}"
+                add_connection(connections, conn_type, l, r, pid)
 
-        # Extract levels for each domain -> dict(level -> List[str])
-        def extract(domain_key: str) -> Dict[str, List[str]]:
-            return tags.get(domain_key, {}) if isinstance(tags.get(domain_key, {}), dict) else {}
-
-        platform_content_tags = extract(PLATFORM_CONTENT)
-        platform_attr_tags = extract(PLATFORM_ATTR)
-        research_content_tags = extract(RESEARCH_CONTENT)
-        research_method_tags = extract(RESEARCH_METHOD)
-
-        # Helper to iterate over level items
-        def iter_pairs(left: Dict[str, List[str]], right: Dict[str, List[str]]):
-            for l_level, l_tags in left.items():
-                for r_level, r_tags in right.items():
-                    for l in l_tags:
-                        for r in r_tags:
-                            yield l_level.upper(), r_level.upper(), l, r
-
-        # A. PLATFORM_CONTENT vs RESEARCH_CONTENT
-        for l_lv, r_lv, l, r in iter_pairs(platform_content_tags, research_content_tags):
-            conn_type = f"研究涉及平台-内容形式_{l_lv}__研究内容_{r_lv}"
-            add_connection(connections, conn_type, l, r, pid)
-
-        # B. PLATFORM_CONTENT vs RESEARCH_METHOD
-        for l_lv, r_lv, l, r in iter_pairs(platform_content_tags, research_method_tags):
-            conn_type = f"研究涉及平台-内容形式_{l_lv}__研究方法_{r_lv}"
-            add_connection(connections, conn_type, l, r, pid)
-
-        # C. RESEARCH_CONTENT vs RESEARCH_METHOD
-        for l_lv, r_lv, l, r in iter_pairs(research_content_tags, research_method_tags):
-            conn_type = f"研究内容_{l_lv}__研究方法_{r_lv}"
-            add_connection(connections, conn_type, l, r, pid)
-
-        # D. PLATFORM_ATTR vs RESEARCH_CONTENT
-        for l_lv, r_lv, l, r in iter_pairs(platform_attr_tags, research_content_tags):
-            conn_type = f"研究涉及平台-平台属性_{l_lv}__研究内容_{r_lv}"
-            add_connection(connections, conn_type, l, r, pid)
-
-        # E. PLATFORM_ATTR vs RESEARCH_METHOD
-        for l_lv, r_lv, l, r in iter_pairs(platform_attr_tags, research_method_tags):
-            conn_type = f"研究涉及平台-平台属性_{l_lv}__研究方法_{r_lv}"
-            add_connection(connections, conn_type, l, r, pid)
-
-    # Compute connectionStrength and deduplicate paperIds
-    for conn_type, pair_map in connections.items():
+    # Deduplicate paperIds
+    for pair_map in connections.values():
         for stats in pair_map.values():
             unique_ids = list(dict.fromkeys(stats["paperIds"]))  # preserve order
             stats["paperIds"] = unique_ids
             stats["paperCount"] = len(unique_ids)
+    return connections
+
+
+def build_incidence(papers: List[dict], domain_key: str, level: str):
+    """
+    Paper x tag incidence matrix (CSC, 0/1) for one domain and level, together
+    with the tag labels in column order (order of first appearance).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    columns: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for paper_idx, paper in enumerate(papers):
+        labels = extract_domain(paper.get("tags", {}), domain_key).get(level, [])
+        for label in dict.fromkeys(labels):
+            rows.append(paper_idx)
+            cols.append(columns.setdefault(label, len(columns)))
+
+    data = np.ones(len(rows), dtype=np.int32)
+    matrix = sparse.csc_matrix((data, (rows, cols)), shape=(len(papers), len(columns)))
+    matrix.sort_indices()
+    return matrix, list(columns)
+
+
+def build_connections_sparse(papers: List[dict]) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """
+    Sparse-matrix builder: one incidence matrix per (domain, level); each
+    connection type is the product A_left.T @ A_right, whose nonzero cells are
+    the co-occurring tag pairs and whose values are the paper counts. Paper
+    lists are recovered only for nonzero cells by intersecting two columns.
+    Types and pairs are put in the order build_connections_loops meets them,
+    so both backends write the same file.
+    """
+    import numpy as np
+
+    paper_ids = [paper.get("id") for paper in papers]
+    domains = dict.fromkeys(domain for pair in DOMAIN_PAIRS for domain in pair)
+    incidence = {
+        (domain, level): build_incidence(papers, domain, level)
+        for domain in domains
+        for level in LEVELS
+    }
+
+    def position(paper_idx: int, domain: str, level: str, label: str) -> tuple:
+        # Where the loops builder meets this label in the paper: its level, then its rank
+        domain_tags = extract_domain(papers[paper_idx].get("tags", {}), domain)
+        return list(domain_tags).index(level), domain_tags[level].index(label)
+
+    ranked = []
+    for pair_rank, (left_domain, right_domain) in enumerate(DOMAIN_PAIRS):
+        for l_level, r_level in product(LEVELS, repeat=2):
+            left_matrix, left_labels = incidence[(left_domain, l_level)]
+            right_matrix, right_labels = incidence[(right_domain, r_level)]
+            if not left_labels or not right_labels:
+                continue
+
+            counts = (left_matrix.T @ right_matrix).tocoo()
+            if counts.nnz == 0:
+                continue
+
+            pairs = []
+            for i, j, count in zip(counts.row, counts.col, counts.data):
+                left_papers = left_matrix.indices[left_matrix.indptr[i]:left_matrix.indptr[i + 1]]
+                right_papers = right_matrix.indices[right_matrix.indptr[j]:right_matrix.indptr[j + 1]]
+                shared = np.intersect1d(left_papers, right_papers, assume_unique=True)
+                first = int(shared[0])
+                l_pos, r_pos = (position(first, left_domain, l_level, left_labels[i]),
+                                position(first, right_domain, r_level, right_labels[j]))
+                pairs.append(((first, l_pos[1], r_pos[1]), f"{left_labels[i]}__{right_labels[j]}", {
+                    "paperIds": [paper_ids[p] for p in shared],
+                    "paperCount": int(count),
+                }, (first, pair_rank, l_pos[0], r_pos[0])))
+            pairs.sort(key=lambda entry: entry[0])
+            conn_type = f"{left_domain}_{l_level.upper()}__{right_domain}_{r_level.upper()}"
+            ranked.append((pairs[0][3], conn_type, {label_key: stats for _, label_key, stats, _ in pairs}))
+
+    return {conn_type: pair_map for _, conn_type, pair_map in sorted(ranked, key=lambda entry: entry[0])}
+
+
+def default_backend() -> str:
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        return "loops"
+    return "sparse"
+
+
+def build_connections(papers: List[dict], backend: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """Connections with the given backend, or the default_backend()."""
+    if (backend or default_backend()) == "sparse":
+        return build_connections_sparse(papers)
+    return build_connections_loops(papers)
+
+
+def build_year_axis(papers: List[dict]) -> List[str]:
+    """The sorted years of the filter cube."""
+    return sorted({str(p.get("year")) for p in papers if p.get("year")})
+
+
+def year_cell(paper: dict, year_index: Dict[str, int]) -> tuple:
+    """(year axis index or None, awarded) of one paper."""
+    year = paper.get("year")
+    return (year_index.get(str(year)) if year else None), bool(paper.get("isAwarded"))
+
+
+def add_filter_cube(connections: Dict[str, Dict[str, Dict[str, object]]],
+                    papers: List[dict]) -> List[str]:
+    """
+    Year x award cube: every pair gets "yearCounts" and "awardedYearCounts",
+    paper counts per year aligned to the returned year axis (regular = the
+    difference). A link width under the year/award filters is then a sum over
+    the selected years. Papers without a year only count in paperCount.
+    """
+    year_axis = build_year_axis(papers)
+    year_index = {year: i for i, year in enumerate(year_axis)}
+    paper_cell = {p.get("id"): year_cell(p, year_index) for p in papers}
+    for pair_map in connections.values():
+        for stats in pair_map.values():
+            year_counts = [0] * len(year_axis)
+            awarded_counts = [0] * len(year_axis)
+            for pid in stats["paperIds"]:
+                year_idx, awarded = paper_cell[pid]
+                if year_idx is None:
+                    continue
+                year_counts[year_idx] += 1
+                if awarded:
+                    awarded_counts[year_idx] += 1
+            stats["yearCounts"] = year_counts
+            stats["awardedYearCounts"] = awarded_counts
+    return year_axis
+
+
+def add_strength(connections: Dict[str, Dict[str, Dict[str, object]]]):
+    for pair_map in connections.values():
+        for stats in pair_map.values():
             stats["connectionStrength"] = classify_strength(stats["paperCount"])
 
-    # Build levelCombinations: 3^3 combinations for (Platform domain, Research Content, Research Method)
-    lvl_codes = ["L1", "L2", "L3"]
-    level_combos = ["_".join(combo) for combo in product(lvl_codes, repeat=3)]
+
+def prune_connections(connections: Dict[str, Dict[str, Dict[str, object]]],
+                      top_k: Optional[int] = None, scope: str = "source",
+                      min_support: int = 1) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """
+    Keep only the pairs with at least `min_support` papers that rank in the
+    top_k by paperCount of their source node (scope "source") or of their
+    connection type (scope "type"); ties keep the build order. Pruned in place.
+
+    The dropped pairs of each source node are folded into one "other" link,
+    returned as {conn_type: {source label: stats}}. Its paperCount and count
+    vectors are sums over the folded pairs, so the outgoing link total of every
+    node stays exact; paperIds is their union and linkCount how many were folded.
+    Run after add_strength / add_filter_cube.
+    """
+    other_links: Dict[str, Dict[str, Dict[str, object]]] = {}
+    for conn_type, pair_map in connections.items():
+        groups: Dict[str, List[str]] = {}
+        for label_key in pair_map:
+            group = label_key.split("__", 1)[0] if scope == "source" else conn_type
+            groups.setdefault(group, []).append(label_key)
+
+        dropped: List[str] = []
+        for label_keys in groups.values():
+            ranked = sorted(label_keys, key=lambda key: -pair_map[key]["paperCount"])
+            kept = [key for key in ranked if pair_map[key]["paperCount"] >= min_support]
+            if top_k is not None:
+                kept = kept[:top_k]
+            kept_set = set(kept)
+            dropped.extend(key for key in label_keys if key not in kept_set)
+
+        for label_key in dropped:
+            stats = pair_map.pop(label_key)
+            source = label_key.split("__", 1)[0]
+            other = other_links.setdefault(conn_type, {}).setdefault(
+                source, {"paperIds": {}, "paperCount": 0, "linkCount": 0})
+            other["paperIds"].update(dict.fromkeys(stats["paperIds"]))  # ordered set until the end
+            other["paperCount"] += stats["paperCount"]
+            other["linkCount"] += 1
+            for vector in ("yearCounts", "awardedYearCounts"):
+                if vector in stats:
+                    other[vector] = [a + b for a, b in zip(other.get(vector, [0] * len(stats[vector])),
+                                                           stats[vector])]
+
+    for source_map in other_links.values():
+        for other in source_map.values():
+            other["paperIds"] = list(other["paperIds"])
+            other["connectionStrength"] = classify_strength(other["paperCount"])
+    return other_links
+
+
+def assemble_output(connections: Dict[str, Dict[str, Dict[str, object]]], papers: List[dict],
+                    year_axis, fmt: str = "expanded",
+                    other_links: Optional[Dict[str, Dict[str, Dict[str, object]]]] = None,
+                    pruning: Optional[dict] = None) -> dict:
+    """The crossLevelConnections.json payload in the given output format."""
+    encoding = OUTPUT_FORMATS[fmt]
+    paper_ids = [paper.get("id") for paper in papers]
+    if encoding:
+        output = to_bitset_format(connections, paper_ids, encoding)
+    else:
+        output = {"connections": connections}
+    if pruning is not None:
+        # Same nesting as connections, keyed by source label instead of pair
+        output["otherLinks"] = (to_bitset_format(other_links or {}, paper_ids, encoding)["connections"]
+                                if encoding else other_links or {})
+        output["pruning"] = pruning
+    if year_axis is not None:
+        output["yearAxis"] = year_axis
+    output["levelCombinations"] = LEVEL_COMBINATIONS
+    return output
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build crossLevelConnections.json")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json path")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="crossLevelConnections.json path")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="default: 'sparse' when numpy and scipy are installed, else 'loops'")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="expanded",
+                        help="'bitset'/'rle' store paper membership as bitsets over paperIndex")
+    parser.add_argument("--no-cube", action="store_true",
+                        help="omit the per-year / awarded count vectors (yearAxis)")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="keep only the k strongest pairs per --prune-scope; the rest go to otherLinks")
+    parser.add_argument("--prune-scope", choices=PRUNE_SCOPES, default="source",
+                        help="rank pairs per source node or per connection type (with --top-k)")
+    parser.add_argument("--min-support", type=int, default=1,
+                        help="drop pairs with fewer papers into otherLinks")
+    add_profile_argument(parser, "crossLevelConnections")
+    args = parser.parse_args()
+    args.backend = args.backend or default_backend()
+    profiler = Profiler("crossLevelConnections", profile_path("crossLevelConnections", args.profile))
+
+    # Load data files
+    with profiler.stage("load"):
+        with open(args.papers, "r", encoding="utf-8") as f:
+            papers_data = json.load(f)
+        papers = papers_data.get("papers", [])
+        profiler.count("papers", len(papers))
+
+    with profiler.stage(f"connections:{args.backend}"):
+        connections = build_connections(papers, args.backend)
+        profiler.count("connectionTypes", len(connections))
+        profiler.count("pairs", sum(len(pair_map) for pair_map in connections.values()))
+        profiler.count("memberships", sum(stats["paperCount"] for pair_map in connections.values()
+                                          for stats in pair_map.values()))
+
+    # Compute connectionStrength
+    with profiler.stage("strength"):
+        add_strength(connections)
+
+    with profiler.stage("cube"):
+        year_axis = None if args.no_cube else add_filter_cube(connections, papers)
+
+    other_links, pruning = None, None
+    if args.top_k is not None or args.min_support > 1:
+        with profiler.stage("prune"):
+            pruning = {"topK": args.top_k, "scope": args.prune_scope, "minSupport": args.min_support}
+            other_links = prune_connections(connections, args.top_k, args.prune_scope, args.min_support)
+            profiler.count("keptPairs", sum(len(pair_map) for pair_map in connections.values()))
+            profiler.count("otherLinks", sum(len(source_map) for source_map in other_links.values()))
 
     # Print combinations for verification
     print("All level combinations (Platform/Content/Method):")
-    for combo in level_combos:
+    for combo in LEVEL_COMBINATIONS:
         print(combo)
-    print(f"Total combinations: {len(level_combos)}")
+    print(f"Total combinations: {len(LEVEL_COMBINATIONS)}")
 
-    output = {
-        "connections": connections,
-        "levelCombinations": level_combos,
-    }
+    with profiler.stage(f"encode:{args.format}"):
+        output = assemble_output(connections, papers, year_axis, args.format, other_links, pruning)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-    print(f"Cross-level connections written to {OUTPUT_FILE}")
+    with profiler.stage("write"):
+        write_json(args.output, output)
+        profiler.count("bytes", Path(args.output).stat().st_size)
+    print(f"Cross-level connections written to {args.output}")
+    profiler.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,293 @@
+"""
+Add or remove papers without rebuilding the whole pipeline.
+
+Only the papers in the batch are processed: their processedPapers entries
+are built with process_new.process_paper and their contributions are added
+to (or subtracted from) the derived files:
+
+    papers.csv                             rows appended / removed by their id column
+    raw/papers.json                        rows appended / removed
+    main/processedPapers.json              entries appended / removed
+    main/nodeMetadata.json                 totalPapers deltas (colors are kept)
+    main/nodePostings.json                 indices appended / dropped and renumbered, same encoding
+    interaction/crossLevelConnections.json paperIds, paperCount, connectionStrength, cube cells
+                                           (rebuilt when written with --top-k / --min-support)
+    layout/precomputedStats.json           year and overall counts, lastPaperNumber
+    sankeyLayouts/                         relaid out from the updated connections
+    search/                                postings appended / dropped and renumbered, same CJK buckets
+
+New papers are numbered after precomputedStats' lastPaperNumber, the highest
+number ever assigned, so a removed paper's id is not reused.
+
+The result equals a full rebuild of those files (up to key order). Files that
+do not exist are skipped. Afterwards run `python build.py --adopt` so the
+incremental build treats the patched files as up to date.
+
+    python incremental_update.py add new_papers.csv
+    python incremental_update.py add new_papers.json
+    python incremental_update.py remove paper_101 paper_102
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+import papers as raw_papers
+from artifacts import write_json
+from build import data_files
+from crossLevelConnections import (OUTPUT_FORMATS, add_filter_cube, add_strength, assemble_output,
+                                   build_connections, build_year_axis, classify_strength,
+                                   paper_connection_keys, prune_connections, year_cell)
+from node_postings import DELTA_ENCODING, add_paper, assemble_output as assemble_postings, decode_output, remove_papers
+from paper_bitset import from_bitset_format, to_bitset_format
+from precomputedStats import LAST_PAPER_NUMBER_KEY, apply_paper_delta, last_paper_number
+from sankey_layout import build_layouts, write_layouts
+from search_index import apply_index_delta
+from process_new import apply_total_papers_delta, build_total_papers_index, process_paper
+from tag_resolver import TagResolver
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+# ---------------------------------------------------------------------------
+# Helper functions -----------------------------------------------------------
+
+def load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path: str, data):
+    write_json(path, data)
+
+
+def read_batch(path: str) -> List[dict]:
+    """Raw paper rows from papers.csv-style CSV, a JSON list or NDJSON."""
+    if path.endswith(".csv"):
+        return list(raw_papers.iter_papers(path))
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def apply_connections_delta(connections: Dict[str, Dict[str, Dict[str, object]]],
+                            paper: dict, sign: int, year_index: Optional[Dict[str, int]] = None):
+    """
+    Add or remove one paper's id from every pair it belongs to. The pairs'
+    paperIds are ordered sets (dicts, see member_sets) during a batch. With a
+    year_index (year -> cube axis position) the pair's yearCounts /
+    awardedYearCounts cell of the paper also moves by one.
+    """
+    pid = paper["id"]
+    year_idx, awarded = year_cell(paper, year_index or {})
+    for conn_type, label_key in paper_connection_keys(paper):
+        pair_map = connections.setdefault(conn_type, {})
+        stats = pair_map.setdefault(label_key, {"paperIds": {}, "paperCount": 0})
+        if sign > 0:
+            stats["paperIds"][pid] = None
+        else:
+            stats["paperIds"].pop(pid, None)
+        stats["paperCount"] = len(stats["paperIds"])
+        stats["connectionStrength"] = classify_strength(stats["paperCount"])
+        if year_index is not None:
+            for vector in ("yearCounts", "awardedYearCounts"):
+                stats.setdefault(vector, [0] * len(year_index))
+            if year_idx is not None:
+                stats["yearCounts"][year_idx] += sign
+                if awarded:
+                    stats["awardedYearCounts"][year_idx] += sign
+        if not stats["paperCount"]:
+            del pair_map[label_key]
+            if not pair_map:
+                del connections[conn_type]
+
+
+def member_sets(connections: Dict[str, Dict[str, Dict[str, object]]], as_sets: bool):
+    """Turn every pair's paperIds into an insertion-ordered set (a dict) and back."""
+    for pair_map in connections.values():
+        for stats in pair_map.values():
+            stats["paperIds"] = dict.fromkeys(stats["paperIds"]) if as_sets else list(stats["paperIds"])
+
+
+def remap_year_vectors(connections: Dict[str, Dict[str, Dict[str, object]]],
+                       old_axis: List[str], new_axis: List[str]):
+    """
+    Move every pair's cube vectors onto a new year axis: new years start at
+    zero, dropped years are left out (no remaining paper has them, so after
+    the batch their cells would be zero anyway).
+    """
+    old_index = {year: i for i, year in enumerate(old_axis)}
+    positions = [old_index.get(year) for year in new_axis]
+    for pair_map in connections.values():
+        for stats in pair_map.values():
+            for vector in ("yearCounts", "awardedYearCounts"):
+                values = stats.get(vector)
+                if values is not None:
+                    stats[vector] = [0 if i is None else values[i] for i in positions]
+
+
+def rebuild_pruned_connections(output: dict, papers: List[dict]) -> dict:
+    """
+    A file written with --top-k / --min-support only keeps the pruned pairs as
+    per-node sums, which cannot take a delta: rebuild it with the same settings.
+    """
+    pruning = output["pruning"]
+    fmt = next(name for name, encoding in OUTPUT_FORMATS.items()
+               if encoding == output.get("membershipEncoding"))
+    connections = build_connections(papers)
+    add_strength(connections)
+    year_axis = add_filter_cube(connections, papers) if "yearAxis" in output else None
+    other_links = prune_connections(connections, pruning["topK"], pruning["scope"], pruning["minSupport"])
+    return assemble_output(connections, papers, year_axis, fmt, other_links, pruning)
+
+# ---------------------------------------------------------------------------
+# Update ---------------------------------------------------------------------
+
+def update(data_dir: str, added_rows: List[dict], removed_ids: List[str]) -> Dict[str, int]:
+    """
+    Apply one batch. `added_rows` are raw paper rows (new ids are assigned),
+    `removed_ids` are processedPapers ids. Returns the number of papers added
+    and removed.
+    """
+    path = data_files(data_dir)
+    resolver = TagResolver.from_file(path["all_tags"])
+    processed = load_json(path["processed_papers"])
+    papers = processed["papers"]
+    raw_rows = load_json(path["raw_papers"]) if os.path.exists(path["raw_papers"]) else None
+    # papers.csv is the source of the papers stage: patch it too, or the next
+    # build would regenerate raw/papers.json without the batch
+    csv_table = raw_papers.read_csv_table(path["papers_csv"]) if os.path.exists(path["papers_csv"]) else None
+
+    removed_set = set(removed_ids)
+    unknown = removed_set - {paper["id"] for paper in papers}
+    if unknown:
+        raise SystemExit(f"Unknown paper id(s): {', '.join(sorted(unknown))}")
+    removed_papers = [paper for paper in papers if paper["id"] in removed_set]
+    removed_indices = [idx for idx, paper in enumerate(papers) if paper["id"] in removed_set]
+
+    stats = load_json(path["precomputed_stats"]) if os.path.exists(path["precomputed_stats"]) else {}
+    number = last_paper_number([paper["id"] for paper in papers], stats.get(LAST_PAPER_NUMBER_KEY, 0)) + 1
+    new_rows, new_csv_rows, added_papers = [], [], []
+    for offset, row in enumerate(added_rows):
+        paper_id = f"paper_{number + offset:03d}"
+        row = {**row, "id": paper_id}
+        if csv_table is not None:
+            # Round-trip through the CSV columns, so raw/papers.json gets the
+            # same row the papers stage will produce from papers.csv
+            csv_row = raw_papers.to_csv_row(row, csv_table[0])
+            new_csv_rows.append(csv_row)
+            row = raw_papers.normalize_row(dict(csv_row), number + offset)
+        new_rows.append(row)
+        added_papers.append(process_paper(row, resolver, paper_id))
+
+    # papers.csv / processedPapers / raw papers
+    if csv_table is not None:
+        fieldnames, csv_rows = csv_table
+        csv_rows = [row for row in csv_rows if row[raw_papers.ID_COLUMN] not in removed_set] + new_csv_rows
+        raw_papers.write_csv_table(path["papers_csv"], fieldnames, csv_rows)
+    processed["papers"] = [paper for paper in papers if paper["id"] not in removed_set] + added_papers
+    save_json(path["processed_papers"], processed)
+    if raw_rows is not None:
+        raw_rows = [row for row in raw_rows if row.get("id") not in removed_set] + new_rows
+        save_json(path["raw_papers"], raw_rows)
+
+    deltas = [(paper, -1) for paper in removed_papers] + [(paper, 1) for paper in added_papers]
+
+    if os.path.exists(path["node_metadata"]):
+        node_metadata = load_json(path["node_metadata"])
+        index = build_total_papers_index(node_metadata)
+        for paper, sign in deltas:
+            apply_total_papers_delta(node_metadata, index, paper, sign)
+        save_json(path["node_metadata"], node_metadata)
+
+    if os.path.exists(path["node_postings"]):
+        # Posting lists index into the paper list: a removal renumbers them,
+        # the added papers are appended at the end
+        output = load_json(path["node_postings"])
+        postings = decode_output(output)
+        remove_papers(postings, removed_indices)
+        first = len(papers) - len(removed_indices)
+        for offset, paper in enumerate(added_papers):
+            add_paper(postings, first + offset, paper)
+        write_json(path["node_postings"], assemble_postings(processed["papers"], postings,
+                                                           output.get("encoding", DELTA_ENCODING)), compact=True)
+
+    if os.path.exists(path["cross_level_connections"]):
+        output = load_json(path["cross_level_connections"])
+        if "pruning" in output:
+            output = rebuild_pruned_connections(output, processed["papers"])
+        else:
+            encoding = output.get("membershipEncoding")
+            connections = from_bitset_format(output) if encoding else output["connections"]
+            year_axis, year_index = output.get("yearAxis"), None
+            if year_axis is not None:
+                # Only a batch that adds a new year or removes the last paper of
+                # one moves the axis; the vectors are then shifted, not recounted
+                new_axis = build_year_axis(processed["papers"])
+                if new_axis != year_axis:
+                    remap_year_vectors(connections, year_axis, new_axis)
+                    year_axis = new_axis
+                year_index = {year: i for i, year in enumerate(year_axis)}
+            member_sets(connections, True)
+            for paper, sign in deltas:
+                apply_connections_delta(connections, paper, sign, year_index)
+            member_sets(connections, False)
+            level_combos = output.get("levelCombinations", [])
+            if encoding:
+                output = to_bitset_format(connections, [paper["id"] for paper in processed["papers"]], encoding)
+            else:
+                output = {"connections": connections}
+            if year_axis is not None:
+                output["yearAxis"] = year_axis
+            output["levelCombinations"] = level_combos
+        save_json(path["cross_level_connections"], output)
+
+    if stats:
+        for paper, sign in deltas:
+            apply_paper_delta(stats["yearlyStats"], paper, resolver, sign)
+        stats[LAST_PAPER_NUMBER_KEY] = max(stats.get(LAST_PAPER_NUMBER_KEY, 0), number + len(added_papers) - 1)
+        save_json(path["precomputed_stats"], stats)
+
+    if os.path.exists(path["sankey_layouts_manifest"]) and os.path.exists(path["cross_level_connections"]):
+        manifest, files = build_layouts(load_json(path["cross_level_connections"])["connections"],
+                                        load_json(path["node_metadata"]),
+                                        load_json(path["platform_configuration"]).get("platformTypes", {}),
+                                        load_json(path["sankey_layout_config"]))
+        write_layouts(os.path.dirname(path["sankey_layouts_manifest"]), manifest, files)
+
+    if os.path.exists(path["search_manifest"]):
+        # Doc numbers index into the paper list, like nodePostings
+        apply_index_delta(os.path.dirname(path["search_manifest"]), load_json(path["search_manifest"]),
+                          removed_indices, added_papers)
+
+    return {"added": len(added_papers), "removed": len(removed_papers)}
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Add or remove papers and patch the derived data files")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="public/data directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_parser = sub.add_parser("add", help="append papers from a .csv, .json or .ndjson file")
+    add_parser.add_argument("input", help="papers in papers.csv columns, or raw papers.json rows")
+    remove_parser = sub.add_parser("remove", help="remove papers by processedPapers id")
+    remove_parser.add_argument("ids", nargs="+", help="paper ids, e.g. paper_012")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        result = update(args.data_dir, read_batch(args.input), [])
+    else:
+        result = update(args.data_dir, [], args.ids)
+    print(f"Added {result['added']} and removed {result['removed']} paper(s) in {args.data_dir}")
+    print("Run `python build.py --adopt` to mark the patched files as up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-stage instrumentation shared by the scripts in this directory.
+
+    profiler = Profiler("process_new", profile_path("process_new", args.profile))
+    with profiler.stage("load"):
+        ...
+        profiler.count("papers", len(papers))
+    profiler.finish()
+
+Every stage records wall time, the process RSS high-water mark and the item
+counts reported inside it. When a report is requested (--profile PATH, or
+the PIPELINE_PROFILE_DIR environment variable that build.py --profile sets)
+tracemalloc is switched on as well, so each stage also gets the peak of
+Python allocations made while it ran, and finish() writes the JSON report.
+Without a report the stages are only timed, which costs next to nothing.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+PROFILE_DIR_ENV = "PIPELINE_PROFILE_DIR"
+
+
+def profile_path(script: str, explicit: Optional[str] = None) -> Optional[str]:
+    """Report path for `script`: --profile if given, else $PIPELINE_PROFILE_DIR/<script>.json."""
+    if explicit:
+        return explicit
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    return os.path.join(profile_dir, f"{script}.json") if profile_dir else None
+
+
+def add_profile_argument(parser, script: str):
+    parser.add_argument("--profile", metavar="REPORT.json", default=None,
+                        help=f"write a per-stage timing/memory report (default: ${PROFILE_DIR_ENV}/{script}.json if set)")
+
+
+def rss_high_water() -> Optional[int]:
+    """Peak resident set size of this process so far, in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KiB
+
+# ---------------------------------------------------------------------------
+# Profiler -------------------------------------------------------------------
+
+class Profiler:
+    def __init__(self, script: str, report_path: Optional[str] = None):
+        self.script = script
+        self.report_path = report_path
+        self.trace_memory = report_path is not None
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stages: List[dict] = []
+        self.counts: Dict[str, int] = {}
+        self._open: List[dict] = []
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {"name": name, "counts": {}}
+        self._open.append(record)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            if self.trace_memory:
+                record["peakTracedBytes"] = tracemalloc.get_traced_memory()[1]
+            record["rssHighWaterBytes"] = rss_high_water()
+            self._open.pop()
+            self.stages.append(record)
+
+    def add_stage(self, record: dict):
+        """Add a stage that was timed elsewhere, e.g. in a worker process (parallel_build.py)."""
+        self.stages.append(record)
+
+    def count(self, name: str, n: int = 1):
+        """Add to a counter of the innermost open stage (or of the script when none is open)."""
+        counts = self._open[-1]["counts"] if self._open else self.counts
+        counts[name] = counts.get(name, 0) + n
+
+    def report(self) -> dict:
+        return {
+            "script": self.script,
+            "startedAt": self.started_at,
+            "totalSeconds": round(time.perf_counter() - self._start, 4),
+            "peakRssBytes": rss_high_water(),
+            "counts": self.counts,
+            "stages": self.stages,
+        }
+
+    def finish(self) -> dict:
+        """Build the report and write it when a report path was given."""
+        report = self.report()
+        if self.report_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if self.trace_memory:
+            tracemalloc.stop()
+        return report
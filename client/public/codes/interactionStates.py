@@ -9,17 +9,22 @@
 2. 输出文件
    - client/public/data/interactionStates.json
 3. 运行
-   python scripts/generate_interaction_states.py
+   python interactionStates.py [--platform-config ...] [--hierarchy ...] [--output ...]
 """
+import argparse
 import json
 from pathlib import Path
 from datetime import datetime
 
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
 
 
-PLATFORM_CONF_PATH = Path("F:/202502/CHIvis/client/public/data/platformConfiguration.json")
-HIERARCHY_PATH     = Path("F:/202502/CHIvis/client/public/data/hierarchyMapping.json")
-OUTPUT_PATH        = Path("F:/202502/CHIvis/client/public/data/interactionStates.json")
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+PLATFORM_CONF_PATH = DATA_DIR / "interaction" / "platformConfiguration.json"
+HIERARCHY_PATH     = DATA_DIR / "main" / "hierarchyMapping.json"
+OUTPUT_PATH        = DATA_DIR / "interaction" / "interactionStates.json"
 
 
 def load_json(path: Path):
@@ -28,10 +33,8 @@ def load_json(path: Path):
         return json.load(f)
 
 
-def main():
-    platform_conf = load_json(PLATFORM_CONF_PATH)
-    hierarchy     = load_json(HIERARCHY_PATH)
-
+def build_interaction_states(platform_conf, hierarchy):
+    """由 platformConfiguration 与 hierarchyMapping 生成 interactionStates（不读写文件）"""
     # -------------------------
     # 1) 构建 stateTemplates
     # -------------------------
@@ -139,13 +142,31 @@ def main():
         "navigationHistory": navigation_history,
         "transitionRules" : transition_rules
     }
+    return payload
 
-    OUTPUT_PATH.write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
 
-    print(f"[✓] interactionStates.json 已生成：{OUTPUT_PATH}")
+def main():
+    parser = argparse.ArgumentParser(description="生成 interactionStates.json")
+    parser.add_argument("--platform-config", type=Path, default=PLATFORM_CONF_PATH, help="platformConfiguration.json 路径")
+    parser.add_argument("--hierarchy", type=Path, default=HIERARCHY_PATH, help="hierarchyMapping.json 路径")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH, help="interactionStates.json 输出路径")
+    add_profile_argument(parser, "interactionStates")
+    args = parser.parse_args()
+    profiler = Profiler("interactionStates", profile_path("interactionStates", args.profile))
+
+    with profiler.stage("load"):
+        platform_conf = load_json(args.platform_config)
+        hierarchy     = load_json(args.hierarchy)
+
+    payload = build_interaction_states(platform_conf, hierarchy)
+    state_templates = payload["stateTemplates"]
+
+    with profiler.stage("write"):
+        write_json(str(args.output), payload)
+        profiler.count("stateTemplates", len(state_templates))
+
+    print(f"[✓] interactionStates.json 已生成：{args.output}")
+    profiler.finish()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,11 @@
 # apply_tag_colors_by_displayname.py
+import argparse
 import json
+import os
+
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+from taxonomy import Taxonomy
 
 # --- Configuration: Define your colors here ---
 # Structure:
@@ -56,9 +62,29 @@ TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME = {
     }
 }
 
-# Path to your nodeMetadata.json file
-# Adjust this path if your script is located elsewhere relative to the data folder.
-NODE_METADATA_FILE_PATH = "../data/nodeMetadata.json" # 假设 nodeMetadata.json 在 data 子目录中
+# Path to your nodeMetadata.json file (relative to this script, override with --metadata)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NODE_METADATA_FILE_PATH = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data", "main", "nodeMetadata.json"))
+
+def apply_colors(node_metadata, color_definitions, verbose=False):
+    """
+    Updates colors in an already loaded nodeMetadata dict in place.
+    Returns the number of tags updated.
+    """
+    update_counter = 0
+    taxonomy = Taxonomy.from_node_metadata(node_metadata)
+    for category_key, tag_colors in color_definitions.items():
+        if category_key in node_metadata:
+            # Look the tags up by displayName instead of scanning the category
+            for display_name, color_value in tag_colors.items():
+                for tag_id in taxonomy.named(category_key, display_name):
+                    node_metadata[category_key][tag_id]['color'] = color_value
+                    if verbose:
+                        print(f"  Updated color for [{category_key}][{tag_id}] (displayName: '{display_name}') to {color_value}")
+                    update_counter += 1
+        elif verbose:
+            print(f"Warning: Category '{category_key}' not found in nodeMetadata.")
+    return update_counter
 
 def set_node_colors_by_displayname(metadata_file, color_definitions):
     """
@@ -74,31 +100,26 @@ def set_node_colors_by_displayname(metadata_file, color_definitions):
         print(f"Error: Could not decode JSON from '{metadata_file}'. Check if it's a valid JSON.")
         return
 
-    update_counter = 0
     print("Starting color update process by displayName...")
-
-    for category_key, tag_colors in color_definitions.items():
-        if category_key in node_metadata:
-            # Iterate through all tags in the current category
-            for tag_id, tag_data in node_metadata[category_key].items():
-                current_display_name = tag_data.get("displayName")
-                if current_display_name in tag_colors:
-                    color_value = tag_colors[current_display_name]
-                    node_metadata[category_key][tag_id]['color'] = color_value
-                    print(f"  Updated color for [{category_key}][{tag_id}] (displayName: '{current_display_name}') to {color_value}")
-                    update_counter += 1
-        else:
-            print(f"Warning: Category '{category_key}' not found in {metadata_file}.")
+    update_counter = apply_colors(node_metadata, color_definitions, verbose=True)
 
     if update_counter > 0:
         try:
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(node_metadata, f, ensure_ascii=False, indent=2)
+            write_json(metadata_file, node_metadata)
             print(f"\nSuccessfully updated {update_counter} tag colors in '{metadata_file}'.")
         except IOError:
             print(f"Error: Could not write updated data back to '{metadata_file}'.")
     else:
         print("\nNo tag colors were updated. Check your definitions (displayNames and categories) or file content.")
+    return update_counter
 
 if __name__ == "__main__":
-    set_node_colors_by_displayname(NODE_METADATA_FILE_PATH, TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Apply TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME to nodeMetadata.json in place")
+    parser.add_argument("--metadata", default=NODE_METADATA_FILE_PATH, help="nodeMetadata.json path")
+    add_profile_argument(parser, "nodeMetadata_set_color")
+    args = parser.parse_args()
+    profiler = Profiler("nodeMetadata_set_color", profile_path("nodeMetadata_set_color", args.profile))
+    with profiler.stage("setColors"):
+        updated = set_node_colors_by_displayname(args.metadata, TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME)
+        profiler.count("colorsUpdated", updated or 0)
+    profiler.finish()
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Per-node paper posting lists, written next to nodeMetadata.json.
+
+For every Sankey node at every level of the four tag domains the index
+holds the sorted indices (into paperIndex) of the papers tagged with it, so
+the dashboard resolves a node click with one lookup instead of scanning
+processedPapers.json. Nodes are keyed by the names processedPapers uses in
+tags[domain].l1/l2/l3, which are also the node ids in the Sankey diagram.
+
+    {
+      "version": 1,
+      "paperIndex": ["paper_001", ...],
+      "encoding": "delta",
+      "postings": {"研究内容": {"l1": {name: posting}, "l2": {...}, "l3": {...}}, ...}
+    }
+
+Posting encodings (--format):
+    delta   [first index, gap, gap, ...] (default; smallest for this corpus)
+    bitset  "bitset-base64" string, see paper_bitset.py
+    rle     "rle-base64" string, see paper_bitset.py
+
+The front-end counterpart is client/src/utils/nodePostings.ts.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from bisect import bisect_left
+from typing import Dict, Iterator, List
+
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+from paper_bitset import BITSET_ENCODING, RLE_ENCODING, bits_to_indices, decode_bits, encode_indices
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+PAPERS_FILE = os.path.join(DATA_DIR, "main", "processedPapers.json")
+OUTPUT_FILE = os.path.join(DATA_DIR, "main", "nodePostings.json")
+
+POSTINGS_VERSION = 1
+DELTA_ENCODING = "delta"
+# --format value -> encoding name written to the file
+FORMATS = {"delta": DELTA_ENCODING, "bitset": BITSET_ENCODING, "rle": RLE_ENCODING}
+
+DOMAINS = ["研究涉及平台-内容形式", "研究涉及平台-平台属性", "研究内容", "研究方法"]
+LEVELS = ["l1", "l2", "l3"]
+
+Postings = Dict[str, Dict[str, Dict[str, List[int]]]]  # domain -> level -> name -> sorted indices
+
+# ---------------------------------------------------------------------------
+# Postings -------------------------------------------------------------------
+
+def paper_nodes(paper: dict) -> Iterator[tuple]:
+    """(domain, level, name) of every node the paper is tagged with; a name listed twice repeats."""
+    for domain, tags in paper.get("tags", {}).items():
+        if domain not in DOMAINS:
+            continue
+        for level in LEVELS:
+            for name in tags.get(level, []):
+                yield domain, level, name
+
+
+def add_paper(postings: Postings, idx: int, paper: dict):
+    """Append paper index idx (larger than every index already in postings)."""
+    for domain, level, name in paper_nodes(paper):
+        posting = postings[domain][level].setdefault(name, [])
+        if not posting or posting[-1] != idx:  # a name listed twice in one paper
+            posting.append(idx)
+
+
+def build_postings(papers: List[dict]) -> Postings:
+    """One pass over the papers; indices come out sorted because papers are visited in order."""
+    postings: Postings = {domain: {level: {} for level in LEVELS} for domain in DOMAINS}
+    for idx, paper in enumerate(papers):
+        add_paper(postings, idx, paper)
+    return postings
+
+
+def remove_papers(postings: Postings, removed: List[int]):
+    """
+    Drop the sorted paper indices `removed` and renumber the rest, as if those
+    papers had been left out of the list. Nodes left without papers are removed.
+    """
+    removed_set = set(removed)
+    for levels in postings.values():
+        for names in levels.values():
+            for name, indices in list(names.items()):
+                kept = [idx - bisect_left(removed, idx) for idx in indices if idx not in removed_set]
+                if kept:
+                    names[name] = kept
+                else:
+                    del names[name]
+
+
+def encode_posting(indices: List[int], encoding: str = DELTA_ENCODING):
+    if encoding == DELTA_ENCODING:
+        return [idx - prev for prev, idx in zip([0] + indices, indices)]
+    return encode_indices(indices, encoding)
+
+
+def decode_posting(posting, encoding: str = DELTA_ENCODING) -> List[int]:
+    if encoding == DELTA_ENCODING:
+        indices, position = [], 0
+        for gap in posting:
+            position += gap
+            indices.append(position)
+        return indices
+    return bits_to_indices(decode_bits(posting, encoding))
+
+
+def assemble_output(papers: List[dict], postings: Postings, encoding: str = DELTA_ENCODING) -> dict:
+    return {
+        "version": POSTINGS_VERSION,
+        "paperIndex": [paper.get("id") for paper in papers],
+        "encoding": encoding,
+        "postings": {
+            domain: {
+                level: {name: encode_posting(indices, encoding) for name, indices in names.items()}
+                for level, names in levels.items()
+            }
+            for domain, levels in postings.items()
+        },
+    }
+
+
+def decode_output(output: dict) -> Postings:
+    """Inverse of assemble_output: the postings of a loaded nodePostings.json."""
+    postings: Postings = {domain: {level: {} for level in LEVELS} for domain in DOMAINS}
+    for domain, levels in output["postings"].items():
+        for level, names in levels.items():
+            postings[domain][level] = {name: decode_posting(posting, output["encoding"])
+                                       for name, posting in names.items()}
+    return postings
+
+
+def paper_ids_for(output: dict, domain: str, level: str, name: str) -> List[str]:
+    """Paper ids of one node from an assembled (or loaded) nodePostings.json."""
+    posting = output["postings"].get(domain, {}).get(level, {}).get(name)
+    if posting is None:
+        return []
+    return [output["paperIndex"][idx] for idx in decode_posting(posting, output["encoding"])]
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build nodePostings.json (node -> paper indices) from processedPapers.json")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json path")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="nodePostings.json path")
+    parser.add_argument("--format", choices=list(FORMATS), default="delta", help="posting list encoding")
+    add_profile_argument(parser, "node_postings")
+    args = parser.parse_args()
+    profiler = Profiler("node_postings", profile_path("node_postings", args.profile))
+
+    with profiler.stage("load"):
+        with open(args.papers, "r", encoding="utf-8") as f:
+            papers = json.load(f).get("papers", [])
+        profiler.count("papers", len(papers))
+
+    with profiler.stage("postings"):
+        postings = build_postings(papers)
+        profiler.count("nodes", sum(len(names) for levels in postings.values() for names in levels.values()))
+        profiler.count("entries", sum(len(indices) for levels in postings.values()
+                                      for names in levels.values() for indices in names.values()))
+
+    with profiler.stage(f"encode:{args.format}"):
+        output = assemble_output(papers, postings, FORMATS[args.format])
+
+    with profiler.stage("write"):
+        # Lookup data, not meant to be read by hand: always compact
+        write_json(args.output, output, compact=True)
+    print(f"Posting lists for {len(papers)} papers written to {args.output}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
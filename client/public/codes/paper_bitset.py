@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import base64
+from typing import Dict, Iterable, List
+
+# ---------------------------------------------------------------------------
+# Paper-membership bitsets ------------------------------------------------------
+#
+# A set of papers is stored as a bitmap over a shared paper index
+# (paperIndex[i] <-> bit i), serialized with one of two encodings:
+#
+#   "bitset-base64": bits packed little-endian (bit i lives in byte i // 8 at
+#                    position i % 8), trailing zero bytes dropped, base64.
+#   "rle-base64":    run lengths of the bitmap, alternating zeros / ones and
+#                    starting with a (possibly empty) zeros run, written as
+#                    LEB128 varints, base64. Smaller for sparse pairs.
+#
+# The front-end decoder is client/src/utils/paperBitset.ts (used by nodePostings.ts).
+
+BITSET_ENCODING = "bitset-base64"
+RLE_ENCODING = "rle-base64"
+ENCODINGS = [BITSET_ENCODING, RLE_ENCODING]
+
+
+def indices_to_bits(indices: Iterable[int]) -> int:
+    # Set the bits in a bytearray and convert once: OR-ing `1 << idx` into an
+    # int copies the whole int every time, quadratic for large paper counts
+    indices = list(indices)
+    if not indices:
+        return 0
+    raw = bytearray(max(indices) // 8 + 1)
+    for idx in indices:
+        raw[idx >> 3] |= 1 << (idx & 7)
+    return int.from_bytes(raw, "little")
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def bits_to_indices(bits: int) -> List[int]:
+    # Scan the binary string once (least significant bit first): shifting the
+    # int one bit per step copies it every time, quadratic like indices_to_bits
+    return [idx for idx, bit in enumerate(bin(bits)[:1:-1]) if bit == "1"]
+
+
+def _encode_bitmap(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def _decode_bitmap(raw: bytes) -> int:
+    return int.from_bytes(raw, "little")
+
+
+def _encode_rle(bits: int) -> bytes:
+    out = bytearray()
+    position = 0
+    indices = bits_to_indices(bits)
+    i = 0
+    while i < len(indices):
+        j = i
+        while j + 1 < len(indices) and indices[j + 1] == indices[j] + 1:
+            j += 1
+        for run in (indices[i] - position, j - i + 1):
+            while True:
+                byte = run & 0x7F
+                run >>= 7
+                if run:
+                    out.append(byte | 0x80)
+                else:
+                    out.append(byte)
+                    break
+        position = indices[j] + 1
+        i = j + 1
+    return bytes(out)
+
+
+def _decode_rle(raw: bytes) -> int:
+    # Collect the runs, then set the ones runs in a bytearray and convert once,
+    # as in indices_to_bits (OR-ing each run into an int copies it every time)
+    runs = []
+    run = shift = 0
+    for byte in raw:
+        run |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        runs.append(run)
+        run = shift = 0
+    out = bytearray((sum(runs) + 7) // 8)
+    position = 0
+    for k, run in enumerate(runs):
+        if k % 2:
+            for idx in range(position, position + run):
+                out[idx >> 3] |= 1 << (idx & 7)
+        position += run
+    return int.from_bytes(out, "little")
+
+
+def encode_bits(bits: int, encoding: str = BITSET_ENCODING) -> str:
+    raw = _encode_rle(bits) if encoding == RLE_ENCODING else _encode_bitmap(bits)
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_bits(encoded: str, encoding: str = BITSET_ENCODING) -> int:
+    raw = base64.b64decode(encoded)
+    return _decode_rle(raw) if encoding == RLE_ENCODING else _decode_bitmap(raw)
+
+
+def encode_indices(indices: Iterable[int], encoding: str = BITSET_ENCODING) -> str:
+    return encode_bits(indices_to_bits(indices), encoding)
+
+
+def decode_indices(encoded: str, encoding: str = BITSET_ENCODING) -> List[int]:
+    return bits_to_indices(decode_bits(encoded, encoding))
+
+
+def intersect(*encoded: str, encoding: str = BITSET_ENCODING) -> str:
+    """Intersection of several encoded sets, encoded the same way."""
+    if not encoded:
+        return ""
+    bits = decode_bits(encoded[0], encoding)
+    for other in encoded[1:]:
+        bits &= decode_bits(other, encoding)
+    return encode_bits(bits, encoding)
+
+
+# ---------------------------------------------------------------------------
+# crossLevelConnections conversion ------------------------------------------
+
+def to_bitset_format(connections: Dict[str, Dict[str, Dict[str, object]]],
+                     paper_ids: List[str],
+                     encoding: str = BITSET_ENCODING) -> Dict[str, object]:
+    """
+    Replace every pair's paperIds list by a "papers" set over paper_ids.
+    Returns {"paperIndex", "membershipEncoding", "connections"}.
+    """
+    position = {pid: idx for idx, pid in enumerate(paper_ids)}
+    encoded_connections: Dict[str, Dict[str, Dict[str, object]]] = {}
+    for conn_type, pair_map in connections.items():
+        encoded_pairs = encoded_connections[conn_type] = {}
+        for label_key, stats in pair_map.items():
+            entry = {k: v for k, v in stats.items() if k != "paperIds"}
+            entry["papers"] = encode_indices((position[pid] for pid in stats["paperIds"]), encoding)
+            encoded_pairs[label_key] = entry
+    return {
+        "paperIndex": list(paper_ids),
+        "membershipEncoding": encoding,
+        "connections": encoded_connections,
+    }
+
+
+def from_bitset_format(data: Dict[str, object]) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """Inverse of to_bitset_format: rebuild the paperIds lists."""
+    paper_ids = data["paperIndex"]
+    encoding = data.get("membershipEncoding", BITSET_ENCODING)
+    connections: Dict[str, Dict[str, Dict[str, object]]] = {}
+    for conn_type, pair_map in data["connections"].items():
+        decoded_pairs = connections[conn_type] = {}
+        for label_key, entry in pair_map.items():
+            indices = decode_indices(entry["papers"], encoding)
+            stats = {"paperIds": [paper_ids[idx] for idx in indices]}
+            stats.update((k, v) for k, v in entry.items() if k != "papers")
+            decoded_pairs[label_key] = stats
+    return connections
@@ -1,33 +1,127 @@
+import argparse
 import csv
 import json
+import os
+
+from artifacts import PRODUCTION, dumps, finish_artifact, output_mode, write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '..', 'data'))
+
+CSV_FILE = os.path.join(DATA_DIR, 'papers.csv')  # 输入CSV文件路径
+JSON_FILE = os.path.join(DATA_DIR, 'raw', 'papers.json')  # 输出JSON文件路径
+
+STREAM_FORMATS = ['json', 'ndjson']
+ID_COLUMN = 'id'  # papers.csv 第一列，paper_XXX
+
+def normalize_row(row, paper_number):
+    # 处理研究方法和研究涉及平台字段，将它们转换为列表
+    row['研究方法'] = [x.strip() for x in row['研究方法'].split(',')] if row['研究方法'] else []
+    row['研究涉及平台'] = [x.strip() for x in row['研究涉及平台'].split(',')] if row['研究涉及平台'] else []
+
+    # 处理标签和研究内容字段（如果有）
+    if 'Tags' in row and row['Tags']:
+        row['Tags'] = [x.strip() for x in row['Tags'].split(',')]
+    if '研究内容' in row and row['研究内容']:
+        row['研究内容'] = [x.strip() for x in row['研究内容'].split(',')]
+
+    # 与 processedPapers 相同的 paper_XXX 编号，前端用它建立 paperIdToYear 映射；
+    # CSV 有 id 列时以它为准（增删论文后编号不会随行号变化），否则按行号编号
+    paper_id = row.pop('id', None) or f"paper_{paper_number:03d}"
+    return {'id': paper_id, **row}
+
+def iter_papers(csv_file_path):
+    """逐行读取CSV并规范化，一次只在内存中保留一行"""
+    # utf-8-sig 去掉 Excel 导出的 BOM，否则第一列会变成 "﻿Name"
+    with open(csv_file_path, 'r', encoding='utf-8-sig', newline='') as csv_file:
+        for paper_number, row in enumerate(csv.DictReader(csv_file), start=1):
+            yield normalize_row(row, paper_number)
+
+def read_csv_table(csv_file_path):
+    """读取CSV原始行（不规范化），返回 (列名, 行列表)；没有 id 列时按行号补上"""
+    with open(csv_file_path, 'r', encoding='utf-8-sig', newline='') as csv_file:
+        reader = csv.DictReader(csv_file)
+        rows = list(reader)
+        fieldnames = list(reader.fieldnames or [])
+    if ID_COLUMN not in fieldnames:
+        fieldnames.insert(0, ID_COLUMN)
+        for paper_number, row in enumerate(rows, start=1):
+            row[ID_COLUMN] = f"paper_{paper_number:03d}"
+    return fieldnames, rows
+
+def write_csv_table(csv_file_path, fieldnames, rows):
+    """按 papers.csv 的格式写回：带 BOM、\n 换行、必要时才加引号"""
+    with open(csv_file_path, 'w', encoding='utf-8-sig', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def to_csv_row(paper, fieldnames):
+    """把 papers.json 形式的一行（列表字段）转回 CSV 行，列表以 ", " 连接"""
+    row = {}
+    for name in fieldnames:
+        value = paper.get(name)
+        if isinstance(value, list):
+            value = ', '.join(value)
+        row[name] = '' if value is None else str(value)
+    return row
 
 def csv_to_json(csv_file_path, json_file_path):
-    # 读取CSV文件
-    with open(csv_file_path, 'r', encoding='utf-8') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-        
-        # 将CSV数据转换为字典列表
-        data = []
-        for row in csv_reader:
-            # 处理研究方法和研究涉及平台字段，将它们转换为列表
-            row['研究方法'] = [x.strip() for x in row['研究方法'].split(',')] if row['研究方法'] else []
-            row['研究涉及平台'] = [x.strip() for x in row['研究涉及平台'].split(',')] if row['研究涉及平台'] else []
-            
-            # 处理标签和研究内容字段（如果有）
-            if 'Tags' in row and row['Tags']:
-                row['Tags'] = [x.strip() for x in row['Tags'].split(',')]
-            if '研究内容' in row and row['研究内容']:
-                row['研究内容'] = [x.strip() for x in row['研究内容'].split(',')]
-            
-            data.append(row)
-    
+    # 将CSV数据转换为字典列表
+    data = list(iter_papers(csv_file_path))
+
     # 将数据写入JSON文件
-    with open(json_file_path, 'w', encoding='utf-8') as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=2)
+    write_json(json_file_path, data)
+    return len(data)
+
+def csv_to_json_stream(csv_file_path, output_file_path, output_format='json'):
+    """
+    流式转换：内存占用与文件大小无关。
+    'json'   —— 逐条写出 JSON 数组，结果与 csv_to_json 逐字节相同（含 production 压缩模式）；
+    'ndjson' —— 每行一篇论文（process_new.py 可直接读取 .ndjson）。
+    返回写出的论文数。
+    """
+    count = 0
+    compact = output_mode() == PRODUCTION
+    with open(output_file_path, 'w', encoding='utf-8') as out:
+        for paper in iter_papers(csv_file_path):
+            if output_format == 'ndjson':
+                out.write(json.dumps(paper, ensure_ascii=False))
+                out.write('\n')
+            elif compact:
+                out.write('[' if count == 0 else ',')
+                out.write(dumps(paper, compact=True))
+            else:
+                out.write('[\n' if count == 0 else ',\n')
+                item = json.dumps(paper, ensure_ascii=False, indent=2)
+                out.write('\n'.join('  ' + line for line in item.split('\n')))
+            count += 1
+        if output_format != 'ndjson':
+            if compact:
+                out.write(']' if count else '[]')
+            else:
+                out.write('\n]' if count else '[]')
+    finish_artifact(output_file_path)
+    return count
 
-# 使用示例
-csv_file_path = ''  # 输入CSV文件路径
-json_file_path = 'papers.json'  # 输出JSON文件路径
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='将 papers.csv 转换为 papers.json')
+    parser.add_argument('--input', default=CSV_FILE, help='papers.csv 路径')
+    parser.add_argument('--output', default=JSON_FILE, help='papers.json 输出路径')
+    parser.add_argument('--stream', action='store_true', help='逐行读取并写出，适合数百MB的导出文件')
+    parser.add_argument('--format', choices=STREAM_FORMATS, default='json',
+                        help='流式输出格式：json 数组或 ndjson（仅在 --stream 时生效）')
+    add_profile_argument(parser, 'papers')
+    args = parser.parse_args()
+    profiler = Profiler('papers', profile_path('papers', args.profile))
 
-csv_to_json(csv_file_path, json_file_path)
-print(f"数据已成功转换为JSON格式并保存到 {json_file_path}")
+    with profiler.stage('stream' if args.stream else 'convert'):
+        if args.stream:
+            count = csv_to_json_stream(args.input, args.output, args.format)
+            print(f"已流式转换 {count} 篇论文并保存到 {args.output}")
+        else:
+            count = csv_to_json(args.input, args.output)
+            print(f"数据已成功转换为JSON格式并保存到 {args.output}")
+        profiler.count('papers', count)
+    profiler.finish()
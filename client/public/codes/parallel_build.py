@@ -0,0 +1,254 @@
+"""
+Full rebuild of the derived data files with the independent stages fanned
+out over a process pool.
+
+The stages and their order are build.py's make_stages(): a stage starts as
+soon as the stages writing its inputs are done. The process stage runs first
+in the main process, since the processedPapers list it builds (with the tag
+taxonomy) is handed to every worker; the stages upstream of it (tags.py,
+papers.py) are not run. Each other stage runs in a worker, in-process through
+the builder functions of its script when STAGE_FUNCTIONS has an entry for it,
+otherwise as its script like build.py would.
+
+The outputs are the same as `python build.py --force` for these stages, and
+the build cache is updated so a following `python build.py` skips them.
+
+    python parallel_build.py                 # up to one worker per stage and CPU
+    python parallel_build.py --workers 1     # same stages, in-process, one after another
+    python parallel_build.py --profile prof/parallel_build.json
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import build
+import crossLevelConnections
+import interactionStates
+import nodeMetadata_set_color
+import node_postings
+import platformConfiguration
+import precomputedStats
+import process_new
+import sankey_layout
+import search_index
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path, rss_high_water
+from tag_resolver import TagResolver
+from taxonomy import Taxonomy
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+# Builds the inputs shared by every worker, in the main process
+SHARED_STAGE = "process"
+
+# Inputs shared by every task, set once per worker by init_worker()
+_taxonomy: Optional[Taxonomy] = None
+_papers: List[dict] = []
+_files: Dict[str, str] = build.data_files(DATA_DIR)
+
+# ---------------------------------------------------------------------------
+# Tasks ------------------------------------------------------------------------
+
+def init_worker(taxonomy: Taxonomy, papers: List[dict], data_dir: str):
+    global _taxonomy, _papers, _files
+    _taxonomy, _papers, _files = taxonomy, papers, build.data_files(data_dir)
+
+
+def task_colors(counts: Dict[str, int]):
+    node_metadata = sankey_layout.load_json(_files["node_metadata"])
+    counts["colorsUpdated"] = nodeMetadata_set_color.apply_colors(
+        node_metadata, nodeMetadata_set_color.TAG_COLOR_DEFINITIONS_BY_DISPLAYNAME)
+    write_json(_files["node_metadata"], node_metadata)
+    counts["nodes"] = sum(len(nodes) for nodes in node_metadata.values())
+
+
+def task_postings(counts: Dict[str, int]):
+    postings = node_postings.build_postings(_papers)
+    write_json(_files["node_postings"], node_postings.assemble_output(_papers, postings), compact=True)
+    counts["nodes"] = sum(len(names) for levels in postings.values() for names in levels.values())
+
+
+def task_connections(counts: Dict[str, int]):
+    connections = crossLevelConnections.build_connections(_papers)
+    crossLevelConnections.add_strength(connections)
+    year_axis = crossLevelConnections.add_filter_cube(connections, _papers)
+    output = crossLevelConnections.assemble_output(connections, _papers, year_axis)
+    write_json(_files["cross_level_connections"], output)
+    counts["pairs"] = sum(len(pair_map) for pair_map in connections.values())
+
+
+def task_platform(counts: Dict[str, int]):
+    platform_config = platformConfiguration.build_platform_config(
+        sankey_layout.load_json(_files["node_metadata"]))
+    write_json(_files["platform_configuration"], platform_config)
+    counts["platformTypes"] = len(platform_config["platformTypes"])
+
+
+def task_interaction(counts: Dict[str, int]):
+    states = interactionStates.build_interaction_states(sankey_layout.load_json(_files["platform_configuration"]),
+                                                        sankey_layout.load_json(_files["hierarchy_mapping"]))
+    write_json(_files["interaction_states"], states)
+    counts["stateTemplates"] = len(states["stateTemplates"])
+
+
+def task_stats(counts: Dict[str, int]):
+    resolver = TagResolver(_taxonomy)
+    path = _files["precomputed_stats"]
+    output = {"yearlyStats": precomputedStats.build_yearly_stats(_papers, resolver),
+              precomputedStats.LAST_PAPER_NUMBER_KEY: precomputedStats.last_paper_number(
+                  [paper.get("id") for paper in _papers], precomputedStats.previous_last_paper_number(path))}
+    write_json(path, output)
+    counts["columns"] = len(output["yearlyStats"])
+    counts["unresolvedTags"] = resolver.misses
+
+
+def task_layouts(counts: Dict[str, int]):
+    manifest, files = sankey_layout.build_layouts(
+        sankey_layout.load_json(_files["cross_level_connections"])["connections"],
+        sankey_layout.load_json(_files["node_metadata"]),
+        sankey_layout.load_json(_files["platform_configuration"])["platformTypes"],
+        sankey_layout.load_json(_files["sankey_layout_config"]))
+    sankey_layout.write_layouts(os.path.dirname(_files["sankey_layouts_manifest"]), manifest, files)
+    counts["views"] = len(files)
+
+
+def task_search(counts: Dict[str, int]):
+    manifest, shards = search_index.build_index(_papers)
+    search_index.write_index(os.path.dirname(_files["search_manifest"]), manifest, shards)
+    counts["terms"] = sum(len(terms) for terms in shards.values())
+
+
+# build.py stage name -> in-process builder; other stages run their script
+STAGE_FUNCTIONS = {
+    "colors": task_colors,
+    "postings": task_postings,
+    "connections": task_connections,
+    "platform": task_platform,
+    "interaction": task_interaction,
+    "stats": task_stats,
+    "layouts": task_layouts,
+    "search": task_search,
+}
+
+
+def run_task(stage: build.Stage) -> dict:
+    """Run one stage; returns its stage record in the Profiler format."""
+    counts: Dict[str, int] = {}
+    start = time.perf_counter()
+    if stage.name in STAGE_FUNCTIONS:
+        STAGE_FUNCTIONS[stage.name](counts)
+    else:
+        returncode, _ = build.run_stage(stage, None, quiet=True)
+        if returncode != 0:
+            raise RuntimeError(f"Stage '{stage.name}' failed with exit code {returncode}")
+    return {"name": stage.name, "counts": counts, "seconds": round(time.perf_counter() - start, 4),
+            "rssHighWaterBytes": rss_high_water(), "worker": os.getpid()}
+
+
+def pool_stages(data_dir: str) -> List[build.Stage]:
+    """The make_stages() stages downstream of SHARED_STAGE, in pipeline order."""
+    stages = build.make_stages(data_dir)
+    upstream = {stage.name for stage in build.select_stages(stages, [SHARED_STAGE])}
+    return [stage for stage in stages if stage.name not in upstream]
+
+
+def build_shared(files: Dict[str, str], profiler: Profiler):
+    """The process stage: processedPapers, hierarchyMapping and nodeMetadata (without colors)."""
+    with profiler.stage("load"):
+        all_tags_by_id, papers_data = process_new.load_inputs(files["all_tags"], files["raw_papers"])
+        taxonomy = Taxonomy.from_all_tags(all_tags_by_id)
+        profiler.count("tags", len(all_tags_by_id))
+        profiler.count("rawPapers", len(papers_data))
+
+    with profiler.stage(SHARED_STAGE):
+        tag_resolver = TagResolver(taxonomy)
+        processed_papers = process_new.build_processed_papers(papers_data, tag_resolver)
+        node_metadata = process_new.build_node_metadata(taxonomy)
+        process_new.fill_total_papers(node_metadata, processed_papers)
+        write_json(files["processed_papers"], processed_papers)
+        write_json(files["hierarchy_mapping"], process_new.build_hierarchy_mapping(taxonomy))
+        write_json(files["node_metadata"], node_metadata)
+        profiler.count("papers", len(processed_papers["papers"]))
+        profiler.count("unresolvedTags", tag_resolver.misses)
+    return taxonomy, processed_papers["papers"]
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def run_tasks(stages: List[build.Stage], workers: int, taxonomy: Taxonomy, papers: List[dict],
+              data_dir: str) -> Dict[str, dict]:
+    """name -> record, in completion order. A stage is submitted once the stages it reads from are done."""
+    shared = (taxonomy, papers, data_dir)
+    if workers <= 1:
+        init_worker(*shared)
+        return {stage.name: run_task(stage) for stage in stages}
+    deps = build.stage_dependencies(stages)
+    pending = list(stages)
+    done: Dict[str, dict] = {}
+    running: Dict[Future, build.Stage] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=shared) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if all(name in done for name in deps[stage.name]):
+                    pending.remove(stage)
+                    running[pool.submit(run_task, stage)] = stage
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done[running.pop(future).name] = future.result()
+    return done
+
+
+def update_build_cache(data_dir: str, names: List[str]):
+    """Record the rewritten stages in build.py's cache (only for the default data directory)."""
+    if os.path.normpath(data_dir) != os.path.normpath(build.DATA_DIR):
+        return
+    cache = build.load_cache()
+    for stage in build.STAGES:
+        if stage.name in names:
+            build.record(stage, cache, None)
+    build.save_cache(cache)
+
+
+def print_timings(records: List[dict], pool_seconds: float):
+    print(f"{'stage':<24}{'seconds':>9}  worker")
+    for record in records:
+        print(f"{record['name']:<24}{record['seconds']:9.3f}  {record.get('worker', '-')}")
+    busy = sum(record["seconds"] for record in records)
+    print(f"stage time {busy:.3f}s in {pool_seconds:.3f}s wall ({busy / pool_seconds if pool_seconds else 0:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the derived data files with independent stages in parallel")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="public/data directory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per stage, up to the CPU count; 1 runs the stages in-process)")
+    add_profile_argument(parser, "parallel_build")
+    args = parser.parse_args()
+    profiler = Profiler("parallel_build", profile_path("parallel_build", args.profile))
+    stages = pool_stages(args.data_dir)
+    workers = args.workers or min(len(stages), os.cpu_count() or 1)
+
+    taxonomy, papers = build_shared(build.data_files(args.data_dir), profiler)
+
+    with profiler.stage("pool") as pool_record:
+        done = run_tasks(stages, workers, taxonomy, papers, args.data_dir)
+        pool_record["counts"]["workers"] = max(1, workers)
+
+    records = [done[stage.name] for stage in stages]
+    for record in records:
+        profiler.add_stage(record)
+    update_build_cache(args.data_dir, [SHARED_STAGE] + [stage.name for stage in stages])
+    print_timings(records, pool_record["seconds"])
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
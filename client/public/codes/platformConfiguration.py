@@ -1,7 +1,12 @@
+import argparse
 import json
 from collections import defaultdict
 import os
 
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+from taxonomy import Taxonomy
+
 def generate_platform_config(metadata_path, output_path):
     try:
         with open(metadata_path, 'r', encoding='utf-8') as f:
@@ -13,6 +18,16 @@ def generate_platform_config(metadata_path, output_path):
         print(f"Error: Could not decode JSON from {metadata_path}")
         return
 
+    platform_config = build_platform_config(node_metadata)
+
+    try:
+        write_json(output_path, platform_config)
+        print(f"Successfully generated {output_path}")
+    except IOError:
+        print(f"Error: Could not write to output file {output_path}")
+
+def build_platform_config(node_metadata):
+    """由 nodeMetadata 生成 platformConfiguration（不读写文件，parallel_build.py 直接调用）"""
     platform_config = {
         "platformTypes": {},
         "switchMapping": {}
@@ -34,6 +49,7 @@ def generate_platform_config(metadata_path, output_path):
     }
     
     l3_to_l1_output_parent_map_by_output_key = {} 
+    taxonomy = Taxonomy.from_node_metadata(node_metadata)
 
     for output_key, config_details in category_configs.items():
         metadata_key = config_details["metadata_key"]
@@ -60,38 +76,29 @@ def generate_platform_config(metadata_path, output_path):
         
         # L1 in output corresponds to Level 2 nodes in metadata
         # L2 in output corresponds to Level 3 nodes in metadata
-        
-        l1_output_metadata_nodes_info = {} 
-        for node_id_meta, node_data_meta in current_category_data.items():
-            if node_data_meta.get("level") == 2: # These are L1 for the output
-                display_name = node_data_meta.get("displayName", node_id_meta)
-                l1_output_metadata_nodes_info[node_id_meta] = {
-                    "displayName": display_name, # This displayName will be an L1 node name in output
-                    "children_keys_meta": node_data_meta.get("children", []), # These are potential L3 metadata keys
-                    "color": node_data_meta.get("color", "#PLACEHOLDER")
-                }
-                l1_output_items_list.append({
-                    "id": display_name, 
-                    "name": display_name,
-                    "color": node_data_meta.get("color", "#PLACEHOLDER")
-                    # No "description" as per instruction
-                })
+        l1_output_node_ids = taxonomy.nodes(metadata_key, level=2)
+        for node_id_meta in l1_output_node_ids:
+            node_data_meta = current_category_data[node_id_meta]
+            l1_output_items_list.append({
+                "id": node_data_meta.get("displayName", node_id_meta),
+                "name": node_data_meta.get("displayName", node_id_meta),
+                "color": node_data_meta.get("color", "#PLACEHOLDER")
+                # No "description" as per instruction
+            })
         
         platform_type_entry["hierarchy"]["l1"] = sorted(l1_output_items_list, key=lambda x: x['name']) # Sort for consistency
 
-        # Populate L2 hierarchy in output (from L3 metadata nodes)
-        for l1_output_node_meta_id, l1_output_node_info in l1_output_metadata_nodes_info.items():
-            l1_output_node_displayName = l1_output_node_info["displayName"] # Parent name for L2 items in output
+        # Populate L2 hierarchy in output (from the L3 metadata nodes under each L1 output node)
+        for l1_output_node_meta_id in l1_output_node_ids:
+            # Parent name for L2 items in output
+            l1_output_node_displayName = current_category_data[l1_output_node_meta_id].get("displayName", l1_output_node_meta_id)
             
             current_l2_output_children_displayNames = []
-            for l3_child_key_meta in l1_output_node_info["children_keys_meta"]:
-                if l3_child_key_meta in current_category_data:
-                    l3_node_data_meta = current_category_data[l3_child_key_meta]
-                    if l3_node_data_meta.get("level") == 3: # These are L2 for the output
-                        l3_displayName = l3_node_data_meta.get("displayName", l3_child_key_meta)
-                        current_l2_output_children_displayNames.append(l3_displayName)
-                        # For switchMapping: store L3_displayName -> L1_output_node_displayName
-                        l3_to_l1_output_parent_map_by_output_key[output_key][l3_displayName] = l1_output_node_displayName
+            for l3_child_key_meta in taxonomy.descendants(l1_output_node_meta_id, level=3):
+                l3_displayName = current_category_data[l3_child_key_meta].get("displayName", l3_child_key_meta)
+                current_l2_output_children_displayNames.append(l3_displayName)
+                # For switchMapping: store L3_displayName -> L1_output_node_displayName
+                l3_to_l1_output_parent_map_by_output_key[output_key][l3_displayName] = l1_output_node_displayName
             
             if current_l2_output_children_displayNames: 
                  l2_output_children_map[l1_output_node_displayName] = sorted(current_l2_output_children_displayNames)
@@ -101,6 +108,9 @@ def generate_platform_config(metadata_path, output_path):
 
     # Build switchMapping
     cat_keys = list(category_configs.keys()) # e.g., ["内容形式", "平台属性"]
+    platform_config["l3Correspondence"] = build_l3_correspondence(
+        [(key, l3_to_l1_output_parent_map_by_output_key[key]) for key in cat_keys
+         if key in platform_config["platformTypes"]])
     
     # Check if both categories were intended and actually processed
     if len(cat_keys) == 2 and \
@@ -117,7 +127,8 @@ def generate_platform_config(metadata_path, output_path):
         l3_map_for_cat2 = l3_to_l1_output_parent_map_by_output_key.get(cat2_output_key, {})
         
         # Find common L3 displayNames (which are L2 children in the output structure)
-        common_l3_displayNames = set(l3_map_for_cat1.keys()) & set(l3_map_for_cat2.keys())
+        # 按 cat1 中的顺序遍历（不用 set 交集），保证每次生成的文件一致
+        common_l3_displayNames = [name for name in l3_map_for_cat1 if name in l3_map_for_cat2]
 
         for l3_name in common_l3_displayNames:
             # Get the L1 parent node name in the output for this common L3 child, for each category
@@ -157,48 +168,50 @@ def generate_platform_config(metadata_path, output_path):
                 platform_config["switchMapping"][standard_key2_to_1] = {}
         # If len(cat_keys) is 0, switchMapping remains empty, which is appropriate.
 
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(platform_config, f, ensure_ascii=False, indent=2)
-        print(f"Successfully generated {output_path}")
-    except IOError:
-        print(f"Error: Could not write to output file {output_path}")
+    return platform_config
+
+def build_l3_correspondence(l3_parent_maps):
+    """
+    L3 平台（输出中的 l2 子项）在两种平台类型间的对应关系，只记录两边都存在的平台：
+    {"内容形式_to_平台属性": {L3 名称: 目标类型中的 L1 父节点}}。
+    L3 名称在两种类型中相同，切换时节点本身保留，只需换到新的父节点下。
+    """
+    correspondence = {}
+    for from_key, from_map in l3_parent_maps:
+        for to_key, to_map in l3_parent_maps:
+            if from_key == to_key:
+                continue
+            correspondence[f"{from_key}_to_{to_key}"] = {
+                name: to_map[name] for name in from_map if name in to_map
+            }
+    return correspondence
+
 
 # --- Script execution ---
-# 请确保以下路径正确指向您的文件。
-# input_file_path 应为 nodeMetadata.json 的路径。
-# output_file_path 是生成的 platformConfiguration.json 的保存路径。
-
-# 示例路径 (根据您的文件结构修改):
-# 假设脚本在 CHIvis/client/public/codes/ 目录下运行
-# 并且 nodeMetadata.json 在 CHIvis/client/public/data/ 目录下
-input_file_path = '../data/nodeMetadata.json'  # 相对于 codes 目录
-output_file_path = '../data/platformConfiguration.json' # 相对于 codes 目录
-
-# 如果您从工作区根目录 (F:/202502/CHIvis) 运行脚本，可以使用以下路径：
-# input_file_path = 'client/public/data/nodeMetadata.json'
-# output_file_path = 'client/public/data/platformConfiguration.json'
-
-# 请取消注释适合您运行方式的路径设置，或直接使用绝对路径。
-# 为确保路径正确，这里提供一个基于您运行命令的建议：
-# 您运行命令的目录似乎是 F:\202502\CHIvis\client
-# 而脚本本身在 F:\202502\CHIvis\client\public\codes\platformConfiguration.py
-# 如果脚本的当前工作目录是 F:\202502\CHIvis\client，则：
-# input_file_path = 'public/data/nodeMetadata.json'
-# output_file_path = 'public/data/platformConfiguration.json'
-
-# 为了最可靠，我们假设脚本的路径是固定的，并以此为基准设置相对路径：
+# 默认路径基于脚本所在目录（CHIvis/client/public/codes），
+# 输入为 ../data/main/nodeMetadata.json，输出为 ../data/interaction/platformConfiguration.json。
+# 也可以用 --metadata / --output 显式指定。
 script_dir = os.path.dirname(os.path.abspath(__file__)) # 获取脚本所在目录
-input_file_path = os.path.join(script_dir, '..', 'data', 'nodeMetadata.json')
-output_file_path = os.path.join(script_dir, '..', 'data', 'platformConfiguration.json')
+DEFAULT_INPUT_PATH = os.path.normpath(os.path.join(script_dir, '..', 'data', 'main', 'nodeMetadata.json'))
+DEFAULT_OUTPUT_PATH = os.path.normpath(os.path.join(script_dir, '..', 'data', 'interaction', 'platformConfiguration.json'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 platformConfiguration.json")
+    parser.add_argument('--metadata', default=DEFAULT_INPUT_PATH, help='nodeMetadata.json 路径')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH, help='platformConfiguration.json 输出路径')
+    add_profile_argument(parser, "platformConfiguration")
+    args = parser.parse_args()
+    profiler = Profiler("platformConfiguration", profile_path("platformConfiguration", args.profile))
 
-# 检查并确保路径是规范的
-input_file_path = os.path.normpath(input_file_path)
-output_file_path = os.path.normpath(output_file_path)
+    # 检查并确保路径是规范的
+    input_file_path = os.path.normpath(args.metadata)
+    output_file_path = os.path.normpath(args.output)
 
-print(f"Attempting to read from: {input_file_path}")
-print(f"Attempting to write to: {output_file_path}")
+    print(f"Attempting to read from: {input_file_path}")
+    print(f"Attempting to write to: {output_file_path}")
 
-generate_platform_config(input_file_path, output_file_path)
+    with profiler.stage("platformConfiguration"):
+        generate_platform_config(input_file_path, output_file_path)
+    profiler.finish()
 
-print(f"Script finished. Check {output_file_path}")
+    print(f"Script finished. Check {output_file_path}")
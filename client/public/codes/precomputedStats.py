@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+from tag_resolver import TagResolver
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+PAPERS_FILE = os.path.join(DATA_DIR, "main", "processedPapers.json")
+ALL_TAGS_FILE = os.path.join(DATA_DIR, "raw", "allTagsById.json")
+OUTPUT_FILE = os.path.join(DATA_DIR, "layout", "precomputedStats.json")
+
+OVERALL_KEY = "overall"
+# Highest paper_XXX number ever assigned. incremental_update.py numbers new
+# papers after it, so the id of a removed paper is never handed out again;
+# every rebuild of this file keeps the previous value
+LAST_PAPER_NUMBER_KEY = "lastPaperNumber"
+PAPER_ID_PATTERN = re.compile(r"^paper_(\d+)$")
+PLATFORM_STATS_KEY = "研究平台"
+
+# processedPapers tag domain -> (byCategory key, allTagsById category, allTagsById level of the L3 tag)
+# Content/Method: byCategory[cat][L1][subCategory L2][tags L3]
+# Platforms:      byCategory["研究平台"][platform type][subCategory L2][tags L3]
+STATS_DOMAINS = {
+    "研究内容": ("研究内容", "研究内容", 4),
+    "研究方法": ("研究方法", "研究方法", 4),
+    "研究涉及平台-内容形式": (PLATFORM_STATS_KEY, "内容形式", 3),
+    "研究涉及平台-平台属性": (PLATFORM_STATS_KEY, "平台属性", 3),
+}
+
+# ---------------------------------------------------------------------------
+# Helper functions -----------------------------------------------------------
+
+NodeKey = Tuple[str, ...]  # (byCategory key, top, [sub, [tag]])
+
+
+def paper_node_keys(paper: dict, resolver: TagResolver) -> List[NodeKey]:
+    """All distinct stats nodes (at every depth) a paper counts towards."""
+    keys: Dict[NodeKey, None] = {}
+    for domain_key, (stats_key, category, level) in STATS_DOMAINS.items():
+        domain_tags = paper.get("tags", {}).get(domain_key)
+        if not isinstance(domain_tags, dict):
+            continue
+        for l3_name in domain_tags.get("l3", []):
+            resolved = resolver.resolve(category, level, l3_name)
+            if not resolved:
+                continue
+            _, l2_name, l1_name = resolved
+            top: Optional[str] = category if stats_key == PLATFORM_STATS_KEY else l1_name
+            if top is None or l2_name is None:
+                continue
+            keys[(stats_key, top)] = None
+            keys[(stats_key, top, l2_name)] = None
+            keys[(stats_key, top, l2_name, l3_name)] = None
+    return list(keys)
+
+
+def last_paper_number(paper_ids: List[str], previous: int = 0) -> int:
+    numbers = [int(m.group(1)) for m in map(PAPER_ID_PATTERN.match, paper_ids) if m]
+    return max(numbers + [previous])
+
+
+def previous_last_paper_number(path: str) -> int:
+    """lastPaperNumber of an existing precomputedStats.json, 0 if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(LAST_PAPER_NUMBER_KEY, 0)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+
+def build_yearly_stats(papers: List[dict], resolver: TagResolver) -> Dict[str, dict]:
+    """
+    One group-by over (paper, node) rows: every row is tagged with its year
+    index and award flag, and np.bincount over year * n_nodes + node gives the
+    total and awarded counts for every (year, node) cell at once. The overall
+    column is the sum over years, so adding years or papers does not add passes.
+    """
+    import numpy as np
+
+    years = sorted({str(p.get("year")) for p in papers if p.get("year")})
+    year_index = {year: i for i, year in enumerate(years)}
+    n_years = len(years) + 1  # last slot: papers without a year
+    no_year = len(years)
+
+    node_index: Dict[NodeKey, int] = {}
+    row_node: List[int] = []
+    row_paper: List[int] = []
+    paper_year = np.empty(len(papers), dtype=np.int64)
+    paper_awarded = np.empty(len(papers), dtype=np.int64)
+    for paper_idx, paper in enumerate(papers):
+        paper_year[paper_idx] = year_index.get(str(paper.get("year")), no_year)
+        paper_awarded[paper_idx] = 1 if paper.get("isAwarded") else 0
+        for key in paper_node_keys(paper, resolver):
+            row_node.append(node_index.setdefault(key, len(node_index)))
+            row_paper.append(paper_idx)
+
+    n_nodes = len(node_index)
+    rows_paper = np.asarray(row_paper, dtype=np.int64)
+    cells = paper_year[rows_paper] * n_nodes + np.asarray(row_node, dtype=np.int64)
+    size = n_years * n_nodes
+    totals = np.bincount(cells, minlength=size).reshape(n_years, n_nodes)
+    awarded = np.bincount(cells, weights=paper_awarded[rows_paper], minlength=size)
+    awarded = awarded.astype(np.int64).reshape(n_years, n_nodes)
+
+    year_totals = np.bincount(paper_year, minlength=n_years)
+    year_awarded = np.bincount(paper_year, weights=paper_awarded, minlength=n_years).astype(np.int64)
+
+    columns = [(year, year_index[year]) for year in years] + [(OVERALL_KEY, None)]
+    yearly_stats: Dict[str, dict] = {}
+    for column_key, column in columns:
+        if column is None:
+            node_totals, node_awarded = totals.sum(axis=0), awarded.sum(axis=0)
+            total, total_awarded = len(papers), int(paper_awarded.sum())
+        else:
+            node_totals, node_awarded = totals[column], awarded[column]
+            total, total_awarded = int(year_totals[column]), int(year_awarded[column])
+
+        # node_index lists every parent before its children, and a child
+        # count is never nonzero where its parent's is zero.
+        by_category: Dict[str, dict] = {}
+        for key, idx in node_index.items():
+            if not node_totals[idx]:
+                continue
+            counts = {"total": int(node_totals[idx]), "awarded": int(node_awarded[idx])}
+            stats_key, top, *rest = key
+            category_entry = by_category.setdefault(stats_key, {})
+            if not rest:
+                category_entry[top] = {**counts, "subCategory": {}}
+            elif len(rest) == 1:
+                category_entry[top]["subCategory"][rest[0]] = {**counts, "tags": {}}
+            else:
+                category_entry[top]["subCategory"][rest[0]]["tags"][rest[1]] = counts
+
+        yearly_stats[column_key] = {
+            "total": total,
+            "awarded": total_awarded,
+            "regular": total - total_awarded,
+            "byCategory": by_category,
+        }
+    return yearly_stats
+
+
+def apply_paper_delta(yearly_stats: Dict[str, dict], paper: dict, resolver: TagResolver, sign: int):
+    """
+    Add (sign=+1) or remove (sign=-1) one processed paper from an existing
+    yearlyStats dict in place. Entries whose total drops to zero are removed,
+    new years are inserted in order before "overall".
+    """
+    year = str(paper.get("year")) if paper.get("year") else None
+    awarded = 1 if paper.get("isAwarded") else 0
+    node_keys = paper_node_keys(paper, resolver)
+    if sign < 0:
+        node_keys.reverse()  # children before parents, so parents are pruned last
+
+    for column_key in ([year] if year else []) + [OVERALL_KEY]:
+        column = yearly_stats.get(column_key)
+        if column is None:
+            column = yearly_stats[column_key] = {"total": 0, "awarded": 0, "regular": 0, "byCategory": {}}
+        column["total"] += sign
+        column["awarded"] += sign * awarded
+        column["regular"] = column["total"] - column["awarded"]
+
+        for stats_key, top, *rest in node_keys:
+            container = column["byCategory"].setdefault(stats_key, {})
+            names = [top] + rest
+            for depth, name in enumerate(names):
+                child_key = ("subCategory", "tags", None)[depth]
+                if name not in container:
+                    container[name] = {"total": 0, "awarded": 0}
+                    if child_key:
+                        container[name][child_key] = {}
+                if depth < len(names) - 1:
+                    container = container[name][child_key]
+            entry = container[names[-1]]
+            entry["total"] += sign
+            entry["awarded"] += sign * awarded
+            if entry["total"] <= 0:
+                del container[names[-1]]
+        for stats_key in [k for k, v in column["byCategory"].items() if not v]:
+            del column["byCategory"][stats_key]
+        if column_key != OVERALL_KEY and column["total"] <= 0:
+            del yearly_stats[column_key]
+
+    # Keep years sorted with "overall" last
+    ordered = sorted(k for k in yearly_stats if k != OVERALL_KEY) + [OVERALL_KEY]
+    if list(yearly_stats) != ordered:
+        reordered = {k: yearly_stats[k] for k in ordered if k in yearly_stats}
+        yearly_stats.clear()
+        yearly_stats.update(reordered)
+
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precomputedStats.json from processedPapers.json")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json path")
+    parser.add_argument("--tags", default=ALL_TAGS_FILE, help="allTagsById.json path")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="precomputedStats.json path")
+    add_profile_argument(parser, "precomputedStats")
+    args = parser.parse_args()
+    profiler = Profiler("precomputedStats", profile_path("precomputedStats", args.profile))
+
+    with profiler.stage("load"):
+        with open(args.papers, "r", encoding="utf-8") as f:
+            papers = json.load(f).get("papers", [])
+        resolver = TagResolver.from_file(args.tags)
+        profiler.count("papers", len(papers))
+
+    with profiler.stage("yearlyStats"):
+        output = {"yearlyStats": build_yearly_stats(papers, resolver),
+                  LAST_PAPER_NUMBER_KEY: last_paper_number([paper.get("id") for paper in papers],
+                                                           previous_last_paper_number(args.output))}
+        profiler.count("columns", len(output["yearlyStats"]))
+        profiler.count("unresolvedTags", resolver.misses)
+
+    with profiler.stage("write"):
+        write_json(args.output, output)
+    print(f"Precomputed stats written to {args.output}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,19 @@
+import argparse
 import json
+import os
 
-# --- Load input JSON files (ensure paths are correct) ---
-try:
-    with open("../data/allTagsById.json", 'r', encoding='utf-8') as f:
-        all_tags_by_id_data = json.load(f)
-    all_tags_by_id = all_tags_by_id_data.get("allTagsById", {})
+from artifacts import write_json
+from paper_bitset import indices_to_bits, popcount
+from instrumentation import Profiler, add_profile_argument, profile_path
+from tag_resolver import TagResolver
+from taxonomy import Taxonomy
 
-    with open("../data/L3TagToIfMap.json", 'r', encoding='utf-8') as f:
-        l3_tag_to_id_map_data = json.load(f)
-    # Assuming l3_tag_to_id_map structure helps map display names to full IDs if needed.
-    # For platform L3 names, they are directly the 'name' of allTagsById L3 entries.
-    # For content/method L3 names, they are 'name' of allTagsById L4 entries.
-    l3_tag_to_id_map = l3_tag_to_id_map_data.get("l3TagToIdMap", {})
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
 
-
-    with open("../data/papers.json", 'r', encoding='utf-8') as f:
-        papers_data = json.load(f) # This is a list
-
-except FileNotFoundError as e:
-    print(f"Error: One of the input files was not found: {e.filename}")
-    exit()
-except json.JSONDecodeError as e:
-    print(f"Error decoding JSON from a file: {e}")
-    exit()
+ALL_TAGS_FILE = os.path.join(DATA_DIR, "raw", "allTagsById.json")
+PAPERS_FILE = os.path.join(DATA_DIR, "raw", "papers.json")
+OUTPUT_DIR = os.path.join(DATA_DIR, "main")
 
 # --- Constants ---
 # Categories where allTagsById L1 is conceptual root, L2->SankeyL1, L3->SankeyL2, L4->SankeyL3
@@ -47,85 +38,70 @@ JSON_OUTPUT_CATEGORY_ROOT_IDS = {
     "研究涉及平台-平台属性": "平台属性"
 }
 
+# Raw "Tags" values that mark an awarded paper
+AWARD_TAGS = {"#best paper", "#honorable mention"}
+
 # --- 1. Create processedPapers.json ---
 # IMPORTANT: This placeholder needs to be replaced with your robust logic.
 # The L1, L2, L3 names in processedPapers.json must align with the
 # displayNames of the corresponding Sankey Levels.
-processed_papers_list = []
-paper_id_counter = 1
-for paper_raw_idx, paper_raw in enumerate(papers_data):
+# Tag lookups go through TagResolver (built once) instead of scanning
+# all_tags_by_id for every tag of every paper.
+def resolve_root_like_tags(tag_resolver, category, l3_names):
+    """Content/Method: Sankey L3 name is an allTagsById L4 entry; L2/L1 names come from its ancestors."""
+    # dicts as insertion-ordered sets, so the output is the same on every run
+    l1_names, l2_names, l3_names_list = {}, {}, []
+    for l3_name_in_paper in l3_names: # This is Sankey L3 name
+        l3_names_list.append(l3_name_in_paper)
+        resolved = tag_resolver.resolve(category, 4, l3_name_in_paper)
+        if resolved:
+            _, sl2_name, sl1_name = resolved # allTagsById L3 (Sankey L2), allTagsById L2 (Sankey L1)
+            if sl2_name is not None:
+                l2_names[sl2_name] = None
+            if sl1_name is not None:
+                l1_names[sl1_name] = None
+    return {"l1": list(l1_names), "l2": list(l2_names), "l3": l3_names_list}
+
+def is_awarded(paper_raw):
+    raw_tags = paper_raw.get("Tags") or []
+    if isinstance(raw_tags, str):
+        raw_tags = [x.strip() for x in raw_tags.split(',')]
+    return any(tag.strip().lower() in AWARD_TAGS for tag in raw_tags)
+
+def process_paper(paper_raw, tag_resolver, paper_id):
+    """Build one processedPapers entry from one raw paper row."""
     temp_paper_tags = {}
     # --- Research Content ---
     rc_tags_raw = paper_raw.get("研究内容", [])
     if rc_tags_raw:
-        l1_rc_names, l2_rc_names, l3_rc_names_list = set(), set(), []
-        for l3_name_in_paper in rc_tags_raw: # This is Sankey L3 name
-            l3_rc_names_list.append(l3_name_in_paper)
-            # Find the allTagsById L4 entry for this Sankey L3 name
-            sl3_entry_id = None
-            for tid, tdata in all_tags_by_id.items():
-                if tdata.get("category") == "研究内容" and tdata.get("level") == 4 and tdata.get("name") == l3_name_in_paper:
-                    sl3_entry_id = tid
-                    break
-            if sl3_entry_id:
-                sl2_id = all_tags_by_id[sl3_entry_id].get("parentId") # allTagsById L3 ID (Sankey L2)
-                if sl2_id and sl2_id in all_tags_by_id:
-                    l2_rc_names.add(all_tags_by_id[sl2_id]["name"])
-                    sl1_id = all_tags_by_id[sl2_id].get("parentId") # allTagsById L2 ID (Sankey L1)
-                    if sl1_id and sl1_id in all_tags_by_id:
-                        l1_rc_names.add(all_tags_by_id[sl1_id]["name"])
-        temp_paper_tags["研究内容"] = {"l1": list(l1_rc_names), "l2": list(l2_rc_names), "l3": l3_rc_names_list}
+        temp_paper_tags["研究内容"] = resolve_root_like_tags(tag_resolver, "研究内容", rc_tags_raw)
 
     # --- Research Method (similar logic) ---
     rm_tags_raw = paper_raw.get("研究方法", [])
     if rm_tags_raw:
-        l1_rm_names, l2_rm_names, l3_rm_names_list = set(), set(), []
-        for l3_name_in_paper in rm_tags_raw: # This is Sankey L3 name
-            l3_rm_names_list.append(l3_name_in_paper)
-            sl3_entry_id = None
-            for tid, tdata in all_tags_by_id.items():
-                if tdata.get("category") == "研究方法" and tdata.get("level") == 4 and tdata.get("name") == l3_name_in_paper:
-                    sl3_entry_id = tid
-                    break
-            if sl3_entry_id:
-                sl2_id = all_tags_by_id[sl3_entry_id].get("parentId") # allTagsById L3 ID (Sankey L2)
-                if sl2_id and sl2_id in all_tags_by_id:
-                    l2_rm_names.add(all_tags_by_id[sl2_id]["name"])
-                    sl1_id = all_tags_by_id[sl2_id].get("parentId") # allTagsById L2 ID (Sankey L1)
-                    if sl1_id and sl1_id in all_tags_by_id:
-                        l1_rm_names.add(all_tags_by_id[sl1_id]["name"])
-        temp_paper_tags["研究方法"] = {"l1": list(l1_rm_names), "l2": list(l2_rm_names), "l3": l3_rm_names_list}
+        temp_paper_tags["研究方法"] = resolve_root_like_tags(tag_resolver, "研究方法", rm_tags_raw)
 
     # --- Platform Tags ---
     platform_tags_raw = paper_raw.get("研究涉及平台", []) # These are Sankey L3 names, e.g. "Facebook"
     if platform_tags_raw:
         current_paper_platform_tags = {
-            "研究涉及平台-内容形式": {"l1": set(), "l2": set(), "l3": []},
-            "研究涉及平台-平台属性": {"l1": set(), "l2": set(), "l3": []}
+            "研究涉及平台-内容形式": {"l1": {}, "l2": {}, "l3": []},
+            "研究涉及平台-平台属性": {"l1": {}, "l2": {}, "l3": []}
         }
         for s_l3_display_name in platform_tags_raw:
-            s_l3_id = None # This is allTagsById L3 ID
-            platform_base_category = None # "内容形式" or "平台属性"
-
-            # Find the allTagsById L3 entry using its name (Sankey L3 display name)
-            for tid, tdata in all_tags_by_id.items():
-                if tdata.get("level") == 3 and tdata.get("name") == s_l3_display_name and \
-                   tdata.get("category") in PLATFORM_DIRECT_LEVEL_CATEGORIES_IN_ALLTAGSBYID:
-                    s_l3_id = tid
-                    platform_base_category = tdata.get("category")
-                    break
-            
-            if s_l3_id and platform_base_category:
+            # Find the allTagsById L3 entries using its name (Sankey L3 display name).
+            # Most platforms sit under both 内容形式 and 平台属性, and are tagged under each.
+            for s_l3_id, platform_base_category in tag_resolver.lookup_all(
+                    PLATFORM_DIRECT_LEVEL_CATEGORIES_IN_ALLTAGSBYID, 3, s_l3_display_name):
                 output_key = CATEGORY_MAPPING_FOR_OUTPUT_KEYS[platform_base_category]
                 current_paper_platform_tags[output_key]["l3"].append(s_l3_display_name)
 
-                s_l2_id = all_tags_by_id[s_l3_id].get("parentId") # allTagsById L2 ID (Sankey L2)
-                if s_l2_id and s_l2_id in all_tags_by_id:
-                    current_paper_platform_tags[output_key]["l2"].add(all_tags_by_id[s_l2_id]["name"])
-                    s_l1_id = all_tags_by_id[s_l2_id].get("parentId") # allTagsById L1 ID (Sankey L1)
-                    if s_l1_id and s_l1_id in all_tags_by_id:
-                         current_paper_platform_tags[output_key]["l1"].add(all_tags_by_id[s_l1_id]["name"])
-        
+                ancestors = tag_resolver.ancestor_names(s_l3_id) # allTagsById L2 (Sankey L2), L1 (Sankey L1)
+                if len(ancestors) > 0:
+                    current_paper_platform_tags[output_key]["l2"][ancestors[0]] = None
+                if len(ancestors) > 1:
+                    current_paper_platform_tags[output_key]["l1"][ancestors[1]] = None
+
         for key, tag_levels in current_paper_platform_tags.items():
             if tag_levels["l3"]: # Only add if L3 tags were found
                 temp_paper_tags[key] = {
@@ -134,196 +110,338 @@ for paper_raw_idx, paper_raw in enumerate(papers_data):
                     "l3": tag_levels["l3"]
                 }
 
-    processed_papers_list.append({
-        "id": f"paper_{paper_id_counter:03d}",
+    return {
+        "id": paper_id,
         "name": paper_raw.get("Name"), "abstract": paper_raw.get("Abstract"),
         "authors": paper_raw.get("Authors"), "year": paper_raw.get("Year"),
-        "doi": paper_raw.get("DOI"), "isAwarded": False,
+        "doi": paper_raw.get("DOI"), "isAwarded": is_awarded(paper_raw),
         "tags": temp_paper_tags
-    })
-    paper_id_counter += 1
-processed_papers = {"papers": processed_papers_list}
-# --- End of processedPapers.json Placeholder ---
+    }
+
+def build_processed_papers(papers_data, tag_resolver):
+    processed_papers_list = []
+    paper_id_counter = 1
+    for paper_raw_idx, paper_raw in enumerate(papers_data):
+        # Keep the raw row's id when it has one (papers.py and incremental_update.py
+        # assign them), so ids stay stable when papers are added or removed.
+        paper_id = paper_raw.get("id") or f"paper_{paper_id_counter:03d}"
+        processed_papers_list.append(process_paper(paper_raw, tag_resolver, paper_id))
+        paper_id_counter += 1
+    processed_papers = {"papers": processed_papers_list}
+    return processed_papers
 
 
 # --- 2. Create hierarchyMapping.json ---
-hierarchy_mapping = {}
-for output_key in JSON_OUTPUT_CATEGORY_ROOT_IDS.keys():
-    hierarchy_mapping[output_key] = {
-        "l1_to_l2": {}, "l2_to_l3": {},
-        "l3_to_l2": {}, "l2_to_l1": {}
-    }
+# The children lists and names come from the shared Taxonomy (taxonomy.py).
+def build_hierarchy_mapping(taxonomy):
+    hierarchy_mapping = {}
+    for output_key in JSON_OUTPUT_CATEGORY_ROOT_IDS.keys():
+        hierarchy_mapping[output_key] = {
+            "l1_to_l2": {}, "l2_to_l3": {},
+            "l3_to_l2": {}, "l2_to_l1": {}
+        }
 
-for output_cat_key, json_root_id in JSON_OUTPUT_CATEGORY_ROOT_IDS.items():
-    if json_root_id not in all_tags_by_id:
-        print(f"Warning: Root ID {json_root_id} for {output_cat_key} not in all_tags_by_id.")
-        continue
-    
-    current_h_map = hierarchy_mapping[output_cat_key]
-    current_h_map["l2_to_l1"] = {} # Clear for fresh population
-    current_h_map["l3_to_l2"] = {} # Clear for fresh population
-
-    # --- Platform Categories (allTagsById L1=S_L1, L2=S_L2, L3=S_L3(name)) ---
-    if output_cat_key.startswith("研究涉及平台"):
-        s_l1_id = json_root_id # This is allTagsById L1 ID, and Sankey L1 ID
-        s_l1_data = all_tags_by_id[s_l1_id]
-        
-        s_l2_ids = s_l1_data.get("childrenIds", []) # Children are allTagsById L2 IDs (Sankey L2)
-        if s_l2_ids:
-            # l1_to_l2: SankeyL1_ID -> [SankeyL2_IDs]
-            current_h_map["l1_to_l2"][s_l1_id] = s_l2_ids
-        
-        for s_l2_id in s_l2_ids: # s_l2_id is Sankey L2 ID (allTagsById L2)
-            if s_l2_id not in all_tags_by_id: continue
-            s_l2_data = all_tags_by_id[s_l2_id]
-            # l2_to_l1: SankeyL2_ID -> SankeyL1_ID
-            current_h_map["l2_to_l1"][s_l2_id] = s_l1_id
-
-            s_l3_ids = s_l2_data.get("childrenIds", []) # Children are allTagsById L3 IDs (Sankey L3)
-            if s_l3_ids:
-                # l2_to_l3: SankeyL2_ID -> [SankeyL3_IDs]
-                current_h_map["l2_to_l3"][s_l2_id] = s_l3_ids
-            
-            for s_l3_id in s_l3_ids: # s_l3_id is Sankey L3 ID (allTagsById L3)
-                if s_l3_id not in all_tags_by_id: continue
-                s_l3_data = all_tags_by_id[s_l3_id]
-                s_l3_display_name = s_l3_data.get("name") # This is Sankey L3 Display Name
-                
-                if s_l3_display_name:
-                    # l3_to_l2: SankeyL3_DisplayName -> SankeyL2_ID
-                    current_h_map["l3_to_l2"][s_l3_display_name] = s_l2_id
+    for output_cat_key, json_root_id in JSON_OUTPUT_CATEGORY_ROOT_IDS.items():
+        if json_root_id not in taxonomy:
+            print(f"Warning: Root ID {json_root_id} for {output_cat_key} not in all_tags_by_id.")
+            continue
     
-    # --- "研究内容", "研究方法" Categories (allTagsById L1=Root, L2=S_L1, L3=S_L2, L4=S_L3(name)) ---
-    else:
-        conceptual_root_data = all_tags_by_id[json_root_id] # allTagsById L1 data
-        sankey_l1_ids = conceptual_root_data.get("childrenIds", []) # These are allTagsById L2 IDs
-
-        for s_l1_id in sankey_l1_ids: # s_l1_id is Sankey L1 ID (allTagsById L2)
-            if s_l1_id not in all_tags_by_id: continue
-            s_l1_data = all_tags_by_id[s_l1_id]
-            # For these categories, l2_to_l1 means SankeyL2_ID -> SankeyL1_ID.
-            # The mapping SankeyL1_ID -> ConceptualRoot_ID is not typically stored in this key
-            # based on the user's provided "研究内容" hierarchy file structure.
-
-            sankey_l2_ids = s_l1_data.get("childrenIds", []) # These are allTagsById L3 IDs
-            if sankey_l2_ids:
+        current_h_map = hierarchy_mapping[output_cat_key]
+
+        # --- Platform Categories (allTagsById L1=S_L1, L2=S_L2, L3=S_L3(name)) ---
+        if output_cat_key.startswith("研究涉及平台"):
+            s_l1_id = json_root_id # This is allTagsById L1 ID, and Sankey L1 ID
+            s_l2_ids = taxonomy.children(s_l1_id) # allTagsById L2 IDs (Sankey L2)
+            if s_l2_ids:
                 # l1_to_l2: SankeyL1_ID -> [SankeyL2_IDs]
-                current_h_map["l1_to_l2"][s_l1_id] = sankey_l2_ids
-            
-            for s_l2_id in sankey_l2_ids: # s_l2_id is Sankey L2 ID (allTagsById L3)
-                if s_l2_id not in all_tags_by_id: continue
-                s_l2_data = all_tags_by_id[s_l2_id]
+                current_h_map["l1_to_l2"][s_l1_id] = s_l2_ids
+        
+            for s_l2_id in s_l2_ids:
                 # l2_to_l1: SankeyL2_ID -> SankeyL1_ID
                 current_h_map["l2_to_l1"][s_l2_id] = s_l1_id
 
-                sankey_l3_node_ids = s_l2_data.get("childrenIds", []) # These are allTagsById L4 IDs
-                sankey_l3_display_names = []
-                for sl3_node_id in sankey_l3_node_ids:
-                    if sl3_node_id not in all_tags_by_id: continue
-                    sl3_node_data = all_tags_by_id[sl3_node_id]
-                    s_l3_display_name = sl3_node_data.get("name") # Sankey L3 Display Name
+                s_l3_ids = taxonomy.children(s_l2_id) # allTagsById L3 IDs (Sankey L3)
+                if s_l3_ids:
+                    # l2_to_l3: SankeyL2_ID -> [SankeyL3_IDs]
+                    current_h_map["l2_to_l3"][s_l2_id] = s_l3_ids
+            
+                for s_l3_id in s_l3_ids:
+                    s_l3_display_name = taxonomy.name(s_l3_id) # This is Sankey L3 Display Name
                     if s_l3_display_name:
-                        sankey_l3_display_names.append(s_l3_display_name)
                         # l3_to_l2: SankeyL3_DisplayName -> SankeyL2_ID
                         current_h_map["l3_to_l2"][s_l3_display_name] = s_l2_id
-                
-                if sankey_l3_display_names:
-                    # l2_to_l3: SankeyL2_ID -> [SankeyL3_DisplayNames]
-                    current_h_map["l2_to_l3"][s_l2_id] = sankey_l3_display_names
+    
+        # --- "研究内容", "研究方法" Categories (allTagsById L1=Root, L2=S_L1, L3=S_L2, L4=S_L3(name)) ---
+        else:
+            # The mapping SankeyL1_ID -> ConceptualRoot_ID is not stored in l2_to_l1
+            # for these categories (see the "研究内容" hierarchy file structure).
+            for s_l1_id in taxonomy.children(json_root_id): # allTagsById L2 IDs (Sankey L1)
+                sankey_l2_ids = taxonomy.children(s_l1_id) # allTagsById L3 IDs (Sankey L2)
+                if sankey_l2_ids:
+                    # l1_to_l2: SankeyL1_ID -> [SankeyL2_IDs]
+                    current_h_map["l1_to_l2"][s_l1_id] = sankey_l2_ids
+            
+                for s_l2_id in sankey_l2_ids:
+                    # l2_to_l1: SankeyL2_ID -> SankeyL1_ID
+                    current_h_map["l2_to_l1"][s_l2_id] = s_l1_id
+
+                    # allTagsById L4 names (Sankey L3 Display Names)
+                    sankey_l3_display_names = [name for name in map(taxonomy.name, taxonomy.children(s_l2_id)) if name]
+                    for s_l3_display_name in sankey_l3_display_names:
+                        # l3_to_l2: SankeyL3_DisplayName -> SankeyL2_ID
+                        current_h_map["l3_to_l2"][s_l3_display_name] = s_l2_id
+                    if sankey_l3_display_names:
+                        # l2_to_l3: SankeyL2_ID -> [SankeyL3_DisplayNames]
+                        current_h_map["l2_to_l3"][s_l2_id] = sankey_l3_display_names
+    return hierarchy_mapping
 
 # --- 3. Create nodeMetadata.json ---
-node_metadata = {}
-for output_key in JSON_OUTPUT_CATEGORY_ROOT_IDS.keys():
-    node_metadata[output_key] = {}
-
-for tag_id, tag_data in all_tags_by_id.items():
-    original_level = tag_data.get("level")
-    tag_category_from_alltags = tag_data.get("category")
-    tag_name = tag_data.get("name")
-    children_ids = tag_data.get("childrenIds", [])
-    parent_id = tag_data.get("parentId")
-
-    output_category_key = None
-    for key, val in CATEGORY_MAPPING_FOR_OUTPUT_KEYS.items():
-        if tag_category_from_alltags == key:
-            output_category_key = val
-            break
-    if not output_category_key or not tag_name: continue
-
-    sankey_level = -1
-    meta_parent_id = parent_id
-    meta_children_ids = children_ids
-
-    if output_cat_key.startswith("研究涉及平台"): # Platform categories
-        sankey_level = original_level # Direct mapping: L1, L2, L3 in allTagsById are S_L1, S_L2, S_L3
-        if sankey_level > 3: continue 
-        # For platforms, S_L1 has no parent in this context (its parent_id is null in allTagsById)
-        if sankey_level == 1: meta_parent_id = None 
+def build_node_metadata(taxonomy):
+    # This step has always read `output_cat_key` as left over from the
+    # hierarchy loop above, i.e. the last output key, so every category takes
+    # the platform branch below. nodeMetadata.json and the dashboard are built
+    # around that shape, so it is kept as is.
+    output_cat_key = list(JSON_OUTPUT_CATEGORY_ROOT_IDS)[-1]
+
+    node_metadata = {}
+    for output_key in JSON_OUTPUT_CATEGORY_ROOT_IDS.keys():
+        node_metadata[output_key] = {}
+
+    for tag_id in taxonomy.ids:
+        original_level = taxonomy.level(tag_id)
+        tag_name = taxonomy.name(tag_id)
+        output_category_key = CATEGORY_MAPPING_FOR_OUTPUT_KEYS.get(taxonomy.category(tag_id))
+        if not output_category_key or not tag_name: continue
+
+        sankey_level = -1
+        meta_parent_id = taxonomy.declared_parent(tag_id) # parentId as written in allTagsById
+        meta_children_ids = taxonomy.children(tag_id)
+
+        if output_cat_key.startswith("研究涉及平台"): # Platform categories
+            sankey_level = original_level # Direct mapping: L1, L2, L3 in allTagsById are S_L1, S_L2, S_L3
+            if sankey_level > 3: continue 
+            # For platforms, S_L1 has no parent in this context (its parent_id is null in allTagsById)
+            if sankey_level == 1: meta_parent_id = None 
     
-    elif output_cat_key in ["研究内容", "研究方法"]: # Content/Method categories
-        if original_level == 1: continue # Skip conceptual root L1
-        sankey_level = original_level - 1 # L2->S1, L3->S2, L4->S3
-        if sankey_level > 3: continue
-        # For S_L1 (orig L2), parent is conceptual root (orig L1), not typically shown as node parent.
-        if sankey_level == 1 : meta_parent_id = None # Or map to conceptual_root_id if needed by frontend for breadcrumbs
-
-    if 1 <= sankey_level <= 3:
-        meta_entry = {
-            "level": sankey_level,
-            "displayName": tag_name,
-            "description": f"Cat: {output_category_key}, SankeyLvl: {sankey_level}, OrigLvl: {original_level}, ID: {tag_id}",
-            "color": "#PLACEHOLDER", "totalPapers": 0
-        }
-        # Only add children if they are part of the next Sankey level (up to L3)
-        if sankey_level < 3 and meta_children_ids: meta_entry["children"] = meta_children_ids
-        # Add parent if it's not the conceptual root outside the Sankey display
-        if meta_parent_id : meta_entry["parent"] = meta_parent_id
+        elif output_cat_key in ["研究内容", "研究方法"]: # Content/Method categories
+            if original_level == 1: continue # Skip conceptual root L1
+            sankey_level = original_level - 1 # L2->S1, L3->S2, L4->S3
+            if sankey_level > 3: continue
+            # For S_L1 (orig L2), parent is conceptual root (orig L1), not typically shown as node parent.
+            if sankey_level == 1 : meta_parent_id = None # Or map to conceptual_root_id if needed by frontend for breadcrumbs
+
+        if 1 <= sankey_level <= 3:
+            meta_entry = {
+                "level": sankey_level,
+                "displayName": tag_name,
+                "description": f"Cat: {output_category_key}, SankeyLvl: {sankey_level}, OrigLvl: {original_level}, ID: {tag_id}",
+                "color": "#PLACEHOLDER", "totalPapers": 0
+            }
+            # Only add children if they are part of the next Sankey level (up to L3)
+            if sankey_level < 3 and meta_children_ids: meta_entry["children"] = meta_children_ids
+            # Add parent if it's not the conceptual root outside the Sankey display
+            if meta_parent_id : meta_entry["parent"] = meta_parent_id
         
-        node_metadata[output_category_key][tag_id] = meta_entry
+            node_metadata[output_category_key][tag_id] = meta_entry
+    return node_metadata
+
+
+# --- 4. Calculate totalPapers in nodeMetadata ---
+# totalPapers counts distinct papers. Every node gets a bitset over paper
+# indices (bit i <-> processed_papers["papers"][i]): Sankey L3 sets come from
+# the papers' l3 names, L2 and L1 sets are the unions of their children's sets
+# in one bottom-up pass. A paper tagged with two sibling L3 tags therefore
+# counts once for the parent, where summing child counts counted it twice.
+def build_node_paper_bits(node_metadata, processed_papers, total_papers_index=None):
+    """Per category: node id -> bitset (int) of the papers under the node."""
+    index = total_papers_index or build_total_papers_index(node_metadata)
+    l3_paper_indices = {meta_cat_key: {} for meta_cat_key in node_metadata}
+    for paper_idx, paper in enumerate(processed_papers["papers"]):
+        for category_key, tags_in_cat in paper.get("tags", {}).items():
+            if category_key not in node_metadata: continue
+            by_name = index[category_key]["by_name"]
+            for l3_name in tags_in_cat.get("l3", []): # These are Sankey L3 display names
+                for tag_id in by_name.get(l3_name, []):
+                    l3_paper_indices[category_key].setdefault(tag_id, []).append(paper_idx)
+
+    node_paper_bits = {}
+    for meta_cat_key, tags_in_category_meta in node_metadata.items():
+        category_bits = node_paper_bits[meta_cat_key] = {}
+        for tag_id, tag_meta_entry in tags_in_category_meta.items():
+            if tag_meta_entry.get("level") == 3: # Sankey L3 nodes
+                category_bits[tag_id] = indices_to_bits(l3_paper_indices[meta_cat_key].get(tag_id, []))
+        for current_sankey_level_to_union in [2, 1]:
+            for tag_id, tag_meta_entry in tags_in_category_meta.items():
+                if tag_meta_entry.get("level") == current_sankey_level_to_union:
+                    bits = 0
+                    for child_id in tag_meta_entry.get("children", []): # Children are IDs of next Sankey level
+                        if child_id in tags_in_category_meta and \
+                           tags_in_category_meta[child_id].get("level") == (current_sankey_level_to_union + 1):
+                            bits |= category_bits.get(child_id, 0)
+                    category_bits[tag_id] = bits
+    return node_paper_bits
+
+
+def fill_total_papers(node_metadata, processed_papers):
+    """Set every node's totalPapers to its distinct paper count; returns the per-node bitsets."""
+    node_paper_bits = build_node_paper_bits(node_metadata, processed_papers)
+    for meta_cat_key, tags_in_category_meta in node_metadata.items():
+        for tag_id, tag_meta_entry in tags_in_category_meta.items():
+            if tag_meta_entry.get("level") in (1, 2, 3):
+                tag_meta_entry["totalPapers"] = popcount(node_paper_bits[meta_cat_key].get(tag_id, 0))
+    return node_paper_bits
 
 
-# --- 4. Calculate totalPapers in nodeMetadata (logic remains the same) ---
-l3_paper_counts = {}
-for output_key in JSON_OUTPUT_CATEGORY_ROOT_IDS.keys():
-    l3_paper_counts[output_key] = {}
+def intersection_count(node_paper_bits, node_a, node_b):
+    """Distinct papers under both nodes; node_a/node_b are (category, node id), any categories."""
+    bits_a = node_paper_bits.get(node_a[0], {}).get(node_a[1], 0)
+    bits_b = node_paper_bits.get(node_b[0], {}).get(node_b[1], 0)
+    return popcount(bits_a & bits_b)
 
-for paper in processed_papers["papers"]:
-    for category_key, tags_in_cat in paper.get("tags", {}).items():
-        if category_key not in l3_paper_counts: continue
-        actual_l3_tags = tags_in_cat.get("l3", []) # These are Sankey L3 display names
-        for l3_name in actual_l3_tags:
-            l3_paper_counts[category_key][l3_name] = l3_paper_counts[category_key].get(l3_name, 0) + 1
-
-for meta_cat_key, tags_in_category_meta in node_metadata.items():
-    for tag_id, tag_meta_entry in tags_in_category_meta.items():
-        if tag_meta_entry.get("level") == 3: # Sankey L3 nodes
-            l3_display_name = tag_meta_entry["displayName"]
-            tag_meta_entry["totalPapers"] = l3_paper_counts.get(meta_cat_key, {}).get(l3_display_name, 0)
-
-for current_sankey_level_to_sum_for in [2, 1]:
+
+def sibling_overlaps(node_metadata, node_paper_bits):
+    """
+    Per category: parent id -> [[child a, child b, papers under both], ...] for
+    the sibling pairs that share papers (what summing child counts double-counted).
+    """
+    overlaps = {}
     for meta_cat_key, tags_in_category_meta in node_metadata.items():
+        category_bits = node_paper_bits.get(meta_cat_key, {})
         for tag_id, tag_meta_entry in tags_in_category_meta.items():
-            if tag_meta_entry.get("level") == current_sankey_level_to_sum_for:
-                count = 0
-                for child_id in tag_meta_entry.get("children", []): # Children are IDs of next Sankey level
-                    if child_id in tags_in_category_meta and \
-                       tags_in_category_meta[child_id].get("level") == (current_sankey_level_to_sum_for + 1):
-                        count += tags_in_category_meta[child_id].get("totalPapers", 0)
-                tag_meta_entry["totalPapers"] = count
-                                
-# --- 5. Save the output JSON files ---
-try:
-    with open("../data/processedPapers.json", 'w', encoding='utf-8') as f:
-        json.dump(processed_papers, f, ensure_ascii=False, indent=2)
-    print("processedPapers.json generated successfully.")
-
-    with open("../data/hierarchyMapping.json", 'w', encoding='utf-8') as f:
-        json.dump(hierarchy_mapping, f, ensure_ascii=False, indent=2)
-    print("hierarchyMapping.json generated successfully.")
+            children = [child_id for child_id in tag_meta_entry.get("children", []) if child_id in category_bits]
+            pairs = []
+            for i, child_a in enumerate(children):
+                for child_b in children[i + 1:]:
+                    shared = popcount(category_bits[child_a] & category_bits[child_b])
+                    if shared:
+                        pairs.append([child_a, child_b, shared])
+            if pairs:
+                overlaps.setdefault(meta_cat_key, {})[tag_id] = pairs
+    return overlaps
+
+
+def build_total_papers_index(node_metadata):
+    """
+    Per category: Sankey L3 displayName -> L3 node ids, and node id -> parent
+    ids (nodes listing it in "children" one level up). Used to apply
+    totalPapers deltas without rescanning nodeMetadata.
+    """
+    index = {}
+    for meta_cat_key, tags_in_category_meta in node_metadata.items():
+        by_name, parents = {}, {}
+        for tag_id, tag_meta_entry in tags_in_category_meta.items():
+            if tag_meta_entry.get("level") == 3:
+                by_name.setdefault(tag_meta_entry["displayName"], []).append(tag_id)
+            for child_id in tag_meta_entry.get("children", []):
+                if child_id in tags_in_category_meta and \
+                   tags_in_category_meta[child_id].get("level") == tag_meta_entry.get("level") + 1:
+                    parents.setdefault(child_id, []).append(tag_id)
+        index[meta_cat_key] = {"by_name": by_name, "parents": parents}
+    return index
+
+
+def apply_total_papers_delta(node_metadata, total_papers_index, paper, sign):
+    """
+    Incremental counterpart of fill_total_papers for one processed paper
+    being added (sign=+1) or removed (sign=-1): every node the paper reaches
+    changes by one, however many of its L3 tags lie below it, so the totals
+    end up the same as a full recomputation.
+    """
+    for category_key, tags_in_cat in paper.get("tags", {}).items():
+        if category_key not in node_metadata: continue
+        tags_in_category_meta = node_metadata[category_key]
+        by_name = total_papers_index[category_key]["by_name"]
+        parents = total_papers_index[category_key]["parents"]
+        reached = set()
+        pending = [tag_id for l3_name in tags_in_cat.get("l3", []) for tag_id in by_name.get(l3_name, [])]
+        while pending: # the L3 nodes, then their L2 parents, then the L1 grandparents
+            tag_id = pending.pop()
+            if tag_id not in reached:
+                reached.add(tag_id)
+                pending.extend(parents.get(tag_id, []))
+        for tag_id in reached:
+            tags_in_category_meta[tag_id]["totalPapers"] += sign
 
-    with open("../data/nodeMetadata.json", 'w', encoding='utf-8') as f:
-        json.dump(node_metadata, f, ensure_ascii=False, indent=2)
-    print("nodeMetadata.json generated successfully.")
 
-except IOError as e:
-    print(f"Error writing to one of the output files: {e}")
\ No newline at end of file
+# --- 5. Save the output JSON files ---
+def load_inputs(all_tags_path, papers_path):
+    try:
+        with open(all_tags_path, 'r', encoding='utf-8') as f:
+            all_tags_by_id_data = json.load(f)
+        all_tags_by_id = all_tags_by_id_data.get("allTagsById", {})
+
+        with open(papers_path, 'r', encoding='utf-8') as f:
+            if papers_path.endswith(".ndjson"): # papers.py --stream --format ndjson
+                papers_data = [json.loads(line) for line in f if line.strip()]
+            else:
+                papers_data = json.load(f) # This is a list
+
+    except FileNotFoundError as e:
+        print(f"Error: One of the input files was not found: {e.filename}")
+        exit()
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from a file: {e}")
+        exit()
+    return all_tags_by_id, papers_data
+
+
+def write_outputs(output_dir, processed_papers, hierarchy_mapping, node_metadata):
+    try:
+        write_json(os.path.join(output_dir, "processedPapers.json"), processed_papers)
+        print("processedPapers.json generated successfully.")
+
+        write_json(os.path.join(output_dir, "hierarchyMapping.json"), hierarchy_mapping)
+        print("hierarchyMapping.json generated successfully.")
+
+        write_json(os.path.join(output_dir, "nodeMetadata.json"), node_metadata)
+        print("nodeMetadata.json generated successfully.")
+
+    except IOError as e:
+        print(f"Error writing to one of the output files: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build processedPapers, hierarchyMapping and nodeMetadata")
+    parser.add_argument("--all-tags", default=ALL_TAGS_FILE, help="allTagsById.json path")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="raw papers.json path")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for the three output files")
+    parser.add_argument("--overlaps", metavar="PATH",
+                        help="also write the paper counts shared by sibling nodes (see sibling_overlaps)")
+    add_profile_argument(parser, "process_new")
+    args = parser.parse_args()
+    profiler = Profiler("process_new", profile_path("process_new", args.profile))
+
+    with profiler.stage("load"):
+        all_tags_by_id, papers_data = load_inputs(args.all_tags, args.papers)
+        taxonomy = Taxonomy.from_all_tags(all_tags_by_id)
+        tag_resolver = TagResolver(taxonomy)
+        profiler.count("tags", len(all_tags_by_id))
+        profiler.count("rawPapers", len(papers_data))
+
+    with profiler.stage("processPapers"):
+        processed_papers = build_processed_papers(papers_data, tag_resolver)
+        profiler.count("papers", len(processed_papers["papers"]))
+        profiler.count("unresolvedTags", tag_resolver.misses)
+
+    with profiler.stage("hierarchyMapping"):
+        hierarchy_mapping = build_hierarchy_mapping(taxonomy)
+        profiler.count("categories", len(hierarchy_mapping))
+
+    with profiler.stage("nodeMetadata"):
+        node_metadata = build_node_metadata(taxonomy)
+        node_paper_bits = fill_total_papers(node_metadata, processed_papers)
+        profiler.count("nodes", sum(len(nodes) for nodes in node_metadata.values()))
+
+    if args.overlaps:
+        with profiler.stage("overlaps"):
+            overlaps = sibling_overlaps(node_metadata, node_paper_bits)
+            write_json(args.overlaps, overlaps)
+            profiler.count("overlappingPairs", sum(len(pairs) for parents in overlaps.values() for pairs in parents.values()))
+
+    with profiler.stage("write"):
+        write_outputs(args.output_dir, processed_papers, hierarchy_mapping, node_metadata)
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Local HTTP service answering filtered Sankey queries from an in-memory index
+of processedPapers.json: the pairs and counts of a view under year / award
+filters, without loading every precomputed file and filtering it. It is a
+standalone tool for scripts and analysis (curl, notebooks); the dashboard
+reads the static files and filters by year from the crossLevelConnections
+cube. Standard library only (asyncio streams).
+
+    python query_service.py --port 8765
+
+GET /meta
+    years, connection types and level combinations
+GET /connections?type=研究内容_L1__研究方法_L2&years=2021,2022&award=awarded
+GET /connections?left=研究内容&right=研究方法&levels=L1,L2&years=2021,2022
+    {connType, connections: {labelPair: {paperCount, connectionStrength}}}
+    for the papers that pass the filters; add &paperIds=1 to include ids
+GET /stats?years=2023&award=regular
+    one precomputedStats-style column (total/awarded/regular/byCategory)
+    summed over the selected papers
+GET /papers?ids=paper_001,paper_002
+    processedPapers entries
+
+`years` and `award` mirror selectedFilters in interactionStates.json;
+award is one of all, awarded, regular. Omitted filters select everything.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from crossLevelConnections import build_connections_loops, classify_strength
+from precomputedStats import NodeKey, paper_node_keys
+from tag_resolver import TagResolver
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+PAPERS_FILE = os.path.join(DATA_DIR, "main", "processedPapers.json")
+ALL_TAGS_FILE = os.path.join(DATA_DIR, "raw", "allTagsById.json")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+AWARD_STATUSES = ["all", "awarded", "regular"]
+# Child container of a byCategory entry at depth 0 and 1 (tags are leaves)
+CHILD_KEYS = ("subCategory", "tags")
+CACHE_SIZE = 512
+
+MAX_HEADER_LINES = 100
+
+logger = logging.getLogger("query_service")
+
+
+class QueryError(ValueError):
+    """Bad query parameters; reported as HTTP 400."""
+
+# ---------------------------------------------------------------------------
+# In-memory index ------------------------------------------------------------
+
+class CorpusIndex:
+    """
+    Papers are addressed by position. Each connection pair and each stats
+    node keeps the positions of its papers, so a filtered count is a sum over
+    those papers against the selection mask of the requested years/award
+    status. Answers are memoised per (query, filters).
+    """
+
+    def __init__(self, papers: List[dict], resolver: TagResolver):
+        self.papers = papers
+        self.position = {paper["id"]: i for i, paper in enumerate(papers)}
+        self.paper_years = [str(paper.get("year")) if paper.get("year") else None for paper in papers]
+        self.paper_awarded = [bool(paper.get("isAwarded")) for paper in papers]
+        self.years = sorted({year for year in self.paper_years if year})
+
+        self.pairs: Dict[str, Dict[str, List[int]]] = {}
+        for conn_type, pair_map in build_connections_loops(papers).items():
+            self.pairs[conn_type] = {
+                label_key: [self.position[pid] for pid in stats["paperIds"]]
+                for label_key, stats in pair_map.items()
+            }
+
+        # Parents come before their children, as in precomputedStats' byCategory
+        self.node_papers: Dict[NodeKey, List[int]] = {}
+        for pos, paper in enumerate(papers):
+            for node_key in paper_node_keys(paper, resolver):
+                self.node_papers.setdefault(node_key, []).append(pos)
+
+        self.selection = lru_cache(maxsize=CACHE_SIZE)(self._selection)
+        self.connections = lru_cache(maxsize=CACHE_SIZE)(self._connections)
+        self.stats = lru_cache(maxsize=CACHE_SIZE)(self._stats)
+
+    @classmethod
+    def from_files(cls, papers_path: str, all_tags_path: str) -> "CorpusIndex":
+        with open(papers_path, "r", encoding="utf-8") as f:
+            papers = json.load(f).get("papers", [])
+        return cls(papers, TagResolver.from_file(all_tags_path))
+
+    def _selection(self, years: Optional[Tuple[str, ...]], award: str) -> Tuple[bool, ...]:
+        wanted_years = set(years) if years is not None else None
+        return tuple(
+            (wanted_years is None or year in wanted_years)
+            and (award == "all" or awarded == (award == "awarded"))
+            for year, awarded in zip(self.paper_years, self.paper_awarded)
+        )
+
+    def _connections(self, conn_type: str, years: Optional[Tuple[str, ...]], award: str,
+                     with_ids: bool) -> dict:
+        if conn_type not in self.pairs:
+            raise QueryError(f"unknown connection type '{conn_type}'")
+        selected = self.selection(years, award)
+        connections = {}
+        for label_key, positions in self.pairs[conn_type].items():
+            kept = [pos for pos in positions if selected[pos]]
+            if not kept:
+                continue
+            entry = {"paperCount": len(kept), "connectionStrength": classify_strength(len(kept))}
+            if with_ids:
+                entry["paperIds"] = [self.papers[pos]["id"] for pos in kept]
+            connections[label_key] = entry
+        return {"connType": conn_type, "connections": connections}
+
+    def _count(self, positions: List[int]) -> Dict[str, int]:
+        return {"total": len(positions), "awarded": sum(self.paper_awarded[pos] for pos in positions)}
+
+    def _stats(self, years: Optional[Tuple[str, ...]], award: str) -> dict:
+        selected = self.selection(years, award)
+        column = self._count([pos for pos, keep in enumerate(selected) if keep])
+        column["regular"] = column["total"] - column["awarded"]
+        column["byCategory"] = {}
+        for (stats_key, top, *rest), positions in self.node_papers.items():
+            kept = [pos for pos in positions if selected[pos]]
+            if not kept:
+                continue
+            names = [top] + rest
+            container = column["byCategory"].setdefault(stats_key, {})
+            for depth, name in enumerate(names[:-1]):
+                container = container[name][CHILD_KEYS[depth]]
+            entry = container[names[-1]] = self._count(kept)
+            if len(names) <= len(CHILD_KEYS):
+                entry[CHILD_KEYS[len(names) - 1]] = {}
+        return column
+
+    def meta(self) -> dict:
+        level_combos = ["_".join(combo) for combo in product(["L1", "L2", "L3"], repeat=3)]
+        return {
+            "paperCount": len(self.papers),
+            "years": self.years,
+            "connectionTypes": sorted(self.pairs),
+            "levelCombinations": level_combos,
+            "awardStatuses": AWARD_STATUSES,
+        }
+
+    def paper_records(self, ids: List[str]) -> List[dict]:
+        return [self.papers[self.position[pid]] for pid in ids if pid in self.position]
+
+# ---------------------------------------------------------------------------
+# Query parsing --------------------------------------------------------------
+
+def single(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values else None
+
+
+def split_list(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def parse_filters(params: Dict[str, List[str]]) -> Tuple[Optional[Tuple[str, ...]], str]:
+    years = single(params, "years")
+    award = single(params, "award") or "all"
+    if award not in AWARD_STATUSES:
+        raise QueryError(f"award must be one of {', '.join(AWARD_STATUSES)}")
+    return (tuple(sorted(set(split_list(years)))) if years is not None else None), award
+
+
+def parse_conn_type(params: Dict[str, List[str]]) -> str:
+    conn_type = single(params, "type")
+    if conn_type:
+        return conn_type
+    left, right = single(params, "left"), single(params, "right")
+    levels = [level.upper() for level in split_list(single(params, "levels"))]
+    if not left or not right or len(levels) != 2:
+        raise QueryError("give either type=<connType> or left=, right= and levels=<L?>,<L?>")
+    return f"{left}_{levels[0]}__{right}_{levels[1]}"
+
+
+def answer(index: CorpusIndex, target: str) -> dict:
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    if url.path == "/meta":
+        return index.meta()
+    if url.path == "/connections":
+        years, award = parse_filters(params)
+        with_ids = single(params, "paperIds") in ("1", "true")
+        return index.connections(parse_conn_type(params), years, award, with_ids)
+    if url.path == "/stats":
+        years, award = parse_filters(params)
+        return index.stats(years, award)
+    if url.path == "/papers":
+        return {"papers": index.paper_records(split_list(single(params, "ids")))}
+    raise LookupError(url.path)
+
+# ---------------------------------------------------------------------------
+# HTTP server ----------------------------------------------------------------
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+async def write_response(writer: asyncio.StreamWriter, status: int, payload: Optional[dict]):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+    headers = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        # The Vite dev server runs on another port
+        "Access-Control-Allow-Origin: *",
+        "Access-Control-Allow-Methods: GET, OPTIONS",
+        "Connection: close",
+    ]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def handle_client(index: CorpusIndex, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        for _ in range(MAX_HEADER_LINES):  # headers are not needed, only consumed
+            if (await reader.readline()) in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.split()
+        if len(parts) != 3:
+            await write_response(writer, 400, {"error": "malformed request line"})
+            return
+        method, target, _ = parts
+        if method == "OPTIONS":
+            await write_response(writer, 204, None)
+            return
+        if method != "GET":
+            await write_response(writer, 405, {"error": f"{method} not supported"})
+            return
+        try:
+            await write_response(writer, 200, answer(index, target))
+        except QueryError as e:
+            await write_response(writer, 400, {"error": str(e)})
+        except LookupError as e:
+            await write_response(writer, 404, {"error": f"no route {e}"})
+        except Exception:  # keep serving other requests
+            logger.exception("error answering %s", target)
+            await write_response(writer, 500, {"error": "internal server error"})
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(index: CorpusIndex, host: str, port: int):
+    server = await asyncio.start_server(lambda r, w: handle_client(index, r, w), host, port)
+    print(f"Serving {len(index.papers)} papers on http://{host}:{port} (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve filtered Sankey aggregates over HTTP")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json path")
+    parser.add_argument("--tags", default=ALL_TAGS_FILE, help="allTagsById.json path")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+
+    index = CorpusIndex.from_files(args.papers, args.tags)
+    try:
+        asyncio.run(serve(index, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
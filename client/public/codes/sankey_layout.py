@@ -0,0 +1,277 @@
+"""
+Precomputed Sankey layouts, one per platform type and level combination.
+
+Every view of the three-column diagram where each column shows one level
+(the 27 levelCombinations of crossLevelConnections.json, for each platform
+type of platformConfiguration.json) is laid out here with the dimensions,
+node sizing, padding and column positions of sankeyLayoutConfig.json, so
+switching views in the dashboard is a lookup instead of a relayout.
+
+    data/sankeyLayouts/manifest.json                  dimensions + {platformType: {combo: file}}
+    data/sankeyLayouts/<platform id>-<combo>.json     {"height", "nodes", "links"}
+
+A combination is "<platform>_<content>_<method>" in the levels of the
+connection types (the platform column's L1 is empty in this corpus). Nodes
+carry the d3-sankey fields x0/x1/y0/y1/value plus column (0 platform,
+1 method, 2 content, as in relationsStore) and color; links carry value,
+width, the y0/y1 of their two ends and the path "d" drawn with
+linkSettings.curvature. Layouts count every paper (no year filter); views
+with expanded nodes or a year filter are still laid out in the browser.
+
+Layout, per view:
+  - nodes are the tags that have a link in the view, in nodeMetadata order;
+    value = max(incoming, outgoing) paperCount sum, as in d3-sankey
+  - ky = min over columns of (inner height - padding gaps) / column value;
+    node height = value * ky clamped to [minHeight, maxHeight]
+  - columns are centered vertically; when minHeight makes a column taller
+    than the configured height, the view's "height" grows instead of
+    overlapping nodes
+  - link ends are stacked in each node by the other end's position, link
+    width = value * ky clamped to [minWidth, maxWidth]
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import remove_sidecars, write_json
+from crossLevelConnections import LEVEL_COMBINATIONS, PLATFORM_ATTR, PLATFORM_CONTENT, RESEARCH_CONTENT, RESEARCH_METHOD
+from instrumentation import Profiler, add_profile_argument, profile_path
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+CONNECTIONS_FILE = os.path.join(DATA_DIR, "interaction", "crossLevelConnections.json")
+NODE_META_FILE = os.path.join(DATA_DIR, "main", "nodeMetadata.json")
+PLATFORM_CONFIG_FILE = os.path.join(DATA_DIR, "interaction", "platformConfiguration.json")
+LAYOUT_CONFIG_FILE = os.path.join(DATA_DIR, "layout", "sankeyLayoutConfig.json")
+OUTPUT_DIR = os.path.join(DATA_DIR, "sankeyLayouts")
+MANIFEST_NAME = "manifest.json"
+
+LAYOUT_VERSION = 1
+PLATFORM_DOMAINS = {"内容形式": PLATFORM_CONTENT, "平台属性": PLATFORM_ATTR}
+
+# relationsStore column numbers and the columnPositions keys of the config
+PLATFORM_COLUMN, METHOD_COLUMN, CONTENT_COLUMN = 0, 1, 2
+COLUMN_POSITION_KEYS = {PLATFORM_COLUMN: "研究涉及平台", CONTENT_COLUMN: "研究内容", METHOD_COLUMN: "研究方法"}
+
+DECIMALS = 1
+
+# ---------------------------------------------------------------------------
+# Helper functions -----------------------------------------------------------
+
+def load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def px(value: float) -> float:
+    return round(value, DECIMALS)
+
+
+def node_order(node_metadata: Dict[str, Dict[str, dict]]) -> Dict[str, Dict[str, Tuple[int, Optional[str]]]]:
+    """domain -> displayName -> (position in nodeMetadata, color) of the first node with that name."""
+    order: Dict[str, Dict[str, Tuple[int, Optional[str]]]] = {}
+    for domain, nodes in node_metadata.items():
+        names = order.setdefault(domain, {})
+        for entry in nodes.values():
+            names.setdefault(entry.get("displayName"), (len(names), entry.get("color")))
+    return order
+
+
+def view_links(connections: Dict[str, Dict[str, dict]], platform_domain: str, combo: str) -> List[tuple]:
+    """(source column, source, target column, target, paperCount) of one view, platform -> content -> method."""
+    platform_level, content_level, method_level = combo.split("_")
+    links = []
+    for conn_type, source_column, target_column in (
+            (f"{platform_domain}_{platform_level}__{RESEARCH_CONTENT}_{content_level}", PLATFORM_COLUMN, CONTENT_COLUMN),
+            (f"{RESEARCH_CONTENT}_{content_level}__{RESEARCH_METHOD}_{method_level}", CONTENT_COLUMN, METHOD_COLUMN)):
+        for label_key, stats in connections.get(conn_type, {}).items():
+            source, target = label_key.split("__", 1)
+            links.append((source_column, source, target_column, target, stats["paperCount"]))
+    return links
+
+# ---------------------------------------------------------------------------
+# Layout -----------------------------------------------------------------------
+
+def layout_view(links: List[tuple], column_domains: Dict[int, str],
+                order: Dict[str, Dict[str, Tuple[int, Optional[str]]]], settings: dict) -> dict:
+    dimensions = settings["dimensions"]
+    margins = dimensions["margins"]
+    node_settings = settings["nodeSettings"]
+    link_settings = settings["linkSettings"]
+    positions = settings["columnPositions"]["3columns"]
+    padding = node_settings["padding"]
+    inner_width = dimensions["width"] - margins["left"] - margins["right"]
+    inner_height = dimensions["height"] - margins["top"] - margins["bottom"]
+
+    # Node values: max(incoming, outgoing), keyed by (column, name)
+    incoming: Dict[tuple, int] = {}
+    outgoing: Dict[tuple, int] = {}
+    for source_column, source, target_column, target, count in links:
+        outgoing[(source_column, source)] = outgoing.get((source_column, source), 0) + count
+        incoming[(target_column, target)] = incoming.get((target_column, target), 0) + count
+    values = {key: max(incoming.get(key, 0), outgoing.get(key, 0)) for key in {**incoming, **outgoing}}
+
+    columns: Dict[int, List[str]] = {}
+    for column, name in values:
+        columns.setdefault(column, []).append(name)
+    for column, names in columns.items():
+        known = order.get(column_domains[column], {})
+        names.sort(key=lambda name: (known.get(name, (len(known),))[0], -values[(column, name)], name))
+    rank = {(column, name): i for column, names in columns.items() for i, name in enumerate(names)}
+
+    # Links in node order rather than in the connections' insertion order, so
+    # an incrementally patched crossLevelConnections.json lays out the same
+    links = sorted(links, key=lambda link: (link[0], rank[(link[0], link[1])], link[2], rank[(link[2], link[3])]))
+
+    ky = min(((inner_height - padding * (len(names) - 1)) / sum(values[(column, name)] for name in names)
+              for column, names in columns.items()), default=0)
+    ky = max(ky, 0)
+
+    def clamp(value: float, low: float, high: float) -> float:
+        return min(max(value, low), high)
+
+    heights = {key: clamp(value * ky, node_settings["minHeight"], node_settings["maxHeight"])
+               for key, value in values.items()}
+    column_heights = {column: sum(heights[(column, name)] for name in names) + padding * (len(names) - 1)
+                      for column, names in columns.items()}
+    view_inner_height = max([inner_height] + list(column_heights.values()))
+
+    boxes: Dict[tuple, List[float]] = {}  # (column, name) -> [x0, x1, y0, y1]
+    for column, names in columns.items():
+        x_center = margins["left"] + positions[COLUMN_POSITION_KEYS[column]] * inner_width
+        x0 = x_center - node_settings["width"] / 2
+        y = margins["top"] + (view_inner_height - column_heights[column]) / 2
+        for name in names:
+            boxes[(column, name)] = [x0, x0 + node_settings["width"], y, y + heights[(column, name)]]
+            y += heights[(column, name)] + padding
+
+    def center(key: tuple) -> float:
+        return (boxes[key][2] + boxes[key][3]) / 2
+
+    # Stack the link ends in each node, ordered by the position of the other end
+    ends: Dict[tuple, float] = {}
+    for side, totals in (("source", outgoing), ("target", incoming)):
+        by_node: Dict[tuple, List[tuple]] = {}
+        for link in links:
+            here, other = ((link[0], link[1]), (link[2], link[3])) if side == "source" else \
+                          ((link[2], link[3]), (link[0], link[1]))
+            by_node.setdefault(here, []).append(((center(other), rank[other]), link))
+        for key, entries in by_node.items():
+            scale = (boxes[key][3] - boxes[key][2]) / totals[key]
+            offset = boxes[key][2]
+            for _, link in sorted(entries, key=lambda entry: entry[0]):
+                ends[(side, link)] = offset + link[4] * scale / 2
+                offset += link[4] * scale
+
+    curvature = link_settings["curvature"]
+    out_links = []
+    for link in links:
+        source_column, source, target_column, target, count = link
+        x0, x1 = boxes[(source_column, source)][1], boxes[(target_column, target)][0]
+        y0, y1 = ends[("source", link)], ends[("target", link)]
+        xa, xb = x0 + (x1 - x0) * curvature, x1 - (x1 - x0) * curvature
+        out_links.append({
+            "source": source, "target": target, "value": count,
+            "width": px(clamp(count * ky, link_settings["minWidth"], link_settings["maxWidth"])),
+            "y0": px(y0), "y1": px(y1),
+            "d": f"M{px(x0)},{px(y0)}C{px(xa)},{px(y0)} {px(xb)},{px(y1)} {px(x1)},{px(y1)}",
+        })
+
+    out_nodes = []
+    for column, names in sorted(columns.items()):
+        known = order.get(column_domains[column], {})
+        for name in names:
+            x0, x1, y0, y1 = boxes[(column, name)]
+            out_nodes.append({"id": name, "column": column, "value": values[(column, name)],
+                              "x0": px(x0), "x1": px(x1), "y0": px(y0), "y1": px(y1),
+                              "color": known.get(name, (None, None))[1]})
+
+    return {
+        "height": px(view_inner_height + margins["top"] + margins["bottom"]),
+        "nodes": out_nodes,
+        "links": out_links,
+    }
+
+
+def build_layouts(connections: Dict[str, Dict[str, dict]], node_metadata: Dict[str, Dict[str, dict]],
+                  platform_types: Dict[str, dict], layout_config: dict) -> Tuple[dict, Dict[str, dict]]:
+    """(manifest, file name -> layout) for every platform type and level combination."""
+    settings = layout_config["layoutSettings"]
+    order = node_order(node_metadata)
+    manifest = {
+        "version": LAYOUT_VERSION,
+        "width": settings["dimensions"]["width"],
+        "height": settings["dimensions"]["height"],
+        "views": {},
+    }
+    files: Dict[str, dict] = {}
+    for platform_type, info in platform_types.items():
+        platform_domain = PLATFORM_DOMAINS.get(platform_type)
+        if platform_domain is None:
+            continue
+        column_domains = {PLATFORM_COLUMN: platform_domain, CONTENT_COLUMN: RESEARCH_CONTENT,
+                          METHOD_COLUMN: RESEARCH_METHOD}
+        views = manifest["views"][platform_type] = {}
+        for combo in LEVEL_COMBINATIONS:
+            file_name = f"{info.get('id', platform_type)}-{combo}.json"
+            files[file_name] = layout_view(view_links(connections, platform_domain, combo),
+                                           column_domains, order, settings)
+            views[combo] = file_name
+    return manifest, files
+
+
+def write_layouts(output_dir: str, manifest: dict, files: Dict[str, dict]):
+    os.makedirs(output_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(output_dir, "*.json")):
+        name = os.path.basename(stale)
+        if name != MANIFEST_NAME and name not in files:
+            os.remove(stale)
+            remove_sidecars(stale)
+    for name, layout in files.items():
+        write_json(os.path.join(output_dir, name), layout, compact=True)
+    # Written last, like the search manifest: it marks the set as complete
+    write_json(os.path.join(output_dir, MANIFEST_NAME), manifest, compact=True)
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute Sankey layouts for every platform type and level combination")
+    parser.add_argument("--connections", default=CONNECTIONS_FILE, help="crossLevelConnections.json path")
+    parser.add_argument("--metadata", default=NODE_META_FILE, help="nodeMetadata.json path")
+    parser.add_argument("--platform-config", default=PLATFORM_CONFIG_FILE, help="platformConfiguration.json path")
+    parser.add_argument("--layout-config", default=LAYOUT_CONFIG_FILE, help="sankeyLayoutConfig.json path")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for manifest.json and the layouts")
+    add_profile_argument(parser, "sankey_layout")
+    args = parser.parse_args()
+    profiler = Profiler("sankey_layout", profile_path("sankey_layout", args.profile))
+
+    with profiler.stage("load"):
+        # Only paperCount is read, which every output format keeps
+        connections = load_json(args.connections)["connections"]
+        node_metadata = load_json(args.metadata)
+        platform_types = load_json(args.platform_config).get("platformTypes", {})
+        layout_config = load_json(args.layout_config)
+
+    with profiler.stage("layout"):
+        manifest, files = build_layouts(connections, node_metadata, platform_types, layout_config)
+        profiler.count("views", len(files))
+        profiler.count("nodes", sum(len(layout["nodes"]) for layout in files.values()))
+        profiler.count("links", sum(len(layout["links"]) for layout in files.values()))
+
+    with profiler.stage("write"):
+        write_layouts(args.output_dir, manifest, files)
+    print(f"{len(files)} Sankey layouts written to {args.output_dir}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Full-text search index over paper names and abstracts for the Details panel.
+
+Tokenization (mirrored by src/utils/searchIndex.ts, keep both in sync):
+  - NFKC normalization and lower-casing
+  - Latin/digit runs [a-z0-9]+ are words; a short stopword list is dropped
+  - CJK runs are split into overlapping character bigrams (a single
+    character run stays a unigram)
+
+The index is an inverted index with the statistics BM25 needs. Terms are
+sharded by their first character: one shard per ASCII letter/digit, and
+CJK_BUCKETS shards for everything else (bucket = code point of the first
+character modulo CJK_BUCKETS), so a query only loads the shards of its terms.
+
+    data/search/manifest.json   docIds, docLengths, avgDocLength, BM25 params, shards
+    data/search/terms-<key>.json {term: [doc, tf, doc, tf, ...]} (doc = index into docIds)
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from artifacts import remove_sidecars, write_json
+from instrumentation import Profiler, add_profile_argument, profile_path
+
+# ---------------------------------------------------------------------------
+# Configuration ----------------------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data"))
+
+PAPERS_FILE = os.path.join(DATA_DIR, "main", "processedPapers.json")
+OUTPUT_DIR = os.path.join(DATA_DIR, "search")
+MANIFEST_NAME = "manifest.json"
+
+INDEX_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A title term counts as this many abstract occurrences
+NAME_WEIGHT = 3
+CJK_BUCKETS = 16
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can for from has have how in into is it its of on or "
+    "our that the their them these they this those to was we were what when which while who "
+    "with within without".split()
+)
+
+# ---------------------------------------------------------------------------
+# Tokenizer ------------------------------------------------------------------
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if run[0] < "\u0080":
+            if run not in STOPWORDS:
+                tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def shard_key(term: str, cjk_buckets: int = CJK_BUCKETS) -> str:
+    first = term[0]
+    if first < "\u0080":
+        return first
+    return f"u{ord(first) % cjk_buckets:x}"
+
+# ---------------------------------------------------------------------------
+# Index builder ----------------------------------------------------------------
+
+def term_counts(paper: dict) -> Counter:
+    counts = Counter(tokenize(paper.get("abstract") or ""))
+    for term in tokenize(paper.get("name") or ""):
+        counts[term] += NAME_WEIGHT
+    return counts
+
+
+def build_index(papers: List[dict], cjk_buckets: int = CJK_BUCKETS):
+    """Returns (manifest, {shard key: {term: flat postings}})."""
+    postings: Dict[str, List[int]] = {}
+    doc_lengths: List[int] = []
+    for doc, paper in enumerate(papers):
+        counts = term_counts(paper)
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).extend((doc, tf))
+
+    shards: Dict[str, Dict[str, List[int]]] = {}
+    for term in sorted(postings):
+        shards.setdefault(shard_key(term, cjk_buckets), {})[term] = postings[term]
+
+    manifest = build_manifest([paper.get("id") for paper in papers], doc_lengths,
+                              {key: len(terms) for key, terms in shards.items()}, cjk_buckets)
+    return manifest, shards
+
+
+def build_manifest(doc_ids: List[str], doc_lengths: List[int], shard_terms: Dict[str, int],
+                   cjk_buckets: int = CJK_BUCKETS) -> dict:
+    """shard_terms: shard key -> number of terms; empty shards are left out."""
+    return {
+        "version": INDEX_VERSION,
+        "tokenizer": {"nameWeight": NAME_WEIGHT, "cjkBuckets": cjk_buckets},
+        "bm25": {"k1": BM25_K1, "b": BM25_B},
+        "docCount": len(doc_ids),
+        "avgDocLength": round(sum(doc_lengths) / len(doc_lengths), 4) if doc_lengths else 0,
+        "docIds": doc_ids,
+        "docLengths": doc_lengths,
+        "shards": {key: {"file": f"terms-{key}.json", "terms": count}
+                   for key, count in sorted(shard_terms.items()) if count},
+    }
+
+
+def load_shards(index_dir: str, manifest: dict, keys: Optional[Set[str]] = None) -> Dict[str, Dict[str, List[int]]]:
+    """The term shards of a written index, all of them or only `keys`."""
+    shards = {}
+    for key, info in manifest["shards"].items():
+        if keys is None or key in keys:
+            with open(os.path.join(index_dir, info["file"]), "r", encoding="utf-8") as f:
+                shards[key] = json.load(f)
+    return shards
+
+
+def apply_index_delta(index_dir: str, manifest: dict, removed_docs: List[int], added_papers: List[dict]) -> dict:
+    """
+    Patch a written index in place: drop the documents removed_docs (sorted
+    doc numbers) and append added_papers. Only the added papers are
+    tokenized, and only the shards of their terms are read and rewritten,
+    unless a removal renumbers the documents, which touches every shard.
+    Returns the new manifest.
+    """
+    cjk_buckets = manifest["tokenizer"]["cjkBuckets"]
+    added_counts = [term_counts(paper) for paper in added_papers]
+    keys = None if removed_docs else {shard_key(term, cjk_buckets) for counts in added_counts for term in counts}
+    shards = load_shards(index_dir, manifest, keys)
+
+    removed_set = set(removed_docs)
+    if removed_docs:
+        for terms in shards.values():
+            for term, flat in list(terms.items()):
+                kept = []
+                for doc, tf in zip(flat[0::2], flat[1::2]):
+                    if doc not in removed_set:
+                        kept.extend((doc - bisect_left(removed_docs, doc), tf))
+                if kept:
+                    terms[term] = kept
+                else:
+                    del terms[term]
+    doc_ids = [pid for doc, pid in enumerate(manifest["docIds"]) if doc not in removed_set]
+    doc_lengths = [n for doc, n in enumerate(manifest["docLengths"]) if doc not in removed_set]
+
+    touched = set()
+    for paper, counts in zip(added_papers, added_counts):
+        doc = len(doc_ids)
+        doc_ids.append(paper.get("id"))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            key = shard_key(term, cjk_buckets)
+            shards.setdefault(key, {}).setdefault(term, []).extend((doc, tf))
+            touched.add(key)
+    for key in touched:
+        shards[key] = dict(sorted(shards[key].items()))
+
+    shard_terms = {key: info["terms"] for key, info in manifest["shards"].items()}
+    shard_terms.update((key, len(terms)) for key, terms in shards.items())
+    manifest = build_manifest(doc_ids, doc_lengths, shard_terms, cjk_buckets)
+    write_index(index_dir, manifest, {key: terms for key, terms in shards.items() if terms})
+    return manifest
+
+
+def bm25_search(query: str, manifest: dict, shards: Dict[str, Dict[str, List[int]]], limit: int = 10):
+    """Reference scorer, same formula as the client: [(paper id, score)] best first."""
+    k1, b = manifest["bm25"]["k1"], manifest["bm25"]["b"]
+    n_docs, avg_len = manifest["docCount"], manifest["avgDocLength"] or 1
+    scores: Dict[int, float] = {}
+    for term in dict.fromkeys(tokenize(query)):
+        flat = shards.get(shard_key(term, manifest["tokenizer"]["cjkBuckets"]), {}).get(term)
+        if not flat:
+            continue
+        df = len(flat) // 2
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for doc, tf in zip(flat[0::2], flat[1::2]):
+            norm = k1 * (1 - b + b * manifest["docLengths"][doc] / avg_len)
+            scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [(manifest["docIds"][doc], round(score, 4)) for doc, score in ranked]
+
+
+def write_index(output_dir: str, manifest: dict, shards: Dict[str, Dict[str, List[int]]]):
+    os.makedirs(output_dir, exist_ok=True)
+    # Remove shards of a previous build that no longer exist
+    for stale in glob.glob(os.path.join(output_dir, "terms-*.json")):
+        if os.path.basename(stale) not in {info["file"] for info in manifest["shards"].values()}:
+            os.remove(stale)
+            remove_sidecars(stale)
+    # Always compact; the production mode adds the .gz/.br sidecars
+    for key, terms in shards.items():
+        write_json(os.path.join(output_dir, manifest["shards"][key]["file"]), terms, compact=True)
+    # The manifest is written last: it marks the index as complete
+    write_json(os.path.join(output_dir, MANIFEST_NAME), manifest, compact=True)
+
+# ---------------------------------------------------------------------------
+# Main -----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the sharded BM25 search index over names and abstracts")
+    parser.add_argument("--papers", default=PAPERS_FILE, help="processedPapers.json path")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for manifest.json and the term shards")
+    parser.add_argument("--cjk-buckets", type=int, default=CJK_BUCKETS, help="number of shards for CJK terms")
+    parser.add_argument("--query", help="print the top hits for this query after building")
+    add_profile_argument(parser, "search_index")
+    args = parser.parse_args()
+    profiler = Profiler("search_index", profile_path("search_index", args.profile))
+
+    with profiler.stage("load"):
+        with open(args.papers, "r", encoding="utf-8") as f:
+            papers = json.load(f).get("papers", [])
+        profiler.count("papers", len(papers))
+
+    with profiler.stage("index"):
+        manifest, shards = build_index(papers, args.cjk_buckets)
+        profiler.count("terms", sum(len(terms) for terms in shards.values()))
+        profiler.count("shards", len(shards))
+
+    with profiler.stage("write"):
+        write_index(args.output_dir, manifest, shards)
+    print(f"Search index for {len(papers)} papers ({len(shards)} shards) written to {args.output_dir}")
+
+    if args.query:
+        for paper_id, score in bm25_search(args.query, manifest, shards):
+            print(f"  {score:8.3f}  {paper_id}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
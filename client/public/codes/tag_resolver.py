@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from taxonomy import Taxonomy
+
+# ---------------------------------------------------------------------------
+# TagResolver ----------------------------------------------------------------
+#
+# Built once from allTagsById.json, on top of a Taxonomy (taxonomy.py).
+# Replaces the per-tag linear scans over all_tags_by_id.items() with
+# dictionary lookups:
+#   - (category, level, name) -> tag id   (first occurrence wins, like the
+#                                          original `for ... break` scans)
+#   - tag id -> ancestor names            (parent first, following parentId
+#                                          while the parent exists)
+
+
+class TagResolver:
+    def __init__(self, taxonomy: Union[Taxonomy, Dict[str, dict]]):
+        if not isinstance(taxonomy, Taxonomy):
+            taxonomy = Taxonomy.from_all_tags(taxonomy)
+        self.taxonomy = taxonomy
+        self._ancestor_names: List[Tuple[str, ...]] = [
+            tuple(taxonomy.names[j] for j in taxonomy.declared_ancestor_indices(i)) for i in range(len(taxonomy))
+        ]
+        # Lookups that found nothing, for the instrumentation reports
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "TagResolver":
+        return cls(Taxonomy.from_file(path))
+
+    def lookup(self, category: str, level: int, name: str) -> Optional[str]:
+        """Return the id of the tag with this (category, level, name), or None."""
+        tag_id = self.taxonomy.lookup(category, level, name)
+        if tag_id is None:
+            self.misses += 1
+        return tag_id
+
+    def lookup_all(self, categories: Iterable[str], level: int, name: str) -> List[Tuple[str, str]]:
+        """
+        Look the name up in several categories at once and return (tag_id, category)
+        for every category that has it, in the order the categories are given.
+        """
+        matches = []
+        for category in categories:
+            tag_id = self.taxonomy.lookup(category, level, name)
+            if tag_id is not None:
+                matches.append((tag_id, category))
+        if not matches:
+            self.misses += 1
+        return matches
+
+    def ancestor_names(self, tag_id: str) -> Tuple[str, ...]:
+        """Names of the tag's ancestors, nearest parent first."""
+        if tag_id not in self.taxonomy:
+            return ()
+        return self._ancestor_names[self.taxonomy.index(tag_id)]
+
+    def resolve(self, category: str, level: int, name: str) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        Resolve a leaf tag name to (tag_id, parent_name, grandparent_name).
+        Missing ancestors are returned as None.
+        """
+        tag_id = self.lookup(category, level, name)
+        if tag_id is None:
+            return None
+        ancestors = self.ancestor_names(tag_id)
+        parent_name = ancestors[0] if len(ancestors) > 0 else None
+        grandparent_name = ancestors[1] if len(ancestors) > 1 else None
+        return tag_id, parent_name, grandparent_name
@@ -1,94 +1,250 @@
+import argparse
 import json
+import os
 import re
 
-def parse_text_to_json(text):
-    lines = text.strip().split('\n')
-    root = {'id': 'root', 'children': []}
-    stack = [{'node': root, 'level': -1}]
-    category = None
+from artifacts import PRODUCTION, finish_artifact, output_mode
+from instrumentation import Profiler, add_profile_argument, profile_path
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '..', 'data'))
+
+TAGS_TXT_FILE = os.path.join(DATA_DIR, 'raw', 'tags.txt')
+ALL_TAGS_FILE = os.path.join(DATA_DIR, 'raw', 'allTagsById.json')
+L3_MAP_FILE = os.path.join(DATA_DIR, 'raw', 'L3TagToIdMap.json')
+
+# 这些顶级分类下的每个加粗一级列表项（如 研究平台 下的 **内容形式**、**平台属性**）
+# 本身就是一个独立分类：它作为 L1 节点挂在顶级分类下，其子项按普通顶级分类的
+# 一级列表项处理（L2、parentId 为 None），l3TagToIdMap 的键为 "顶级分类-子分类"。
+NESTED_CATEGORY_SECTIONS = {'研究平台'}
+
+# 预编译的行模式：标题（如 # **研究内容**）和列表项（如 - 用户群体与个体特征 / - **内容形式**）
+HEADING_PATTERN = re.compile(r'\s*#.*?\*\*(.+?)\*\*')
+ITEM_PATTERN = re.compile(r'([ \t]*)-\s*(?:\*\*(.+?)\*\*|(.+))')
+INDENT_WIDTH = 4  # 每4空格为一层
+
+
+class TagsParseError(ValueError):
+    """tags.txt 格式错误，带行号"""
+    def __init__(self, lineno, message):
+        super().__init__(f"第 {lineno} 行：{message}")
+        self.lineno = lineno
+
+
+def iter_sections(lines):
+    """
+    流式解析 tags.txt：逐行读取，每读完一个顶级分类（# 标题）就产出一次
+    (该分类的节点 {id: node}, 该分类的 l3TagToIdMap 条目 {键: {名称: id}})。
+    节点的 childrenIds 要到分类结束才完整，所以内存中只保留当前分类的节点，
+    以及用于检查重复ID的 {id: 行号}。缩进和重复ID错误抛出 TagsParseError。
+    """
+    nodes = {}      # 当前分类的节点，按出现顺序
     l3_map = {}
-    all_nodes = {}
+    seen_ids = {}   # id -> 首次出现的行号
+    heading = None  # 当前顶级分类节点
+    category = None
+    section = None
+    stack = []
+
+    def add_node(node, lineno):
+        first = seen_ids.get(node['id'])
+        if first is not None:
+            raise TagsParseError(lineno, f"重复的标签ID '{node['id']}'（第 {first} 行已定义）")
+        seen_ids[node['id']] = lineno
+        nodes[node['id']] = node
 
-    for line in lines:
+    for lineno, line in enumerate(lines, start=1):
         line = line.rstrip()
         if not line:
             continue
 
-        # 计算缩进级别
-        indent = len(re.match(r'^(\s*)', line).group(1))
-        level = indent // 4  # 每4空格为一层
-
         # 解析标题（如 # **研究内容**）
-        if line.strip().startswith('#'):
-            title = re.search(r'\*\*(.+?)\*\*', line).group(1)
-            node_id = title
+        heading_match = HEADING_PATTERN.match(line)
+        if heading_match:
+            if heading is not None:
+                yield nodes, l3_map
+                nodes, l3_map = {}, {}
+            title = heading_match.group(1)
             category = title  # 更新当前顶级分类
-            node = {
-                'id': node_id,
+            section = title
+            heading = {
+                'id': title,
                 'name': title,
                 'level': 1,
                 'category': category,
                 'parentId': None,
                 'childrenIds': []
             }
-            root['children'].append(node)
-            stack = [{'node': root, 'level': -1}, {'node': node, 'level': 0}]
-            all_nodes[node_id] = node
+            add_node(heading, lineno)
+            # 标题在第 -1 层，其下第一个列表项必须不缩进
+            stack = [{'node': heading, 'level': -1, 'categoryRoot': True}]
             continue
+        if line.lstrip().startswith('#'):
+            raise TagsParseError(lineno, "标题缺少 **名称**")
 
         # 解析列表项（如 - 用户群体与个体特征）
-        if line.strip().startswith('-'):
-            name = re.search(r'-\s*\*\*(.+?)\*\*|-\s*(.+)', line).group(1) or re.search(r'-\s*(.+)', line).group(1)
-            name = name.strip()
-
-            # 确定父节点
-            while stack and stack[-1]['level'] >= level:
-                stack.pop()
-            parent = stack[-1]['node']
-
-            # 生成唯一ID
-            parent_id = parent['id'] if parent['id'] != 'root' else ''
-            node_id = f"{parent_id}-{name}" if parent_id else name
-            node_id = node_id.replace(' ', '_')  # 避免空格
-
-            # 创建节点
-            node_level = parent['level'] + 1 if parent['id'] != 'root' else 2
+        item_match = ITEM_PATTERN.match(line)
+        if not item_match:
+            continue
+        indent, bold_name, plain_name = item_match.groups()
+        if '\t' in indent:
+            raise TagsParseError(lineno, "缩进中含有制表符，请使用空格")
+        if len(indent) % INDENT_WIDTH:
+            raise TagsParseError(lineno, f"缩进 {len(indent)} 个空格，不是 {INDENT_WIDTH} 的倍数")
+        level = len(indent) // INDENT_WIDTH
+        if heading is None:
+            raise TagsParseError(lineno, "列表项出现在第一个 # 标题之前")
+        if level > stack[-1]['level'] + 1:
+            raise TagsParseError(lineno, f"缩进跳级：第 {level} 层的项目前没有第 {level - 1} 层的父项")
+        name = (bold_name or plain_name).strip()
+
+        # 嵌套分类的子分类（如 研究平台 下的 内容形式）
+        if section in NESTED_CATEGORY_SECTIONS and level == 0:
+            category = name
             node = {
-                'id': node_id,
+                'id': name,
                 'name': name,
-                'level': node_level,
-                'category': category,
-                'parentId': parent['id'] if parent['id'] != 'root' else None,
+                'level': 1,
+                'category': section,
+                'parentId': None,
                 'childrenIds': []
             }
+            heading['childrenIds'].append(name)
+            add_node(node, lineno)
+            stack = [{'node': node, 'level': 0, 'categoryRoot': True}]
+            continue
+
+        # 确定父节点；顶级分类的直接子项（第 0 层）挂在标题下
+        while stack and stack[-1]['level'] >= level:
+            stack.pop()
+        parent_entry = stack[-1] if stack else None
+        # 顶级分类和嵌套子分类的直接子项不带父ID前缀，parentId 为 None
+        parent_is_root = parent_entry is None or parent_entry.get('categoryRoot', False)
+        parent = heading if parent_entry is None else parent_entry['node']
+
+        # 生成唯一ID
+        node_id = name if parent_is_root else f"{parent['id']}-{name}"
+        node_id = node_id.replace(' ', '_')  # 避免空格
+
+        # 创建节点
+        node_level = 2 if parent_is_root else parent['level'] + 1
+        node = {
+            'id': node_id,
+            'name': name,
+            'level': node_level,
+            'category': category,
+            'parentId': None if parent_is_root else parent['id'],
+            'childrenIds': []
+        }
 
-            # 记录L3节点
-            if node_level == 3:
-                if category not in l3_map:
-                    l3_map[category] = {}
-                l3_map[category][name] = node_id
+        # 记录L3节点
+        if node_level == 3:
+            map_key = f"{section}-{category}" if section in NESTED_CATEGORY_SECTIONS else category
+            l3_map.setdefault(map_key, {})[name] = node_id
 
-            # 更新父节点的childrenIds
-            if parent['id'] != 'root':
-                parent['childrenIds'].append(node_id)
-            else:
-                root['children'][-1]['childrenIds'].append(node_id)
+        # 更新父节点的childrenIds
+        parent['childrenIds'].append(node_id)
+        add_node(node, lineno)
+        stack.append({'node': node, 'level': level})
 
-            all_nodes[node_id] = node
-            stack.append({'node': node, 'level': level})
+    if heading is not None:
+        yield nodes, l3_map
 
-    # 构建输出结构
-    output = {
-        'nodes': [node for node in all_nodes.values()],
+def parse_text_to_json(text):
+    """一次性解析整段文本（与流式解析结果相同）"""
+    all_nodes, l3_map = {}, {}
+    for nodes, section_l3_map in iter_sections(text.strip().split('\n')):
+        all_nodes.update(nodes)
+        for map_key, names in section_l3_map.items():
+            l3_map.setdefault(map_key, {}).update(names)
+    return {
+        'nodes': list(all_nodes.values()),
         'l3TagToIdMap': l3_map,
         'allTagsById': all_nodes
     }
-    return output
 
-# 示例使用
-with open('', 'r', encoding='utf-8') as f:
-    text = f.read()
 
-result = parse_text_to_json(text)
-with open('output.json', 'w', encoding='utf-8') as f:
-    json.dump(result, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+class JsonObjectStream:
+    """
+    逐项写出 {top_key: {key: value, ...}}，结果与 write_json 写出整个对象逐字节相同
+    （含 production 压缩模式和 .gz/.br 附属文件）。先写入 .tmp 文件，close() 时再替换
+    目标文件，解析出错时 abort() 删除 .tmp，原有输出保持不变。
+    """
+    def __init__(self, path, top_key):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.compact = output_mode() == PRODUCTION
+        # 与 artifacts.dumps 的参数相同
+        if self.compact:
+            self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        else:
+            self.encode = json.JSONEncoder(ensure_ascii=False, indent=2).encode
+        self.out = open(self.tmp_path, 'w', encoding='utf-8')
+        self.out.write(f'{{{self.encode(top_key)}:{{' if self.compact else f'{{\n  {self.encode(top_key)}: {{')
+        self.count = 0
+        self.keys = set()
+
+    def add_items(self, items):
+        """追加一批键值（一个分类的节点一次编码，比逐项调用编码器快得多）"""
+        duplicates = self.keys.intersection(items)
+        if duplicates:
+            raise ValueError(f"重复的键 '{sorted(duplicates)[0]}'")
+        if not items:
+            return
+        self.keys.update(items)
+        text = self.encode(items)
+        if self.compact:
+            self.out.write((',' if self.count else '') + text[1:-1])
+        else:
+            # '{\n  "k": ...\n}' 去掉外层括号后再缩进一层
+            self.out.write((',\n  ' if self.count else '\n  ') + text[2:-2].replace('\n', '\n  '))
+        self.count += len(items)
+
+    def close(self):
+        if self.compact:
+            self.out.write('}}')
+        else:
+            self.out.write('\n  }\n}' if self.count else '}\n}')
+        self.out.close()
+        os.replace(self.tmp_path, self.path)
+        finish_artifact(self.path)
+
+    def abort(self):
+        self.out.close()
+        os.remove(self.tmp_path)
+
+
+def build_tags(tags_txt_path, all_tags_path, l3_map_path, profiler=None):
+    """逐行解析 tags.txt，每解析完一个顶级分类就把它的节点和 L3 映射追加写入两个输出文件"""
+    profiler = profiler or Profiler('tags')
+    with profiler.stage('parse'):
+        all_tags_out = JsonObjectStream(all_tags_path, 'allTagsById')
+        l3_map_out = JsonObjectStream(l3_map_path, 'l3TagToIdMap')
+        try:
+            with open(tags_txt_path, 'r', encoding='utf-8') as f:
+                for nodes, l3_map in iter_sections(f):
+                    all_tags_out.add_items(nodes)
+                    l3_map_out.add_items(l3_map)
+                    profiler.count('tags', len(nodes))
+                    profiler.count('l3Tags', sum(len(names) for names in l3_map.values()))
+        except BaseException:
+            all_tags_out.abort()
+            l3_map_out.abort()
+            raise
+        all_tags_out.close()
+        l3_map_out.close()
+    print(f"标签已解析并保存到 {all_tags_path} 和 {l3_map_path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='将 tags.txt 解析为 allTagsById.json 和 L3TagToIdMap.json')
+    parser.add_argument('--input', default=TAGS_TXT_FILE, help='tags.txt 路径')
+    parser.add_argument('--all-tags', default=ALL_TAGS_FILE, help='allTagsById.json 输出路径')
+    parser.add_argument('--l3-map', default=L3_MAP_FILE, help='L3TagToIdMap.json 输出路径')
+    add_profile_argument(parser, 'tags')
+    args = parser.parse_args()
+    profiler = Profiler('tags', profile_path('tags', args.profile))
+    try:
+        build_tags(args.input, args.all_tags, args.l3_map, profiler)
+    except TagsParseError as e:
+        raise SystemExit(f"{args.input}: {e}")
+    profiler.finish()
@@ -0,0 +1,216 @@
+"""
+In-memory tag taxonomy shared by the scripts, built once from allTagsById.json
+(or from nodeMetadata.json) instead of every script walking the nested dicts
+with its own loops.
+
+Nodes are numbered by their position in the source dict and stored as
+parallel arrays:
+
+    ids, names, levels, categories    per-node fields
+    parents                           tree parent number (-1 for roots), from childrenIds
+    declared_parents                  parentId as written in the file (-1 when null)
+    child_start, child_list           children in CSR layout: the children of node i
+                                      are child_list[child_start[i]:child_start[i + 1]]
+    enter, exit                       Euler-tour (preorder) numbers of the tree
+
+allTagsById lists the L2 tags under their root in childrenIds but leaves their
+parentId null, so the tree is built from childrenIds. declared_parents keeps
+parentId for the outputs that have always been built from it (TagResolver,
+the "parent" field of nodeMetadata).
+
+A subtree is the contiguous preorder range enter[y]..exit[y], so "is x under
+y" is two comparisons and "all L3 descendants of y" is a bisect over the
+sorted preorder numbers of the L3 nodes.
+"""
+from __future__ import annotations
+
+import json
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ---------------------------------------------------------------------------
+# Taxonomy -------------------------------------------------------------------
+
+
+class Taxonomy:
+    __slots__ = ("ids", "names", "levels", "categories", "parents", "declared_parents",
+                 "child_start", "child_list", "enter", "exit", "preorder",
+                 "_index", "_by_key", "_by_name", "_level_enters", "_level_nodes")
+
+    def __init__(self, ids: List[str], names: List[Optional[str]], levels: List[int],
+                 categories: List[Optional[str]], children_ids: List[Iterable[str]],
+                 declared_parent_ids: List[Optional[str]]):
+        n = len(ids)
+        self.ids = list(ids)
+        self.names = list(names)
+        self.levels = list(levels)
+        self.categories = list(categories)
+        self._index: Dict[str, int] = {}
+        for i, tag_id in enumerate(self.ids):
+            self._index.setdefault(tag_id, i)
+
+        # Children that exist, in the listed order; the first parent listing a
+        # node becomes its tree parent
+        self.parents = [-1] * n
+        self.child_start = [0]
+        self.child_list: List[int] = []
+        for i, kids in enumerate(children_ids):
+            for kid in kids:
+                j = self._index.get(kid)
+                if j is None:
+                    continue
+                self.child_list.append(j)
+                if self.parents[j] == -1 and j != i:
+                    self.parents[j] = i
+            self.child_start.append(len(self.child_list))
+        self.declared_parents = [self._index.get(p, -1) if p else -1 for p in declared_parent_ids]
+
+        self._euler_tour()
+
+        # (category, level, name) -> first node; (category, name) -> nodes
+        self._by_key: Dict[Tuple[Optional[str], int, Optional[str]], int] = {}
+        self._by_name: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for i in range(n):
+            self._by_key.setdefault((self.categories[i], self.levels[i], self.names[i]), i)
+            self._by_name.setdefault((self.categories[i], self.names[i]), []).append(i)
+
+        # level -> nodes sorted by preorder number, and those numbers
+        self._level_nodes: Dict[int, List[int]] = {}
+        for i in self.preorder:
+            self._level_nodes.setdefault(self.levels[i], []).append(i)
+        self._level_enters = {level: [self.enter[i] for i in nodes] for level, nodes in self._level_nodes.items()}
+
+    def _euler_tour(self):
+        n = len(self.ids)
+        self.enter = [-1] * n
+        self.exit = [-1] * n
+        self.preorder: List[int] = []
+        # Roots first, then anything only reachable through a cycle
+        starts = [i for i in range(n) if self.parents[i] == -1] + list(range(n))
+        for root in starts:
+            if self.enter[root] != -1:
+                continue
+            self.enter[root] = len(self.preorder)
+            self.preorder.append(root)
+            stack = [(root, iter(self.child_list[self.child_start[root]:self.child_start[root + 1]]))]
+            while stack:
+                node, kids = stack[-1]
+                for kid in kids:
+                    if self.parents[kid] == node and self.enter[kid] == -1:
+                        self.enter[kid] = len(self.preorder)
+                        self.preorder.append(kid)
+                        stack.append((kid, iter(self.child_list[self.child_start[kid]:self.child_start[kid + 1]])))
+                        break
+                else:
+                    stack.pop()
+                    self.exit[node] = len(self.preorder) - 1
+
+    @classmethod
+    def from_all_tags(cls, all_tags_by_id: Dict[str, dict]) -> "Taxonomy":
+        tags = list(all_tags_by_id.values())
+        return cls(ids=list(all_tags_by_id),
+                   names=[tag.get("name") for tag in tags],
+                   levels=[tag.get("level") for tag in tags],
+                   categories=[tag.get("category") for tag in tags],
+                   children_ids=[tag.get("childrenIds", []) for tag in tags],
+                   declared_parent_ids=[tag.get("parentId") for tag in tags])
+
+    @classmethod
+    def from_file(cls, path: str) -> "Taxonomy":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_all_tags(json.load(f).get("allTagsById", {}))
+
+    @classmethod
+    def from_node_metadata(cls, node_metadata: Dict[str, Dict[str, dict]]) -> "Taxonomy":
+        """Sankey taxonomy: category = nodeMetadata key, level = Sankey level, name = displayName."""
+        ids, names, levels, categories, children_ids, parent_ids = [], [], [], [], [], []
+        for category, nodes in node_metadata.items():
+            for node_id, entry in nodes.items():
+                ids.append(node_id)
+                names.append(entry.get("displayName"))
+                levels.append(entry.get("level"))
+                categories.append(category)
+                # "children" only refers to nodes of the same category
+                children_ids.append([child for child in entry.get("children", []) if child in nodes])
+                parent_ids.append(entry.get("parent"))
+        return cls(ids, names, levels, categories, children_ids, parent_ids)
+
+    # -- nodes ---------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, tag_id: str) -> bool:
+        return tag_id in self._index
+
+    def index(self, tag_id: str) -> int:
+        """Node number (position in the source dict); KeyError for unknown ids."""
+        return self._index[tag_id]
+
+    def name(self, tag_id: str) -> Optional[str]:
+        return self.names[self._index[tag_id]]
+
+    def level(self, tag_id: str) -> int:
+        return self.levels[self._index[tag_id]]
+
+    def category(self, tag_id: str) -> Optional[str]:
+        return self.categories[self._index[tag_id]]
+
+    def parent(self, tag_id: str) -> Optional[str]:
+        parent = self.parents[self._index[tag_id]]
+        return self.ids[parent] if parent != -1 else None
+
+    def declared_parent(self, tag_id: str) -> Optional[str]:
+        parent = self.declared_parents[self._index[tag_id]]
+        return self.ids[parent] if parent != -1 else None
+
+    def children(self, tag_id: str) -> List[str]:
+        i = self._index[tag_id]
+        return [self.ids[j] for j in self.child_list[self.child_start[i]:self.child_start[i + 1]]]
+
+    def declared_ancestor_indices(self, i: int) -> List[int]:
+        """Node numbers along the parentId chain, nearest first (stops at a cycle)."""
+        chain: List[int] = []
+        seen = {i}
+        parent = self.declared_parents[i]
+        while parent != -1 and parent not in seen:
+            seen.add(parent)
+            chain.append(parent)
+            parent = self.declared_parents[parent]
+        return chain
+
+    def nodes(self, category: Optional[str] = None, level: Optional[int] = None) -> List[str]:
+        """Ids in source order, optionally of one category and/or level."""
+        return [tag_id for i, tag_id in enumerate(self.ids)
+                if (category is None or self.categories[i] == category)
+                and (level is None or self.levels[i] == level)]
+
+    # -- lookups ---------------------------------------------------------------
+
+    def lookup(self, category: Optional[str], level: int, name: str) -> Optional[str]:
+        """Id of the first tag with this (category, level, name), or None."""
+        i = self._by_key.get((category, level, name))
+        return self.ids[i] if i is not None else None
+
+    def named(self, category: Optional[str], name: str) -> List[str]:
+        """Ids of every tag of the category with this name, in source order."""
+        return [self.ids[i] for i in self._by_name.get((category, name), [])]
+
+    # -- subtrees ----------------------------------------------------------------
+
+    def is_under(self, tag_id: str, ancestor_id: str, inclusive: bool = False) -> bool:
+        """Whether tag_id lies in the subtree of ancestor_id (excluding itself unless inclusive)."""
+        x, y = self._index[tag_id], self._index[ancestor_id]
+        if x == y:
+            return inclusive
+        return self.enter[y] < self.enter[x] <= self.exit[y]
+
+    def descendants(self, tag_id: str, level: Optional[int] = None) -> List[str]:
+        """Ids of the strict descendants in preorder, optionally only those at `level`."""
+        y = self._index[tag_id]
+        lo, hi = self.enter[y] + 1, self.exit[y]
+        if level is None:
+            return [self.ids[i] for i in self.preorder[lo:hi + 1]]
+        enters = self._level_enters.get(level, [])
+        nodes = self._level_nodes.get(level, [])
+        return [self.ids[i] for i in nodes[bisect_left(enters, lo):bisect_right(enters, hi)]]
@@ -0,0 +1,30 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+# The pipeline scripts import each other as top-level modules
+CODES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.normpath(os.path.join(CODES_DIR, "..", "data"))
+sys.path.insert(0, CODES_DIR)
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def processed_papers():
+    """The committed processedPapers.json entries."""
+    return load_json(os.path.join(DATA_DIR, "main", "processedPapers.json"))["papers"]
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    """A scratch copy of public/data that a test may patch or rebuild."""
+    target = tmp_path / "data"
+    shutil.copytree(DATA_DIR, target)
+    return str(target)
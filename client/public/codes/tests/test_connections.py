@@ -0,0 +1,57 @@
+import pytest
+
+from crossLevelConnections import (add_filter_cube, add_strength, build_connections_loops,
+                                   build_connections_sparse, paper_connection_keys)
+
+
+def paper(pid, year="2024", awarded=False, **tags):
+    return {"id": pid, "year": year, "isAwarded": awarded, "tags": tags}
+
+
+# Duplicate labels, a paper without platform tags and an untagged paper
+SMALL_CORPUS = [
+    paper("paper_001", 研究内容={"l1": ["A"], "l2": ["A1", "A1"]},
+          研究方法={"l1": ["M"], "l2": ["M1", "M2"]},
+          **{"研究涉及平台-内容形式": {"l2": ["视频"], "l3": ["YouTube"]}}),
+    paper("paper_002", year="2023", awarded=True, 研究内容={"l1": ["A", "B"]}, 研究方法={"l1": ["M"]}),
+    paper("paper_003"),
+    paper("paper_004", year=None, 研究内容={"l1": ["B"]},
+          **{"研究涉及平台-平台属性": {"l2": ["主流"], "l3": ["YouTube"]}}),
+]
+
+
+@pytest.mark.parametrize("corpus", ["small", "committed"])
+def test_sparse_backend_matches_loops(corpus, processed_papers):
+    pytest.importorskip("scipy")
+    papers = SMALL_CORPUS if corpus == "small" else processed_papers
+    sparse, loops = build_connections_sparse(papers), build_connections_loops(papers)
+    assert sparse == loops
+    # Same key order too, so the written file does not depend on the backend
+    assert [(t, list(pairs)) for t, pairs in sparse.items()] == [(t, list(pairs)) for t, pairs in loops.items()]
+
+
+def test_loops_pairs_are_the_paper_keys(processed_papers):
+    connections = build_connections_loops(processed_papers)
+    expected = {}
+    for paper in processed_papers:
+        for key in paper_connection_keys(paper):
+            expected.setdefault(key, []).append(paper["id"])
+    actual = {(conn_type, label_key): stats["paperIds"]
+              for conn_type, pair_map in connections.items() for label_key, stats in pair_map.items()}
+    assert actual == expected
+    assert all(stats["paperCount"] == len(stats["paperIds"])
+               for pair_map in connections.values() for stats in pair_map.values())
+
+
+def test_filter_cube_sums_to_dated_papers():
+    connections = build_connections_loops(SMALL_CORPUS)
+    add_strength(connections)
+    year_axis = add_filter_cube(connections, SMALL_CORPUS)
+    assert year_axis == ["2023", "2024"]
+    years = {p["id"]: p["year"] for p in SMALL_CORPUS}
+    for pair_map in connections.values():
+        for stats in pair_map.values():
+            assert sum(stats["yearCounts"]) == sum(1 for pid in stats["paperIds"] if years[pid])
+    pair = connections["研究内容_L1__研究方法_L1"]["A__M"]
+    assert pair["yearCounts"] == [1, 1]
+    assert pair["awardedYearCounts"] == [1, 0]
@@ -0,0 +1,85 @@
+import filecmp
+import glob
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from build import CODES_DIR, make_stages
+from conftest import load_json
+from incremental_update import read_batch, update
+from papers import read_csv_table, write_csv_table
+
+
+def rebuild(data_dir):
+    """Run every build.py stage on data_dir, like a clean `build.py --force`."""
+    for stage in make_stages(data_dir):
+        subprocess.run(stage.command(), cwd=CODES_DIR, check=True, stdout=subprocess.DEVNULL)
+
+
+def json_files(data_dir):
+    return sorted(os.path.relpath(path, data_dir)
+                  for path in glob.glob(os.path.join(data_dir, "**", "*.json"), recursive=True))
+
+
+def assert_matches_rebuild(data_dir, tmp_path):
+    """The patched data_dir equals a full rebuild from its papers.csv."""
+    full = str(tmp_path / "full")
+    shutil.copytree(data_dir, full)
+    rebuild(full)
+    assert json_files(data_dir) == json_files(full)
+    for rel in json_files(data_dir):
+        # Key order may differ where a delta appends; layouts must not differ at all
+        if rel.startswith("sankeyLayouts"):
+            assert filecmp.cmp(os.path.join(data_dir, rel), os.path.join(full, rel), shallow=False), rel
+        else:
+            assert load_json(os.path.join(data_dir, rel)) == load_json(os.path.join(full, rel)), rel
+
+
+def test_add_and_remove_match_full_rebuild(data_copy, tmp_path):
+    raw = load_json(os.path.join(data_copy, "raw", "papers.json"))
+    by_year = {}
+    for row in raw:
+        by_year.setdefault(row["Year"], []).append(row["id"])
+    # Drop every paper of the rarest year and add papers with a new one,
+    # so the cube's year axis changes in both directions
+    rare_year = min(by_year, key=lambda year: len(by_year[year]))
+    removed = by_year[rare_year] + ["paper_005", "paper_150"]
+    added = [dict(raw[3], Year="2031"), dict(raw[40], Tags=["#best paper"]), dict(raw[120])]
+
+    assert update(data_copy, added, removed) == {"added": 3, "removed": len(removed)}
+    assert_matches_rebuild(data_copy, tmp_path)
+
+
+def test_csv_batch_keeps_ids(data_copy, tmp_path):
+    update(data_copy, [], ["paper_010"])
+    # Two existing papers again, through the papers.csv-style batch path
+    fieldnames, rows = read_csv_table(os.path.join(data_copy, "papers.csv"))
+    batch = str(tmp_path / "batch.csv")
+    write_csv_table(batch, fieldnames, rows[20:22])
+
+    update(data_copy, read_batch(batch), [])
+    ids = [row["id"] for row in load_json(os.path.join(data_copy, "raw", "papers.json"))]
+    assert "paper_010" not in ids and "paper_011" in ids
+    assert ids[-2:] == ["paper_198", "paper_199"]
+    assert_matches_rebuild(data_copy, tmp_path)
+
+
+def test_unknown_id_is_rejected(data_copy):
+    with pytest.raises(SystemExit):
+        update(data_copy, [], ["paper_999"])
+
+
+def test_removed_ids_are_not_reused(data_copy, tmp_path):
+    raw = load_json(os.path.join(data_copy, "raw", "papers.json"))
+    update(data_copy, [], ["paper_197"])
+    update(data_copy, [dict(raw[0])], [])
+    ids = [row["id"] for row in load_json(os.path.join(data_copy, "raw", "papers.json"))]
+    assert "paper_197" not in ids and ids[-1] == "paper_198"
+    # The high-water mark survives a full rebuild
+    assert_matches_rebuild(data_copy, tmp_path)
+    update(data_copy, [], ["paper_198"])
+    rebuild(data_copy)
+    update(data_copy, [dict(raw[1])], [])
+    assert load_json(os.path.join(data_copy, "raw", "papers.json"))[-1]["id"] == "paper_199"
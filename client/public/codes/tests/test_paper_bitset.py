@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from crossLevelConnections import build_connections_loops
+from paper_bitset import (ENCODINGS, RLE_ENCODING, bits_to_indices, decode_indices, encode_indices,
+                          from_bitset_format, indices_to_bits, intersect, popcount, to_bitset_format)
+
+# Empty, single bits at byte edges, runs across bytes, a long run and random sets
+SETS = [
+    [],
+    [0],
+    [7],
+    [8],
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],
+    [3, 200, 201, 202, 1000],
+    list(range(130, 400)),
+] + [sorted(random.Random(seed).sample(range(3000), seed * 40)) for seed in range(1, 6)]
+
+
+@pytest.mark.parametrize("indices", SETS)
+def test_bits_round_trip(indices):
+    bits = indices_to_bits(indices)
+    assert bits_to_indices(bits) == indices
+    assert popcount(bits) == len(indices)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+@pytest.mark.parametrize("indices", SETS)
+def test_encoding_round_trip(indices, encoding):
+    assert decode_indices(encode_indices(indices, encoding), encoding) == indices
+
+
+def test_rle_run_lengths_take_several_varint_bytes():
+    # A 300-bit run needs a two-byte LEB128 length
+    indices = [5] + list(range(1000, 1300))
+    assert decode_indices(encode_indices(indices, RLE_ENCODING), RLE_ENCODING) == indices
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_intersect(encoding):
+    a, b = SETS[-1], SETS[-2]
+    expected = sorted(set(a) & set(b))
+    merged = intersect(encode_indices(a, encoding), encode_indices(b, encoding), encoding=encoding)
+    assert decode_indices(merged, encoding) == expected
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_connections_format_round_trip(encoding, processed_papers):
+    connections = build_connections_loops(processed_papers)
+    paper_ids = [paper["id"] for paper in processed_papers]
+    encoded = to_bitset_format(connections, paper_ids, encoding)
+    assert encoded["membershipEncoding"] == encoding
+    assert from_bitset_format(encoded) == connections
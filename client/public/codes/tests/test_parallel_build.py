@@ -0,0 +1,33 @@
+import filecmp
+import subprocess
+import sys
+
+import pytest
+
+from build import CODES_DIR, DATA_DIR, data_files, make_stages
+from parallel_build import SHARED_STAGE, STAGE_FUNCTIONS, pool_stages
+
+
+def test_stages_come_from_make_stages():
+    names = [stage.name for stage in make_stages()]
+    assert [stage.name for stage in pool_stages(DATA_DIR)] == names[names.index(SHARED_STAGE) + 1:]
+    assert set(STAGE_FUNCTIONS) <= set(names)
+
+
+def test_stage_files_are_named_in_data_files():
+    named = set(data_files().values())
+    for stage in make_stages():
+        assert set(stage.inputs) | set(stage.outputs) <= named, stage.name
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_parallel_build_matches_committed_files(data_copy, workers):
+    subprocess.run([sys.executable, "parallel_build.py", "--data-dir", data_copy, "--workers", workers],
+                   cwd=CODES_DIR, check=True, stdout=subprocess.DEVNULL)
+    comparison = filecmp.dircmp(DATA_DIR, data_copy, ignore=[".build_cache.json"])
+
+    def differences(cmp):
+        return cmp.diff_files + cmp.left_only + cmp.right_only + [
+            name for sub in cmp.subdirs.values() for name in differences(sub)]
+
+    assert differences(comparison) == []
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from conftest import DATA_DIR
+from process_new import process_paper
+from tag_resolver import TagResolver
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return TagResolver.from_file(os.path.join(DATA_DIR, "raw", "allTagsById.json"))
+
+
+def test_platform_is_tagged_under_both_types(resolver):
+    row = {"Name": "t", "Year": "2024", "研究涉及平台": ["YouTube", "Mastodon"]}
+    tags = process_paper(row, resolver, "paper_001")["tags"]
+    assert tags["研究涉及平台-内容形式"]["l3"] == ["YouTube"]
+    assert tags["研究涉及平台-内容形式"]["l2"] == ["视频为主"]
+    assert tags["研究涉及平台-平台属性"]["l3"] == ["YouTube", "Mastodon"]
+    assert tags["研究涉及平台-平台属性"]["l2"] == ["主流国际平台", "匿名/去中心平台"]
+
+
+def test_unknown_platform_counts_one_miss(resolver):
+    before = resolver.misses
+    tags = process_paper({"研究涉及平台": ["NoSuchPlatform"]}, resolver, "paper_001")["tags"]
+    assert tags == {}
+    assert resolver.misses == before + 1
+
+
+def test_committed_papers_carry_both_platform_types(processed_papers):
+    both = [paper for paper in processed_papers
+            if {"研究涉及平台-内容形式", "研究涉及平台-平台属性"} <= set(paper["tags"])]
+    assert len(both) > len(processed_papers) // 2
@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import pytest
+
+from conftest import DATA_DIR, load_json
+from precomputedStats import OVERALL_KEY, apply_paper_delta
+from query_service import CorpusIndex, answer, handle_client
+from tag_resolver import TagResolver
+
+
+@pytest.fixture(scope="module")
+def index(processed_papers):
+    return CorpusIndex(processed_papers, TagResolver.from_file(os.path.join(DATA_DIR, "raw", "allTagsById.json")))
+
+
+def test_unfiltered_stats_match_committed_overall(index):
+    stats = load_json(os.path.join(DATA_DIR, "layout", "precomputedStats.json"))
+    assert index.stats(None, "all") == stats["yearlyStats"][OVERALL_KEY]
+
+
+@pytest.mark.parametrize("years, award", [(("2023",), "all"), (("2021", "2022"), "awarded"),
+                                          (None, "regular"), (("1900",), "all")])
+def test_filtered_stats_match_replayed_papers(index, processed_papers, years, award):
+    resolver = TagResolver.from_file(os.path.join(DATA_DIR, "raw", "allTagsById.json"))
+    yearly_stats = {}
+    for paper, keep in zip(processed_papers, index.selection(years, award)):
+        if keep:
+            apply_paper_delta(yearly_stats, paper, resolver, 1)
+    expected = yearly_stats.get(OVERALL_KEY, {"total": 0, "awarded": 0, "regular": 0, "byCategory": {}})
+    assert index.stats(years, award) == expected
+
+
+def test_unknown_route_is_a_lookup_error(index):
+    with pytest.raises(LookupError):
+        answer(index, "/nothing")
+
+
+def test_unexpected_errors_return_a_plain_500(index, monkeypatch):
+    class Writer:
+        def __init__(self):
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+        async def drain(self):
+            pass
+
+        def close(self):
+            pass
+
+    def broken():
+        raise RuntimeError("secret detail")
+
+    monkeypatch.setattr(index, "meta", broken)
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"GET /meta HTTP/1.1\r\n\r\n")
+    reader.feed_eof()
+    writer = Writer()
+    asyncio.run(handle_client(index, reader, writer))
+    assert writer.data.startswith(b"HTTP/1.1 500 ")
+    assert b"secret detail" not in writer.data
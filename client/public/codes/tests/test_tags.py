@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from conftest import DATA_DIR
+from tags import TagsParseError, build_tags, parse_text_to_json
+
+VALID = """\
+# **研究内容**
+- 用户群体
+    - 用户画像
+        - 青少年
+# **研究平台**
+- **内容形式**
+    - 视频为主
+        - YouTube
+"""
+
+
+def test_valid_text_parses():
+    result = parse_text_to_json(VALID)
+    tags = result["allTagsById"]
+    assert tags["用户群体-用户画像-青少年"]["parentId"] == "用户群体-用户画像"
+    assert tags["视频为主-YouTube"]["category"] == "内容形式"
+    assert result["l3TagToIdMap"] == {"研究内容": {"用户画像": "用户群体-用户画像"},
+                                      "研究平台-内容形式": {"YouTube": "视频为主-YouTube"}}
+
+
+@pytest.mark.parametrize("text, lineno, message", [
+    ("- 用户群体\n# **研究内容**\n", 1, "之前"),
+    ("# **研究内容**\n- 用户群体\n\t- 用户画像\n", 3, "制表符"),
+    ("# **研究内容**\n- 用户群体\n   - 用户画像\n", 3, "倍数"),
+    ("# **研究内容**\n- 用户群体\n        - 用户画像\n", 3, "跳级"),
+    ("# **研究内容**\n    - 用户群体\n", 2, "跳级"),
+    ("# **研究内容**\n- 用户群体\n# **研究方法**\n    - 问卷\n", 4, "跳级"),
+    ("# **研究内容**\n\n- 用户群体\n# 研究方法\n", 4, "标题"),
+    ("# **研究内容**\n- 用户群体\n# **研究方法**\n- 用户群体\n", 4, "第 2 行"),
+])
+def test_errors_carry_line_numbers(text, lineno, message):
+    with pytest.raises(TagsParseError) as excinfo:
+        parse_text_to_json(text)
+    assert excinfo.value.lineno == lineno
+    assert str(excinfo.value).startswith(f"第 {lineno} 行")
+    assert message in str(excinfo.value)
+
+
+def test_failed_build_keeps_previous_outputs(tmp_path):
+    tags_txt = tmp_path / "tags.txt"
+    all_tags, l3_map = str(tmp_path / "allTagsById.json"), str(tmp_path / "L3TagToIdMap.json")
+    tags_txt.write_text(VALID, encoding="utf-8")
+    build_tags(str(tags_txt), all_tags, l3_map)
+    before = open(all_tags, encoding="utf-8").read()
+
+    tags_txt.write_text(VALID + "- 用户群体\n", encoding="utf-8")  # duplicate id on line 9
+    with pytest.raises(TagsParseError, match="第 9 行"):
+        build_tags(str(tags_txt), all_tags, l3_map)
+    assert open(all_tags, encoding="utf-8").read() == before
+    assert sorted(os.listdir(tmp_path)) == ["L3TagToIdMap.json", "allTagsById.json", "tags.txt"]
+
+
+def test_streamed_output_matches_committed_files(tmp_path):
+    all_tags, l3_map = str(tmp_path / "allTagsById.json"), str(tmp_path / "L3TagToIdMap.json")
+    build_tags(os.path.join(DATA_DIR, "raw", "tags.txt"), all_tags, l3_map)
+    for path in (all_tags, l3_map):
+        with open(path, "rb") as built, open(os.path.join(DATA_DIR, "raw", os.path.basename(path)), "rb") as committed:
+            assert built.read() == committed.read()
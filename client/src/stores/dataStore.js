@@ -17,6 +17,9 @@ export const useDataStore = defineStore('data', {
         sankeyLayoutConfig: null, 
         paperIdToYear: {},
 
+        // 可选数据：节点 -> 论文倒排表（缺失时按连接扫描）
+        nodePostings: null,
+
         // 加载状态和错误信息
         isLoading: false,
         error: null,
@@ -121,6 +124,9 @@ export const useDataStore = defineStore('data', {
 
                 console.log("All core JSON data parsed and stored.");
 
+                // 倒排表不阻塞首屏，加载失败也不影响其它功能
+                this.fetchNodePostings();
+
             } catch (err) {
                 this.error = err.message;
                 console.error("Error loading data in dataStore:", err);
@@ -131,6 +137,17 @@ export const useDataStore = defineStore('data', {
             }
         },
 
+        async fetchNodePostings() {
+            if (this.nodePostings) return;
+            try {
+                const res = await fetch(`${import.meta.env.BASE_URL}data/main/nodePostings.json`);
+                if (!res.ok) throw new Error(`status: ${res.status}`);
+                this.nodePostings = await res.json();
+            } catch (err) {
+                console.warn("nodePostings.json 不可用，节点论文将通过扫描连接获得:", err);
+            }
+        },
+
     },
     getters: {
         initialSankeyLayoutConfig: (state) => state.sankeyLayoutConfig,
@@ -1,10 +1,12 @@
 import { defineStore } from 'pinia';
-import { computed, reactive } from 'vue';
+import { computed, reactive, shallowRef, watch } from 'vue';
 import { useDataStore } from './dataStore';
 import { buildL1Snapshot } from './relationsStore/l1Builder';
 import { buildMixedLevelSnapshot } from './relationsStore/mixedLevelBuilder';
 import { expandNode, collapseNode } from './relationsStore/nodeOperations';
 import { useVisualizationStore } from './visualizationStore'; // 确保导入
+import { columnDomain, nodePaperIds, type NodePostingsData } from '../utils/nodePostings';
+import { fetchSankeyLayout, layoutCombo, type PrecomputedLayout } from '../utils/sankeyLayouts';
 
 export const useRelationsStore = defineStore('relations', () => {
     // ───────────────────── 原始数据依赖 ─────────────────────
@@ -48,6 +50,18 @@ export const useRelationsStore = defineStore('relations', () => {
 
     const canUndo = computed(() => state.history.length > 0);
 
+    // 当前视图的预计算布局（无年份筛选时按平台类型和列层级查表，组件会再核对节点/连接是否一致）
+    const precomputedLayout = shallowRef<PrecomputedLayout | null>(null);
+    watch(() => [state.currentPlatformType, state.columnLevels.join(), state.selectedYear], async () => {
+        const key = [state.currentPlatformType, state.columnLevels.join(), state.selectedYear].join('|');
+        const layout = state.selectedYear ? null
+            : await fetchSankeyLayout(state.currentPlatformType, layoutCombo(state.columnLevels));
+        // 请求返回前视图可能已经切换
+        if (key === [state.currentPlatformType, state.columnLevels.join(), state.selectedYear].join('|')) {
+            precomputedLayout.value = layout;
+        }
+    }, { immediate: true });
+
     // ───────────────────── Actions ─────────────────────
     function setPlatformType(to: '内容形式' | '平台属性') {
         if (to === state.currentPlatformType) return;
@@ -198,6 +212,18 @@ export const useRelationsStore = defineStore('relations', () => {
         
         if (state.selected.type === 'node') {
             const nodeId = state.selected.ids[0];
+
+            // 有倒排表时一次查找即可得到节点下的全部论文
+            const postings = dataStore.nodePostings as NodePostingsData | null;
+            const selectedNode = visibleNodes.value.find(n => n.id === nodeId);
+            const domain = selectedNode ? columnDomain(selectedNode.column, state.currentPlatformType) : null;
+            const postedIds = postings && domain ? nodePaperIds(postings, domain, selectedNode.level, nodeId) : null;
+            if (postedIds) {
+                const filteredPaperIds = filterPaperIdsByYear(postedIds);
+                console.log(`节点 ${nodeId} 倒排表命中 ${postedIds.length} 篇论文, 年份筛选后 ${filteredPaperIds.length} 篇`);
+                return filteredPaperIds;
+            }
+
             // 从所有连接中查找包含该节点的连接，收集所有论文ID
             const paperIds = new Set<string>();
             const connections = dataStore.crossLevelConnections?.connections || {};
@@ -398,6 +424,8 @@ export const useRelationsStore = defineStore('relations', () => {
         for (const oldKey in switchMap.value[dir]) {
             if (oldKey === id) return switchMap.value[dir][oldKey][0];
         }
+        // L3 平台在两种类型中同名，存在对应关系时节点保持不变
+        if (dataStore.platformConfiguration?.l3Correspondence?.[dir]?.[id]) return id;
         return null;
     }
 
@@ -412,6 +440,7 @@ export const useRelationsStore = defineStore('relations', () => {
         state,
         visibleNodes,
         visibleLinks,
+        precomputedLayout,
         setPlatformType,
         togglePlatformType,
         toggleNode,
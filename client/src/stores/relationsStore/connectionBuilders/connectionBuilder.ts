@@ -1,3 +1,5 @@
+import { filteredPairCount, selectedYearIndices } from '../../../utils/filterCube';
+
 export function buildConnections(dataStore: any, state: any, nodes: any[]): any[] {
     const links: any[] = [];
     const allConnections = dataStore.crossLevelConnections?.connections ?? {};
@@ -28,11 +30,21 @@ export function buildConnections(dataStore: any, state: any, nodes: any[]): any[
         });
     }
 
+    // 连接在当前年份下的论文数：有年份立方体（yearAxis/yearCounts）时直接对选中年份求和，
+    // 否则退回按 paperIdToYear 筛选 paperIds。连接只需要数量，论文列表由 getSelectedPaperIds 按需查找
+    const yearAxis: string[] | undefined = dataStore.crossLevelConnections?.yearAxis;
+    const yearIndices = yearAxis && selectedYear ? selectedYearIndices(yearAxis, [selectedYear]) : [];
+    function linkValue(connectionInfo: any): number {
+        if (!selectedYear) return connectionInfo.paperCount ?? (connectionInfo.paperIds || []).length;
+        if (yearAxis && connectionInfo.yearCounts) return filteredPairCount(connectionInfo, yearIndices);
+        return filterPaperIdsByYear(connectionInfo.paperIds || []).length;
+    }
+
     // 1. 平台 → 研究内容连接
-    buildPlatformToContentConnections(dataStore, state, nodes, allConnections, links, filterPaperIdsByYear);
+    buildPlatformToContentConnections(dataStore, state, nodes, allConnections, links, linkValue);
 
     // 2. 研究内容 → 研究方法连接
-    buildContentToMethodConnections(dataStore, state, nodes, allConnections, links, filterPaperIdsByYear);
+    buildContentToMethodConnections(dataStore, state, nodes, allConnections, links, linkValue);
 
     console.log('=== 连接生成完成 ===');
     console.log(`最终生成的连接数量: ${links.length}`);
@@ -41,7 +53,7 @@ export function buildConnections(dataStore: any, state: any, nodes: any[]): any[
     return links;
 }
 
-function buildPlatformToContentConnections(dataStore: any, state: any, nodes: any[], allConnections: any, links: any[], filterPaperIdsByYear: Function) {
+function buildPlatformToContentConnections(dataStore: any, state: any, nodes: any[], allConnections: any, links: any[], linkValue: (connectionInfo: any) => number) {
     console.log('=== 生成平台→研究内容连接 ===');
 
     // 根据当前平台层级和内容层级选择正确的连接数据源
@@ -95,18 +107,17 @@ function buildPlatformToContentConnections(dataStore: any, state: any, nodes: an
         
         if (platformNode && contentNode) {
             // 应用年份筛选
-            const filteredPaperIds = filterPaperIdsByYear(connectionInfo.paperIds || []);
+            const value = linkValue(connectionInfo);
             
             // 只有在有论文的情况下才创建连接
-            if (filteredPaperIds.length > 0) {
+            if (value > 0) {
             links.push({
                 source: platformId,
                 target: contentId,
-                    value: filteredPaperIds.length, // 使用过滤后的论文数量
-                    paperIds: filteredPaperIds, // 使用过滤后的论文ID列表
+                    value, // 当前年份筛选下的论文数
                 connectionStrength: connectionInfo.connectionStrength
             });
-                console.log(`✅ 创建平台→内容连接: ${platformId} → ${contentId} (${filteredPaperIds.length})`);
+                console.log(`✅ 创建平台→内容连接: ${platformId} → ${contentId} (${value})`);
             } else {
                 console.log(`⚠️ 平台→内容连接在当前年份筛选下没有论文: ${platformId} → ${contentId}`);
             }
@@ -117,7 +128,7 @@ function buildPlatformToContentConnections(dataStore: any, state: any, nodes: an
     }
 }
 
-function buildContentToMethodConnections(dataStore: any, state: any, nodes: any[], allConnections: any, links: any[], filterPaperIdsByYear: Function) {
+function buildContentToMethodConnections(dataStore: any, state: any, nodes: any[], allConnections: any, links: any[], linkValue: (connectionInfo: any) => number) {
     console.log('=== 生成研究内容→研究方法连接 ===');
 
     let contentMethodConnectionKey = '';
@@ -177,18 +188,17 @@ function buildContentToMethodConnections(dataStore: any, state: any, nodes: any[
             
             if (contentNode && methodNode) {
                 // 应用年份筛选
-                const filteredPaperIds = filterPaperIdsByYear(connectionInfo.paperIds || []);
+                const value = linkValue(connectionInfo);
                 
                 // 只有在有论文的情况下才创建连接
-                if (filteredPaperIds.length > 0) {
+                if (value > 0) {
                 links.push({
                     source: contentId,
                     target: methodId,
-                        value: filteredPaperIds.length, // 使用过滤后的论文数量
-                        paperIds: filteredPaperIds, // 使用过滤后的论文ID列表
+                        value, // 当前年份筛选下的论文数
                     connectionStrength: connectionInfo.connectionStrength
                 });
-                    console.log(`✅ 创建L3内容→L1方法连接: ${contentId} → ${methodId} (${filteredPaperIds.length})`);
+                    console.log(`✅ 创建L3内容→L1方法连接: ${contentId} → ${methodId} (${value})`);
                 } else {
                     console.log(`⚠️ 内容→方法连接在当前年份筛选下没有论文: ${contentId} → ${methodId}`);
                 }
@@ -232,18 +242,17 @@ function buildContentToMethodConnections(dataStore: any, state: any, nodes: any[
             
             if (contentNode && methodNode) {
                 // 应用年份筛选
-                const filteredPaperIds = filterPaperIdsByYear(connectionInfo.paperIds || []);
+                const value = linkValue(connectionInfo);
                 
                 // 只有在有论文的情况下才创建连接
-                if (filteredPaperIds.length > 0) {
+                if (value > 0) {
                 links.push({
                     source: contentNode.id,
                     target: methodNode.id,
-                        value: filteredPaperIds.length, // 使用过滤后的论文数量
-                        paperIds: filteredPaperIds, // 使用过滤后的论文ID列表
+                        value, // 当前年份筛选下的论文数
                     connectionStrength: connectionInfo.connectionStrength
                 });
-                    console.log(`✅ 创建内容→方法连接: ${contentNode.id} → ${methodNode.id} (${filteredPaperIds.length})`);
+                    console.log(`✅ 创建内容→方法连接: ${contentNode.id} → ${methodNode.id} (${value})`);
                 } else {
                     console.log(`⚠️ 内容→方法连接在当前年份筛选下没有论文: ${contentId} → ${methodId}`);
                 }
@@ -1,3 +1,5 @@
+import { filteredPairCount, selectedYearIndices } from '../../utils/filterCube';
+
 export function buildL1Snapshot(dataStore: any, state: any) {
     // ---------- ① 生成三列节点 ----------
     // 平台节点(原始计算)
@@ -137,6 +139,15 @@ export function buildL1Snapshot(dataStore: any, state: any) {
     // 连线生成保持不变，因为连线本身已经有正确的论文计数
     const links: any[] = [];
 
+    // 有年份立方体时连线宽度直接对选中年份求和，不再扫描 paperIds（见 utils/filterCube.ts）
+    const yearAxis: string[] | undefined = dataStore.crossLevelConnections?.yearAxis;
+    const yearIndices = yearAxis && selectedYear ? selectedYearIndices(yearAxis, [selectedYear]) : [];
+    const linkValue = (info: any): number => {
+        if (!selectedYear) return info.paperCount ?? (info.paperIds || []).length;
+        if (yearAxis && info.yearCounts) return filteredPairCount(info, yearIndices);
+        return filterPaperIdsByYear(info.paperIds || []).length;
+    };
+
     // a) 平台 (L1) → 内容 (L1)
     const platformKeyPrefix = state.currentPlatformType === '内容形式'
         ? '研究涉及平台-内容形式_L2__研究内容_L1'
@@ -147,13 +158,12 @@ export function buildL1Snapshot(dataStore: any, state: any) {
         if (!Object.prototype.hasOwnProperty.call(rawPlatformContent, key)) continue;
         const [platform, content] = key.split('__');
         const info = rawPlatformContent[key];
-        const filteredPaperIds = filterPaperIdsByYear(info.paperIds || []);
-        if (filteredPaperIds.length === 0) continue;
+        const value = linkValue(info);
+        if (value === 0) continue;
         links.push({
             source: platform,
             target: content,
-            value: filteredPaperIds.length,
-            paperIds: filteredPaperIds,
+            value,
         });
     }
 
@@ -164,13 +174,12 @@ export function buildL1Snapshot(dataStore: any, state: any) {
         const [content, method] = key.split('__');
         const info = rawContentMethod[key];
         // 关键：加上年份过滤
-        const filteredPaperIds = filterPaperIdsByYear(info.paperIds || []);
-        if (filteredPaperIds.length === 0) continue;
+        const value = linkValue(info);
+        if (value === 0) continue;
         links.push({
             source: content,
             target: method,
-            value: filteredPaperIds.length,
-            paperIds: filteredPaperIds,
+            value,
         });
     }
     console.log('Sankey nodes', nodes);
@@ -0,0 +1,45 @@
+// crossLevelConnections 的年份 × 获奖筛选立方体
+// 每个连接对带有与顶层 yearAxis 对齐的两个计数向量：
+// - yearCounts：该年份的论文数
+// - awardedYearCounts：该年份的获奖论文数（非获奖 = 两者之差）
+// 年份或获奖筛选变化时，连线宽度只需对选中年份求和，无需扫描 paperIds。
+// 对应的生成代码见 public/codes/crossLevelConnections.py 的 add_filter_cube。
+
+export type AwardStatus = 'all' | 'awarded' | 'regular';
+
+export interface CubeCounts {
+    paperCount: number;
+    yearCounts?: number[];
+    awardedYearCounts?: number[];
+}
+
+// 选中年份在 yearAxis 中的下标；years 为空或未给出时表示全部年份
+export function selectedYearIndices(yearAxis: string[], years?: Array<number | string>): number[] {
+    if (!years || years.length === 0) {
+        return yearAxis.map((_, i) => i);
+    }
+    const wanted = new Set(years.map(String));
+    return yearAxis.reduce<number[]>((indices, year, i) => {
+        if (wanted.has(year)) indices.push(i);
+        return indices;
+    }, []);
+}
+
+// 某个连接对在筛选条件下的论文数
+export function filteredPairCount(
+    pair: CubeCounts,
+    yearIndices: number[],
+    awardStatus: AwardStatus = 'all',
+): number {
+    // 没有立方体数据（旧文件或 --no-cube）时退回总数
+    if (!pair.yearCounts || !pair.awardedYearCounts) {
+        return pair.paperCount;
+    }
+    let total = 0;
+    for (const i of yearIndices) {
+        const all = pair.yearCounts[i];
+        const awarded = pair.awardedYearCounts[i];
+        total += awardStatus === 'awarded' ? awarded : awardStatus === 'regular' ? all - awarded : all;
+    }
+    return total;
+}
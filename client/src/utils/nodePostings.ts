@@ -0,0 +1,44 @@
+// 节点 -> 论文的倒排表（posting list），由 public/codes/node_postings.py 生成，位于 data/main/nodePostings.json
+// postings[领域][l1|l2|l3][节点名称] 为该节点论文在 paperIndex 中的下标（升序），编码方式见 encoding：
+// - "delta"：[首个下标, 差值, 差值, ...]
+// - "bitset-base64" / "rle-base64"：与 crossLevelConnections 相同的位图编码（paperBitset.ts）
+// 节点名称即 processedPapers 中 tags[领域].l1/l2/l3 的名称，也是桑基图节点的 id。
+
+import { bitsetToIndices, decodeBitset } from './paperBitset';
+
+export const DELTA_ENCODING = 'delta';
+
+export interface NodePostingsData {
+    version: number;
+    paperIndex: string[];
+    encoding: string;
+    postings: Record<string, Record<string, Record<string, number[] | string>>>;
+}
+
+// 桑基图列 -> processedPapers 中的领域（平台列取决于当前平台类型）
+export function columnDomain(column: number, platformType: string): string | null {
+    if (column === 0) return `研究涉及平台-${platformType}`;
+    if (column === 1) return '研究方法';
+    if (column === 2) return '研究内容';
+    return null;
+}
+
+export function decodePosting(posting: number[] | string, encoding: string): number[] {
+    if (encoding === DELTA_ENCODING) {
+        const indices: number[] = [];
+        let position = 0;
+        for (const gap of posting as number[]) {
+            position += gap;
+            indices.push(position);
+        }
+        return indices;
+    }
+    return bitsetToIndices(decodeBitset(posting as string, encoding));
+}
+
+// 节点下的全部论文 ID；节点不存在时返回 null（调用方可回退到扫描连接）
+export function nodePaperIds(data: NodePostingsData, domain: string, level: string, name: string): string[] | null {
+    const posting = data.postings?.[domain]?.[level.toLowerCase()]?.[name];
+    if (posting === undefined) return null;
+    return decodePosting(posting, data.encoding).map(idx => data.paperIndex[idx]);
+}
@@ -0,0 +1,64 @@
+// bitset / rle 格式解码工具，nodePostings.ts 用它解码节点的论文集合
+// 论文集合是共享 paperIndex 上的位图，第 i 位表示 paperIndex[i]：
+// - "bitset-base64"：按小端打包（字节 i >> 3 的第 i & 7 位），省略末尾全零字节，base64 编码
+// - "rle-base64"：0/1 交替的游程长度（以 0 游程开头），LEB128 变长整数，base64 编码
+// 对应的编码器见 public/codes/paper_bitset.py。
+
+export type PaperBitset = Uint8Array;
+
+export const BITSET_ENCODING = 'bitset-base64';
+export const RLE_ENCODING = 'rle-base64';
+
+function base64ToBytes(encoded: string): Uint8Array {
+    const binary = atob(encoded);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+}
+
+function decodeRle(raw: Uint8Array): PaperBitset {
+    const runs: number[] = [];
+    let run = 0;
+    let shift = 0;
+    for (const byte of raw) {
+        run += (byte & 0x7f) * 2 ** shift;
+        if (byte & 0x80) {
+            shift += 7;
+            continue;
+        }
+        runs.push(run);
+        run = 0;
+        shift = 0;
+    }
+    const totalBits = runs.reduce((sum, r) => sum + r, 0);
+    const bytes = new Uint8Array((totalBits + 7) >> 3);
+    let position = 0;
+    runs.forEach((length, k) => {
+        if (k % 2 === 1) {
+            for (let i = position; i < position + length; i++) {
+                bytes[i >> 3] |= 1 << (i & 7);
+            }
+        }
+        position += length;
+    });
+    return bytes;
+}
+
+export function decodeBitset(encoded: string, encoding: string = BITSET_ENCODING): PaperBitset {
+    const raw = base64ToBytes(encoded);
+    return encoding === RLE_ENCODING ? decodeRle(raw) : raw;
+}
+
+export function bitsetToIndices(set: PaperBitset): number[] {
+    const indices: number[] = [];
+    for (let i = 0; i < set.length; i++) {
+        const byte = set[i];
+        if (!byte) continue;
+        for (let bit = 0; bit < 8; bit++) {
+            if (byte & (1 << bit)) indices.push(i * 8 + bit);
+        }
+    }
+    return indices;
+}
@@ -0,0 +1,94 @@
+// 预计算的桑基图布局，由 public/codes/sankey_layout.py 生成，位于 data/sankeyLayouts/
+// manifest.json: { width, height, views: { 平台类型: { 层级组合: 文件名 } } }
+// 每个布局文件: { height, nodes: [{id, column, value, x0, x1, y0, y1, color}], links: [{source, target, value, width, y0, y1, d}] }
+// 坐标基于 sankeyLayoutConfig.json 的尺寸，使用时按当前画布范围线性缩放。
+// 布局统计全部年份的论文；有年份筛选或节点展开时节点/连接集合不同，仍由 d3-sankey 现场计算。
+
+export interface PrecomputedLayout {
+    width: number;
+    height: number;
+    nodes: any[];
+    links: any[];
+}
+
+const BASE = `${import.meta.env.BASE_URL}data/sankeyLayouts/`;
+
+let manifestPromise: Promise<any | null> | null = null;
+const layoutCache = new Map<string, Promise<PrecomputedLayout | null>>();
+
+// state.columnLevels 为 [平台, 方法, 内容]；层级组合为 "平台_内容_方法"，使用连接类型中的层级
+// （平台列的 L1 对应连接中的 L2，平台没有 L4，因此平台 L3 没有预计算布局）
+export function layoutCombo(columnLevels: string[]): string | null {
+    const platformLevel = Number(columnLevels[0]?.slice(1)) + 1;
+    if (!(platformLevel >= 1 && platformLevel <= 3)) return null;
+    return `L${platformLevel}_${columnLevels[2]}_${columnLevels[1]}`;
+}
+
+function fetchManifest(): Promise<any | null> {
+    if (!manifestPromise) {
+        manifestPromise = fetch(`${BASE}manifest.json`)
+            .then(res => (res.ok ? res.json() : null))
+            .catch(() => null);
+    }
+    return manifestPromise;
+}
+
+// 取布局；没有预计算文件时返回 null
+export async function fetchSankeyLayout(platformType: string, combo: string | null): Promise<PrecomputedLayout | null> {
+    if (!combo) return null;
+    const key = `${platformType}|${combo}`;
+    if (!layoutCache.has(key)) {
+        layoutCache.set(key, fetchManifest().then(async manifest => {
+            const file = manifest?.views?.[platformType]?.[combo];
+            if (!file) return null;
+            const res = await fetch(`${BASE}${file}`);
+            if (!res.ok) return null;
+            const layout = await res.json();
+            return { width: manifest.width, height: layout.height, nodes: layout.nodes, links: layout.links };
+        }).catch(() => null));
+    }
+    return layoutCache.get(key)!;
+}
+
+// 将预计算布局套用到当前节点/连接上，返回与 d3-sankey 相同结构的 { nodes, links }；
+// 节点或连接集合与布局不一致时返回 null，由调用方回退到 d3-sankey
+export function applyPrecomputedLayout(layout: PrecomputedLayout, nodes: any[], links: any[],
+                                       extent: [[number, number], [number, number]]) {
+    if (layout.nodes.length !== nodes.length || layout.links.length !== links.length) return null;
+
+    const placed = new Map<string, any>();
+    for (const n of layout.nodes) placed.set(`${n.column}|${n.id}`, n);
+    const xs = layout.nodes.flatMap(n => [n.x0, n.x1]);
+    const ys = layout.nodes.flatMap(n => [n.y0, n.y1]);
+    const [minX, maxX, minY, maxY] = [Math.min(...xs), Math.max(...xs), Math.min(...ys), Math.max(...ys)];
+    const [[ex0, ey0], [ex1, ey1]] = extent;
+    const sx = (ex1 - ex0) / ((maxX - minX) || 1);
+    const sy = (ey1 - ey0) / ((maxY - minY) || 1);
+    const scaleX = (x: number) => ex0 + (x - minX) * sx;
+    const scaleY = (y: number) => ey0 + (y - minY) * sy;
+
+    const byId = new Map<string, any>();
+    for (const n of nodes) {
+        const p = placed.get(`${n.column}|${n.id}`);
+        if (!p) return null;
+        byId.set(n.id, { ...n, x0: scaleX(p.x0), x1: scaleX(p.x1), y0: scaleY(p.y0), y1: scaleY(p.y1),
+                         sourceLinks: [], targetLinks: [] });
+    }
+
+    const placedLinks = new Map<string, any>();
+    for (const l of layout.links) placedLinks.set(`${l.source}→${l.target}`, l);
+    const resultLinks: any[] = [];
+    for (const l of links) {
+        const sourceId = typeof l.source === 'object' ? l.source.id : l.source;
+        const targetId = typeof l.target === 'object' ? l.target.id : l.target;
+        const p = placedLinks.get(`${sourceId}→${targetId}`);
+        const source = byId.get(sourceId);
+        const target = byId.get(targetId);
+        if (!p || !source || !target || p.value !== l.value) return null;
+        const link = { ...l, source, target, width: p.width * sy, y0: scaleY(p.y0), y1: scaleY(p.y1) };
+        source.sourceLinks.push(link);
+        target.targetLinks.push(link);
+        resultLinks.push(link);
+    }
+    return { nodes: Array.from(byId.values()), links: resultLinks };
+}
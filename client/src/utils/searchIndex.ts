@@ -0,0 +1,125 @@
+// 论文标题/摘要全文检索（BM25），索引由 public/codes/search_index.py 生成
+// 分词规则必须与 search_index.py 保持一致：
+// - NFKC 规范化并转小写
+// - 拉丁字母/数字连续串 [a-z0-9]+ 作为词，去掉少量英文停用词
+// - 中日韩连续串切分为重叠的二字组（单字串保留为单字）
+// 词项按首字符分片：ASCII 每个字母/数字一片，其余按首字符码点对 cjkBuckets 取模，
+// 查询时只加载查询词所在的分片。
+
+export interface SearchManifest {
+    version: number;
+    tokenizer: { nameWeight: number; cjkBuckets: number };
+    bm25: { k1: number; b: number };
+    docCount: number;
+    avgDocLength: number;
+    docIds: string[];
+    docLengths: number[];
+    shards: Record<string, { file: string; terms: number }>;
+}
+
+// 词项 -> 扁平的倒排表 [doc, tf, doc, tf, ...]
+type Shard = Record<string, number[]>;
+
+export interface SearchHit {
+    id: string;
+    score: number;
+}
+
+const TOKEN_PATTERN = /[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+/g;
+const STOPWORDS = new Set(
+    ('a an and are as at be been but by can for from has have how in into is it its of on or ' +
+     'our that the their them these they this those to was we were what when which while who ' +
+     'with within without').split(' '),
+);
+// 正在输入的最后一个英文词按前缀扩展时，最多扩展的词项数
+const MAX_PREFIX_EXPANSIONS = 20;
+
+export function tokenize(text: string): string[] {
+    const tokens: string[] = [];
+    const runs = (text || '').normalize('NFKC').toLowerCase().match(TOKEN_PATTERN) || [];
+    for (const run of runs) {
+        if (run.charCodeAt(0) < 0x80) {
+            if (!STOPWORDS.has(run)) tokens.push(run);
+        } else if (run.length === 1) {
+            tokens.push(run);
+        } else {
+            for (let i = 0; i < run.length - 1; i++) {
+                tokens.push(run.slice(i, i + 2));
+            }
+        }
+    }
+    return tokens;
+}
+
+export function shardKey(term: string, cjkBuckets: number): string {
+    const code = term.charCodeAt(0);
+    return code < 0x80 ? term[0] : `u${(code % cjkBuckets).toString(16)}`;
+}
+
+export class SearchIndex {
+    private manifest: SearchManifest | null = null;
+    private manifestPromise: Promise<SearchManifest> | null = null;
+    private shards = new Map<string, Promise<Shard>>();
+
+    constructor(private baseUrl: string = `${import.meta.env.BASE_URL}data/search/`) {}
+
+    private loadManifest(): Promise<SearchManifest> {
+        if (!this.manifestPromise) {
+            this.manifestPromise = fetch(`${this.baseUrl}manifest.json`).then(res => {
+                if (!res.ok) throw new Error(`无法加载搜索索引 manifest.json (${res.status})`);
+                return res.json();
+            }).then(manifest => {
+                this.manifest = manifest;
+                return manifest;
+            });
+        }
+        return this.manifestPromise;
+    }
+
+    private loadShard(key: string): Promise<Shard> {
+        const info = this.manifest?.shards[key];
+        if (!info) return Promise.resolve({});
+        if (!this.shards.has(key)) {
+            this.shards.set(key, fetch(`${this.baseUrl}${info.file}`).then(res => (res.ok ? res.json() : {})));
+        }
+        return this.shards.get(key)!;
+    }
+
+    // 按 BM25 得分从高到低返回论文 ID；prefixLastTerm 为 true 时最后一个英文词按前缀匹配（边输入边搜索）
+    async search(query: string, limit = 50, prefixLastTerm = true): Promise<SearchHit[]> {
+        const manifest = await this.loadManifest();
+        const terms = Array.from(new Set(tokenize(query)));
+        if (terms.length === 0) return [];
+
+        const { k1, b } = manifest.bm25;
+        const avgLength = manifest.avgDocLength || 1;
+        const scores = new Map<number, number>();
+        const lastTerm = terms[terms.length - 1];
+        const expandLast = prefixLastTerm && lastTerm.charCodeAt(0) < 0x80 && !/\s$/.test(query);
+
+        const shards = await Promise.all(terms.map(t => this.loadShard(shardKey(t, manifest.tokenizer.cjkBuckets))));
+        terms.forEach((term, i) => {
+            const shard = shards[i];
+            let matched = shard[term] ? [term] : [];
+            if (expandLast && term === lastTerm) {
+                matched = Object.keys(shard).filter(t => t.startsWith(term)).slice(0, MAX_PREFIX_EXPANSIONS);
+            }
+            for (const t of matched) {
+                const flat = shard[t];
+                const df = flat.length / 2;
+                const idf = Math.log(1 + (manifest.docCount - df + 0.5) / (df + 0.5));
+                for (let j = 0; j < flat.length; j += 2) {
+                    const doc = flat[j];
+                    const tf = flat[j + 1];
+                    const norm = k1 * (1 - b + (b * manifest.docLengths[doc]) / avgLength);
+                    scores.set(doc, (scores.get(doc) || 0) + (idf * tf * (k1 + 1)) / (tf + norm));
+                }
+            }
+        });
+
+        return Array.from(scores.entries())
+            .sort((x, y) => y[1] - x[1] || x[0] - y[0])
+            .slice(0, limit)
+            .map(([doc, score]) => ({ id: manifest.docIds[doc], score }));
+    }
+}